@@ -2,10 +2,52 @@
 
 The full CustomTkinter UI lives in sm_ctk.py.
 Keep sm.py as the stable entrypoint for users and PyInstaller.
+
+With arguments (``sm list``, ``sm run NAME``...) the headless CLI in sm_cli.py
+runs instead; the GUI modules are only imported when the window is opened.
+
+Only one GUI runs per user. Launching it again, or ``sm --run NAME...``,
+hands the request (raise the window / run these entries) to the running
+instance over a Unix socket and exits without importing Tk.
 """
 
-from sm_ctk import main
+import sys
+
+
+def main() -> None:
+    if getattr(sys, "frozen", False):
+        # Archive search workers are spawned processes; in frozen builds they
+        # re-enter here and must not be taken for CLI invocations.
+        import multiprocessing
+
+        multiprocessing.freeze_support()
+    args = sys.argv[1:]
+    run_names = args[1:] if args[:1] == ["--run"] else []
+    if args and args[0] != "--run":
+        from sm_cli import main as cli_main
+
+        sys.exit(cli_main(args))
+
+    from sm_instance import InstanceUnreachable, claim_or_forward
+
+    try:
+        instance = claim_or_forward(run_names)
+    except InstanceUnreachable as e:
+        print(f"sm: another instance is running but did not answer: {e}", file=sys.stderr)
+        sys.exit(1)
+    except OSError as e:
+        # Nobody else to hand over to: run without single-instance mode.
+        print(f"sm: single-instance mode unavailable, starting anyway: {e}", file=sys.stderr)
+        instance = None
+    else:
+        if instance is None:
+            sys.exit(0)
+
+    from sm_ctk import main as gui_main
+
+    # With a server, the ``--run`` names are already queued on it.
+    gui_main(instance, run_names if instance is None else None)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
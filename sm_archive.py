@@ -0,0 +1,271 @@
+"""Compressed per-run output archive and its search.
+
+Every run's output is streamed into ``<run_id>.log.gz`` under
+``$XDG_STATE_HOME/Service-APP-GUI/archive``. The file is a sequence of gzip
+members, one per flush, so it stays readable up to the last flush even if
+the app dies mid-run. Decompressed it is one record per line::
+
+    #run\\t{"run_id": ..., "name": ..., "command": ..., "started": ...}
+    <tag>\\t<output line>
+    ...
+    #end\\t{"exit_code": 0, "finished": ...}
+
+Output line numbers (1-based, header excluded) are what search hits and
+``read_window`` refer to. Searching streams the files line by line in a
+process pool; nothing here loads a whole archive into memory.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import gzip
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from sm_catalog import APP_DIR_NAME
+
+FLUSH_BYTES = 256 * 1024
+COMPRESS_LEVEL = 3
+SUFFIX = ".log.gz"
+FILES_PER_TASK = 16
+MAX_HITS_PER_FILE = 50
+
+_run_ids = itertools.count(1)
+
+
+def default_archive_dir() -> str:
+    state_home = os.environ.get("XDG_STATE_HOME")
+    if not state_home:
+        state_home = os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(state_home, APP_DIR_NAME, "archive")
+
+
+def new_run_id() -> str:
+    """Sortable, unique across processes: ``<date>-<time>-<pid>-<n>``."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_run_ids)}"
+
+
+class RunArchiveWriter:
+    """Buffers one run's output and appends it as gzip members."""
+
+    def __init__(self, archive_dir: str, run_id: str, name: str, command: str, started: float | None = None):
+        self.run_id = run_id
+        self.path = os.path.join(archive_dir, run_id + SUFFIX)
+        os.makedirs(archive_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._buf: list[str] = []
+        self._size = 0
+        self._fh = open(self.path, "ab")
+        header = {"run_id": run_id, "name": name, "command": command, "started": started or time.time()}
+        self._buf.append("#run\t" + json.dumps(header, ensure_ascii=False) + "\n")
+
+    def append(self, tag: str, text: str) -> None:
+        lines = "".join(f"{tag}\t{line}\n" for line in text.split("\n"))
+        with self._lock:
+            if self._fh is None:
+                return
+            self._buf.append(lines)
+            self._size += len(lines)
+            if self._size >= FLUSH_BYTES:
+                self._flush()
+
+    def close(self, exit_code: int | None) -> None:
+        with self._lock:
+            if self._fh is None:
+                return
+            self._buf.append("#end\t" + json.dumps({"exit_code": exit_code, "finished": time.time()}) + "\n")
+            self._flush()
+            self._fh.close()
+            self._fh = None
+
+    def _flush(self) -> None:
+        if self._buf and self._fh is not None:
+            data = "".join(self._buf).encode("utf-8", "replace")
+            self._fh.write(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+            self._fh.flush()
+        self._buf.clear()
+        self._size = 0
+
+
+def archive_files(archive_dir: str) -> list[str]:
+    """Archive paths, newest first."""
+    try:
+        names = [n for n in os.listdir(archive_dir) if n.endswith(SUFFIX)]
+    except OSError:
+        return []
+    return [os.path.join(archive_dir, n) for n in sorted(names, reverse=True)]
+
+
+def prune_archive(archive_dir: str, max_bytes: int) -> None:
+    """Delete the oldest archives until the directory fits in ``max_bytes``."""
+    total = 0
+    for path in archive_files(archive_dir):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        total += size
+        if total > max_bytes:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _read_header(line: str) -> dict:
+    if line.startswith("#run\t"):
+        try:
+            return json.loads(line[5:])
+        except ValueError:
+            pass
+    return {}
+
+
+def _iter_records(path: str):
+    """Yield ``(header, line_no, tag, text)`` for each output line, streaming."""
+    header: dict = {}
+    line_no = 0
+    try:
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="\n") as f:
+            for raw in f:
+                raw = raw.rstrip("\n")
+                if raw.startswith("#run\t") and line_no == 0:
+                    header = _read_header(raw)
+                    continue
+                if raw.startswith("#end\t"):
+                    continue
+                line_no += 1
+                tag, _sep, text = raw.partition("\t")
+                yield header, line_no, tag, text
+    except (OSError, EOFError, gzip.BadGzipFile):
+        # A truncated last member (app killed mid-flush): keep what was read.
+        return
+
+
+def _scan_files(paths: list[str], pattern: str, regex: bool, ignore_case: bool, max_hits: int) -> list[dict]:
+    """Worker: scan a batch of archives. Runs in a pool process."""
+    flags = re.IGNORECASE if ignore_case else 0
+    if regex:
+        matcher = re.compile(pattern, flags).search
+    elif ignore_case:
+        needle = pattern.lower()
+        matcher = lambda text: needle in text.lower()  # noqa: E731
+    else:
+        matcher = lambda text: pattern in text  # noqa: E731
+
+    hits: list[dict] = []
+    for path in paths:
+        found = 0
+        for header, line_no, tag, text in _iter_records(path):
+            if matcher(text):
+                hits.append({
+                    "path": path,
+                    "run_id": header.get("run_id") or os.path.basename(path)[: -len(SUFFIX)],
+                    "name": header.get("name", "?"),
+                    "started": header.get("started"),
+                    "line": line_no,
+                    "tag": tag,
+                    "text": text[:500],
+                })
+                found += 1
+                if found >= max_hits:
+                    break
+    return hits
+
+
+class ArchiveSearch:
+    """Fan a search out over a process pool; hits arrive through ``on_hits``.
+
+    ``on_hits(list_of_hits)`` and ``on_done(files_scanned)`` are called from
+    pool callback threads; UI callers should only enqueue there.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or max(1, min(8, (os.cpu_count() or 2)))
+        self._pool: concurrent.futures.ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def _ensure_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._pool is None:
+            import multiprocessing
+
+            # spawn: never fork a process that has Tk and the engine thread.
+            self._pool = concurrent.futures.ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def search(
+        self,
+        paths: list[str],
+        pattern: str,
+        on_hits: Callable[[list[dict]], None],
+        on_done: Callable[[int], None],
+        regex: bool = False,
+        ignore_case: bool = True,
+        max_hits_per_file: int = MAX_HITS_PER_FILE,
+    ) -> None:
+        """Start a search; a newer search makes results of older ones be dropped."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        # Small batches keep every worker busy; at most FILES_PER_TASK files
+        # per task amortise the per-task overhead on large archives.
+        size = max(1, min(FILES_PER_TASK, -(-len(paths) // (self.max_workers * 4))))
+        batches = [paths[i:i + size] for i in range(0, len(paths), size)]
+        if not batches:
+            on_done(0)
+            return
+        remaining = [len(batches)]
+        pool = self._ensure_pool()
+
+        def finished(future: concurrent.futures.Future) -> None:
+            if generation != self._generation:
+                return
+            try:
+                hits = future.result()
+            except Exception:
+                hits = []
+            if hits:
+                on_hits(hits)
+            with self._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                on_done(len(paths))
+
+        for batch in batches:
+            pool.submit(_scan_files, batch, pattern, regex, ignore_case, max_hits_per_file).add_done_callback(finished)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._generation += 1
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def read_window(path: str, line: int, before: int = 200, after: int = 300) -> tuple[dict, int, list[tuple[str, str]]]:
+    """Lines around output line ``line``: ``(header, first_line_no, [(tag, text), ...])``.
+
+    Streams from the start and keeps only ``before`` lines of context, so
+    memory stays bounded however large the archive is.
+    """
+    window: deque[tuple[int, str, str]] = deque(maxlen=before + 1 + after)
+    header: dict = {}
+    for header, line_no, tag, text in _iter_records(path):
+        window.append((line_no, tag, text))
+        if line_no >= line + after:
+            break
+    # Drop leading context beyond ``before``.
+    while window and window[0][0] < line - before:
+        window.popleft()
+    first = window[0][0] if window else 1
+    return header, first, [(tag, text) for _n, tag, text in window]
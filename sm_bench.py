@@ -0,0 +1,697 @@
+"""Headless benchmarks for the output pipeline and catalog refreshes.
+
+    python3 sm_bench.py                                   # default scenarios -> bench-results.json
+    python3 sm_bench.py --sizes 1M,1G --kinds lines,cr --out results.json
+    xvfb-run python3 sm_bench.py --widgets real           # real Tk under a virtual display
+
+The real ``ServiceManagerApp`` is built and driven tick by tick, either on
+real Tk or on a fake widget layer (``--widgets fake``, the default without
+``$DISPLAY``) that keeps the log as a list of lines and turns every other
+widget call into a no-op. Fake numbers therefore measure the app's own
+Python work, not Tk's drawing.
+
+Output scenarios run this file's ``gen`` mode as the command, so bytes go
+through the real engine, scheduler, terminal processing, log queue,
+archive and spill file. Per scenario:
+
+- latency: ``gen`` writes ``@@bench <monotonic_ns>`` marker lines; the time
+  from that write to the marker being inserted into the log widget;
+- stalls: the duration of every ``process_queue`` call (one main-loop tick);
+- peak RSS of this process (VmHWM, reset before each scenario);
+- wall time and throughput.
+
+Catalog scenarios time ``refresh_left_tabs`` and
+``refresh_command_manager_list`` for synthetic catalogs of 10 to 10,000
+entries, built from empty and then refreshed unchanged.
+
+All state (history, archive, cache, session log, runtime dir) goes to a
+temporary directory, never to the user's own.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import platform
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from typing import Callable
+
+from sm_limits import parse_size
+
+DEFAULT_SIZES = "1M,16M,128M"
+DEFAULT_KINDS = "lines,long,cr,ansi"
+DEFAULT_CATALOG = "10,100,1000,10000"
+GEN_CHUNK = 64 * 1024
+MARKER = "@@bench "
+# One main-loop tick longer than this is a dropped frame.
+STALL_MS = 16.0
+SCENARIO_TIMEOUT_S = 1800.0
+
+
+# -------------------------
+# Synthetic output (``sm_bench.py gen``)
+# -------------------------
+def _gen_chunk(kind: str, seq: int) -> str:
+    """About ``GEN_CHUNK`` characters of one output style."""
+    if kind == "long":
+        # One 16 KiB line after another.
+        return "".join(f"{seq}:{n} " + "x" * (16 * 1024 - 16) + "\n" for n in range(4))
+    if kind == "cr":
+        # A progress bar redrawn in place, like dnf/flatpak.
+        parts = []
+        for n in range(800):
+            pct = n * 100 // 800
+            parts.append(f"\rDownloading packages [{'#' * (pct // 5):<20}] {pct:3d}%  {seq}.{n}")
+        parts.append("\n")
+        return "".join(parts)
+    if kind == "ansi":
+        parts = []
+        for n in range(900):
+            colour = 31 + n % 7
+            parts.append(f"\x1b[1;{colour}m[{seq:6d}.{n:03d}]\x1b[0m package-{n}.x86_64 \x1b[32mOK\x1b[0m\n")
+        return "".join(parts)
+    return "".join(f"[{seq:6d}.{n:04d}] the quick brown fox jumps over the lazy dog 0123456789\n" for n in range(820))
+
+
+def generate(kind: str, size: int, rate: float) -> int:
+    """Write ``size`` bytes of ``kind`` output to stdout, at ``rate`` bytes/s (0: as fast as possible)."""
+    out = sys.stdout.buffer
+    written = 0
+    start = time.monotonic()
+    for seq in itertools.count():
+        if written >= size:
+            break
+        chunk = (f"{MARKER}{time.monotonic_ns()}\n" + _gen_chunk(kind, seq)).encode()
+        chunk = chunk[: size - written] if written + len(chunk) > size else chunk
+        out.write(chunk)
+        out.flush()
+        written += len(chunk)
+        if rate:
+            ahead = written / rate - (time.monotonic() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+    out.write(f"\n{MARKER}{time.monotonic_ns()} end\n".encode())
+    out.flush()
+    return 0
+
+
+def gen_command(kind: str, size: int, rate: float) -> str:
+    return shlex.join([sys.executable, os.path.abspath(__file__), "gen", kind, str(size), str(rate)])
+
+
+# -------------------------
+# Fake widget layer
+# -------------------------
+class _FakeLoop:
+    """Stand-in for Tk's event loop: ``after`` timers and first ``<Configure>`` events."""
+
+    def __init__(self):
+        self._timers: list[tuple[float, int, Callable, tuple]] = []
+        self._cancelled: set[int] = set()
+        self._ids = itertools.count(1)
+        self._configure: list[tuple[object, Callable]] = []
+
+    def after(self, ms: int, func: Callable | None, args: tuple) -> str:
+        timer_id = next(self._ids)
+        if func is not None:
+            heapq.heappush(self._timers, (time.monotonic() + ms / 1000.0, timer_id, func, args))
+        return f"after#{timer_id}"
+
+    def cancel(self, timer: str) -> None:
+        try:
+            self._cancelled.add(int(str(timer).rpartition("#")[2]))
+        except ValueError:
+            pass
+
+    def update(self) -> None:
+        while self._configure:
+            widget, handler = self._configure.pop(0)
+            handler(types.SimpleNamespace(widget=widget, width=800, height=FakeWidget.HEIGHT))
+        now = time.monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            _due, timer_id, func, args = heapq.heappop(self._timers)
+            if timer_id in self._cancelled:
+                self._cancelled.discard(timer_id)
+                continue
+            func(*args)
+
+
+_LOOP = _FakeLoop()
+
+
+def _noop(*_args, **_kwargs):
+    return None
+
+
+class FakeWidget:
+    """Accepts any widget call; remembers options and ``get``/``set`` values."""
+
+    HEIGHT = 600
+
+    def __init__(self, master=None, *_args, **kwargs):
+        self.master = master
+        self._options = dict(kwargs)
+        self._value = kwargs.get("value", "")
+
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _noop
+
+    def configure(self, **kwargs) -> None:
+        self._options.update(kwargs)
+
+    config = configure
+
+    def cget(self, key: str):
+        return self._options.get(key, "")
+
+    def get(self, *_args):
+        return self._value
+
+    def set(self, value, *_args) -> None:
+        self._value = value
+
+    def bind(self, sequence: str | None = None, func: Callable | None = None, add=None) -> None:
+        # Real widgets get one <Configure> once they are mapped.
+        if sequence == "<Configure>" and func is not None:
+            _LOOP._configure.append((self, func))
+
+    def after(self, ms: int, func: Callable | None = None, *args) -> str:
+        return _LOOP.after(ms, func, args)
+
+    def after_cancel(self, timer: str) -> None:
+        _LOOP.cancel(timer)
+
+    def update(self) -> None:
+        _LOOP.update()
+
+    def winfo_exists(self) -> bool:
+        return True
+
+    def winfo_height(self) -> int:
+        return self.HEIGHT
+
+    def winfo_width(self) -> int:
+        return 800
+
+    def winfo_children(self) -> list:
+        return []
+
+    def _reverse_widget_scaling(self, value):
+        return value
+
+    def _apply_widget_scaling(self, value):
+        return value
+
+
+class FakeTabview(FakeWidget):
+    def __init__(self, master=None, *args, **kwargs):
+        super().__init__(master, *args, **kwargs)
+        self._tabs: dict[str, FakeWidget] = {}
+
+    def add(self, name: str) -> FakeWidget:
+        return self.insert(len(self._tabs), name)
+
+    def insert(self, _index: int, name: str) -> FakeWidget:
+        tab = self._tabs[name] = FakeWidget(self)
+        if not self._value:
+            self._value = name
+        return tab
+
+    def delete(self, name: str) -> None:
+        self._tabs.pop(name, None)
+        if self._value == name:
+            self._value = next(iter(self._tabs), "")
+
+    def tab(self, name: str) -> FakeWidget:
+        return self._tabs[name]
+
+
+class FakeText(FakeWidget):
+    """Line-list model of ``tk.Text`` for the calls the log makes.
+
+    Indexes are ``"line.col"``, ``"end"``/``"end-1c"``, mark names and
+    ``"<index> lineend"``. Each line remembers the first tag it was
+    inserted with, which is all ``dump`` needs to report.
+    """
+
+    VIEW_LINES = 40
+
+    def __init__(self, master=None, *args, **kwargs):
+        super().__init__(master, *args, **kwargs)
+        self._options.setdefault("font", "TkFixedFont")
+        self.lines: list[str] = [""]
+        self.line_tags: list[str | None] = [None]
+        self.marks: dict[str, list] = {}
+        # First line on screen, moved by ``see`` like a real view.
+        self.top = 1
+
+    def _pos(self, index: str) -> tuple[int, int]:
+        base, _sep, modifier = str(index).partition(" ")
+        if base in self.marks:
+            line, col = self.marks[base][0], self.marks[base][1]
+        elif base in ("end", "end-1c"):
+            line, col = len(self.lines), len(self.lines[-1])
+        else:
+            line_text, _dot, col_text = base.partition(".")
+            line = int(line_text)
+            if line > len(self.lines):
+                line, col = len(self.lines), len(self.lines[-1])
+            else:
+                line = max(1, line)
+                col = len(self.lines[line - 1]) if col_text == "end" else min(int(col_text or 0), len(self.lines[line - 1]))
+        if modifier == "lineend":
+            col = len(self.lines[line - 1])
+        return line, col
+
+    def index(self, index: str) -> str:
+        line, col = self._pos(index)
+        return f"{line}.{col}"
+
+    def insert(self, index: str, *args) -> None:
+        # All (text, tags) pairs go in as one string; a new line takes the
+        # tag of the chunk whose newline started it.
+        texts = args[::2]
+        tags = [t[0] if isinstance(t, tuple) else t for t in args[1::2]]
+        tags += [None] * (len(texts) - len(tags))
+        first_tag = next((tag for text, tag in zip(texts, tags) if text), None)
+        new_tags = [tag for text, tag in zip(texts, tags) if "\n" in text for _ in range(text.count("\n"))]
+        text = "".join(texts)
+        if text:
+            self._insert_text(*self._pos(index), text, first_tag, new_tags)
+
+    def _insert_text(self, line: int, col: int, text: str, first_tag: str | None, new_tags: list) -> None:
+        parts = text.split("\n")
+        current = self.lines[line - 1]
+        before, after = current[:col], current[col:]
+        if not current and self.line_tags[line - 1] is None:
+            self.line_tags[line - 1] = first_tag
+        new = [before + parts[0], *parts[1:-1], parts[-1] + after] if len(parts) > 1 else [before + parts[0] + after]
+        self.lines[line - 1:line] = new
+        self.line_tags[line:line] = new_tags
+        added = len(parts) - 1
+        end = (line + added, len(parts[-1]) + (col if not added else 0))
+        for mark in self.marks.values():
+            m_line, m_col, gravity = mark
+            if (m_line, m_col) < (line, col) or ((m_line, m_col) == (line, col) and gravity == "left"):
+                continue
+            if m_line == line:
+                mark[0], mark[1] = end[0], end[1] + (m_col - col)
+            else:
+                mark[0] = m_line + added
+
+    def delete(self, first: str, last: str | None = None) -> None:
+        a = self._pos(first)
+        b = self._pos(last) if last is not None else (a[0], a[1] + 1)
+        if b <= a:
+            return
+        head = self.lines[a[0] - 1][:a[1]]
+        tail = self.lines[b[0] - 1][b[1]:]
+        self.lines[a[0] - 1:b[0]] = [head + tail]
+        self.line_tags[a[0]:b[0]] = []
+        removed = b[0] - a[0]
+        for mark in self.marks.values():
+            pos = (mark[0], mark[1])
+            if pos <= a:
+                continue
+            if pos <= b:
+                mark[0], mark[1] = a
+            elif mark[0] == b[0]:
+                mark[0], mark[1] = a[0], a[1] + (mark[1] - b[1])
+            else:
+                mark[0] -= removed
+
+    def dump(self, first: str, last: str, **_kwargs) -> list[tuple[str, str, str]]:
+        a, b = self._pos(first), self._pos(last)
+        # Like Tk, one text item per run of lines sharing a tag.
+        items = []
+        stop = min(b[0] if b[1] == 0 else b[0] + 1, len(self.lines) + 1)
+        line = a[0]
+        while line < stop:
+            tag = self.line_tags[line - 1] or "info"
+            end = line + 1
+            while end < stop and (self.line_tags[end - 1] or "info") == tag:
+                end += 1
+            text = "\n".join(self.lines[line - 1:end - 1]) + "\n"
+            items += [("tagon", tag, f"{line}.0"), ("text", text, f"{line}.0"), ("tagoff", tag, f"{end}.0")]
+            line = end
+        return items
+
+    def see(self, index: str) -> None:
+        line = self._pos(index)[0]
+        if line < self.top:
+            self.top = line
+        elif line >= self.top + self.VIEW_LINES:
+            self.top = line - self.VIEW_LINES + 1
+
+    def yview(self, *_args) -> tuple[float, float]:
+        count = len(self.lines)
+        self.top = min(self.top, count)
+        return (self.top - 1) / count, min(1.0, (self.top - 1 + self.VIEW_LINES) / count)
+
+    def mark_set(self, name: str, index: str) -> None:
+        gravity = self.marks[name][2] if name in self.marks else "right"
+        self.marks[name] = [*self._pos(index), gravity]
+
+    def mark_gravity(self, name: str, direction: str | None = None) -> None:
+        if direction is not None and name in self.marks:
+            self.marks[name][2] = direction
+
+    def mark_unset(self, *names: str) -> None:
+        for name in names:
+            self.marks.pop(name, None)
+
+
+class FakeTextbox(FakeWidget):
+    def __init__(self, master=None, *args, **kwargs):
+        super().__init__(master, *args, **kwargs)
+        self._textbox = FakeText(self)
+
+
+class FakeVar:
+    def __init__(self, master=None, value=None, name=None):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value) -> None:
+        self._value = value
+
+
+class FakeFont(FakeWidget):
+    def measure(self, text: str) -> int:
+        return 7 * len(text)
+
+    def metrics(self, *_args, **_kwargs):
+        return 15
+
+
+def install_fake_widgets() -> None:
+    """Put fake ``customtkinter``/``tkinter`` modules in place; call before importing sm_ctk."""
+    ctk = types.ModuleType("customtkinter")
+    for name in (
+        "CTk", "CTkButton", "CTkCheckBox", "CTkComboBox", "CTkEntry", "CTkFrame", "CTkLabel",
+        "CTkOptionMenu", "CTkScrollableFrame", "CTkScrollbar", "CTkToplevel",
+    ):
+        setattr(ctk, name, type(name, (FakeWidget,), {}))
+    ctk.CTkTabview = FakeTabview
+    ctk.CTkTextbox = FakeTextbox
+    ctk.CTkFont = FakeFont
+    ctk.set_appearance_mode = _noop
+    ctk.set_default_color_theme = _noop
+
+    tk = types.ModuleType("tkinter")
+    tk.END = "end"
+    tk.TclError = type("TclError", (Exception,), {})
+    tk.BooleanVar = FakeVar
+    tk.StringVar = FakeVar
+    tk.Text = FakeText
+    tk.Canvas = type("Canvas", (FakeWidget,), {})
+    font = types.ModuleType("tkinter.font")
+    font.Font = FakeFont
+    messagebox = types.ModuleType("tkinter.messagebox")
+    messagebox.showerror = messagebox.showinfo = messagebox.showwarning = _noop
+    messagebox.askyesno = lambda *a, **k: True
+    tk.font = font
+    tk.messagebox = messagebox
+    sys.modules.update({"customtkinter": ctk, "tkinter": tk, "tkinter.font": font, "tkinter.messagebox": messagebox})
+
+
+# -------------------------
+# Harness
+# -------------------------
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _summary_ms(values_ms: list[float]) -> dict:
+    summary = {
+        "count": len(values_ms),
+        "p50_ms": _percentile(values_ms, 50),
+        "p95_ms": _percentile(values_ms, 95),
+        "p99_ms": _percentile(values_ms, 99),
+        "max_ms": max(values_ms) if values_ms else None,
+    }
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in summary.items()}
+
+
+def reset_peak_rss() -> bool:
+    """Reset VmHWM (Linux 4.0+); False where the kernel refuses."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int | None:
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class Probe:
+    """Hooks the log widget's ``insert`` and the app's ``process_queue``."""
+
+    def __init__(self, app):
+        self.app = app
+        self.latencies_ms: list[float] = []
+        self.ticks_ms: list[float] = []
+        self.ended = False
+        text = app._log_tk
+        insert = text.insert
+
+        def timed_insert(index, *args):
+            insert(index, *args)
+            now = time.monotonic_ns()
+            chunk = "".join(args[::2])
+            pos = chunk.find(MARKER)
+            while pos != -1:
+                stamp = chunk[pos + len(MARKER):chunk.find("\n", pos)]
+                value, _sp, tail = stamp.partition(" ")
+                if value.isdigit():
+                    self.latencies_ms.append((now - int(value)) / 1e6)
+                    if tail == "end":
+                        self.ended = True
+                pos = chunk.find(MARKER, pos + len(MARKER))
+
+        text.insert = timed_insert
+        process_queue = app.process_queue
+
+        def timed_process_queue():
+            start = time.perf_counter()
+            process_queue()
+            self.ticks_ms.append((time.perf_counter() - start) * 1000.0)
+
+        app.process_queue = timed_process_queue
+
+    def reset(self) -> None:
+        self.latencies_ms = []
+        self.ticks_ms = []
+        self.ended = False
+
+
+def pump(root, until: Callable[[], bool], timeout: float) -> bool:
+    """Run the event loop until ``until()`` holds; False on timeout."""
+    deadline = time.monotonic() + timeout
+    while not until():
+        if time.monotonic() > deadline:
+            return False
+        root.update()
+        time.sleep(0.001)
+    return True
+
+
+def build_app(widgets: str, workdir: str):
+    """A ``ServiceManagerApp`` on real or fake widgets, with all state under ``workdir``."""
+    for var, sub in (("XDG_STATE_HOME", "state"), ("XDG_CACHE_HOME", "cache"), ("XDG_CONFIG_HOME", "config"), ("XDG_RUNTIME_DIR", "run")):
+        os.environ[var] = os.path.join(workdir, sub)
+        os.makedirs(os.environ[var], mode=0o700, exist_ok=True)
+    catalog_path = os.path.join(workdir, "commands.json")
+    with open(catalog_path, "w", encoding="utf-8") as f:
+        json.dump({"commands": [], "settings": {"result_cache_persist": False}}, f)
+    if widgets == "fake":
+        install_fake_widgets()
+    import sm_ctk
+
+    class BenchApp(sm_ctk.ServiceManagerApp):
+        def get_commands_path(self) -> str:
+            return catalog_path
+
+    root = sm_ctk.ctk.CTk()
+    app = BenchApp(root)
+    pump(root, lambda: True, 1.0)
+    return root, app
+
+
+# -------------------------
+# Scenarios
+# -------------------------
+def run_output(root, app, probe: Probe, kind: str, size: int, rate: float) -> dict:
+    app.clear_log()
+    pump(root, lambda: not app.log_backlog(), 10.0)
+    probe.reset()
+    rss_reset = reset_peak_rss()
+    job = app.scheduler.submit(f"bench: {kind} {size}", gen_command(kind, size, rate))
+    start = time.perf_counter()
+    finished = pump(root, lambda: probe.ended and job.finished is not None and not app.log_backlog(), SCENARIO_TIMEOUT_S)
+    wall = time.perf_counter() - start
+    ticks = probe.ticks_ms
+    return {
+        "kind": kind,
+        "size_bytes": size,
+        "rate_bytes_per_s": rate or None,
+        "completed": finished,
+        "exit_code": job.exit_code,
+        "wall_s": round(wall, 3),
+        "throughput_mb_per_s": round(size / wall / 1e6, 2) if wall else None,
+        "latency": _summary_ms(probe.latencies_ms),
+        "process_queue": {
+            **_summary_ms(ticks),
+            "total_ms": round(sum(ticks), 1),
+            f"over_{STALL_MS:g}ms": sum(1 for t in ticks if t > STALL_MS),
+            "stalled_ms": round(sum(t for t in ticks if t > STALL_MS), 1),
+        },
+        "peak_rss_bytes": peak_rss(),
+        "peak_rss_scope": "scenario" if rss_reset else "process",
+    }
+
+
+def synthetic_catalog(count: int) -> dict:
+    categories = max(1, min(40, count // 25))
+    commands = [{"name": f"Group {i % categories:02d}: Entry {i:05d}", "command": f"echo {i}"} for i in range(count)]
+    return {"commands": commands, "workflows": [], "hosts": [], "settings": {}}
+
+
+def _timed(func: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000.0
+
+
+def run_catalog(root, app, count: int) -> dict:
+    app.commands_data = synthetic_catalog(0)
+    app.refresh_left_tabs()
+    app.refresh_command_manager_list()
+    pump(root, lambda: True, 1.0)
+
+    app.commands_data = synthetic_catalog(count)
+    result = {"entries": count}
+    result["left_tabs_build_ms"] = _timed(app.refresh_left_tabs)
+    result["manager_list_build_ms"] = _timed(app.refresh_command_manager_list)
+    # The first geometry pass creates the visible rows.
+    result["first_layout_ms"] = _timed(root.update)
+    result["left_tabs_unchanged_ms"] = _timed(app.refresh_left_tabs)
+    result["manager_list_unchanged_ms"] = _timed(app.refresh_command_manager_list)
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in result.items()}
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _sizes(text: str) -> list[int]:
+    sizes = []
+    for part in text.split(","):
+        size = parse_size(part.strip())
+        if size is None:
+            raise argparse.ArgumentTypeError(f"not a size: {part!r}")
+        sizes.append(size)
+    return sizes
+
+
+def _rates(text: str) -> list[int]:
+    # "0" runs unthrottled, next to throttled sizes.
+    return [0 if part.strip() == "0" else _sizes(part)[0] for part in text.split(",")]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sm_bench", description="Headless benchmarks for Fedora Manager Pro.")
+    parser.add_argument("--widgets", choices=("auto", "fake", "real"), default="auto", help="real Tk needs $DISPLAY (auto: real if set)")
+    parser.add_argument("--sizes", type=_sizes, default=_sizes(DEFAULT_SIZES), help=f"output sizes (default {DEFAULT_SIZES}; up to 1G)")
+    parser.add_argument("--kinds", default=DEFAULT_KINDS, help=f"output styles: lines, long, cr, ansi (default {DEFAULT_KINDS})")
+    parser.add_argument("--rate", type=_rates, default=[0], help="output rates per second, e.g. 5M,50M; 0 is unthrottled (default: 0)")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG, help=f"catalog sizes (default {DEFAULT_CATALOG}; empty to skip)")
+    parser.add_argument("--out", default="bench-results.json", help="JSON results file (- for stdout)")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["gen"]:
+        _gen, kind, size, rate = argv
+        return generate(kind, int(size), float(rate))
+
+    args = build_parser().parse_args(argv)
+    widgets = args.widgets
+    if widgets == "auto":
+        widgets = "real" if os.environ.get("DISPLAY") else "fake"
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    counts = [int(c) for c in args.catalog.split(",") if c.strip()]
+
+    workdir = tempfile.mkdtemp(prefix="sm-bench-")
+    try:
+        root, app = build_app(widgets, workdir)
+        probe = Probe(app)
+        results = {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "widgets": widgets,
+            "output": [],
+            "catalog": [],
+        }
+        for size in args.sizes:
+            for kind in kinds:
+                for rate in args.rate:
+                    pace = f" at {rate} bytes/s" if rate else ""
+                    print(f"output: {kind} {size} bytes{pace}...", file=sys.stderr, flush=True)
+                    results["output"].append(run_output(root, app, probe, kind, size, rate))
+        for count in counts:
+            print(f"catalog: {count} entries...", file=sys.stderr, flush=True)
+            results["catalog"].append(run_catalog(root, app, count))
+        app.on_exit()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"results written to {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
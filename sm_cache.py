@@ -0,0 +1,137 @@
+"""Result cache for read-only catalog entries.
+
+Entries that opt in with ``cache_ttl`` keep their last output here, keyed by
+``(name, command)`` so editing the command invalidates it. The cache is an
+LRU bounded by total text size and can be persisted as one JSON file so
+results survive restarts.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from sm_catalog import APP_DIR_NAME
+
+
+def default_cache_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, APP_DIR_NAME, "result-cache.json")
+
+
+def format_age(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60}s"
+    if seconds < 86400:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    return f"{seconds // 86400}d {seconds % 86400 // 3600}h"
+
+
+class CachedResult:
+    __slots__ = ("blocks", "exit_code", "finished", "size")
+
+    def __init__(self, blocks: list[tuple[str, str]], exit_code: int | None, finished: float):
+        self.blocks = blocks
+        self.exit_code = exit_code
+        self.finished = finished
+        self.size = sum(len(text) for _tag, text in blocks)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.finished
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, path: str | None = None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self._entries: OrderedDict[tuple[str, str], CachedResult] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    @property
+    def max_entry_bytes(self) -> int:
+        # A single huge output should not flush the whole cache.
+        return self.max_bytes // 4
+
+    def get(self, key: tuple[str, str]) -> CachedResult | None:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: tuple[str, str], blocks: list[tuple[str, str]], exit_code: int | None, finished: float | None = None) -> None:
+        result = CachedResult(list(blocks), exit_code, finished or time.time())
+        if result.size > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old.size
+            self._entries[key] = result
+            self._size += result.size
+            self._evict()
+            self._dirty = True
+
+    def set_limit(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            _key, old = self._entries.popitem(last=False)
+            self._size -= old.size
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for item in data.get("entries", []):
+            try:
+                blocks = [(str(tag), str(text)) for tag, text in item["blocks"]]
+                self.put((item["name"], item["command"]), blocks, item.get("exit_code"), float(item["finished"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        self._dirty = False
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            entries = [
+                {"name": name, "command": cmd, "exit_code": r.exit_code, "finished": r.finished, "blocks": r.blocks}
+                for (name, cmd), r in self._entries.items()
+            ]
+            self._dirty = False
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".result-cache-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,361 @@
+"""commands.json location, loading and saving.
+
+Kept free of Tk imports so the headless CLI can share exactly the same
+path and validation logic as the GUI.
+
+Besides ``commands.json`` itself, every ``commands.d/*.json`` file next to it
+is a fragment with the same ``{"commands": [...]}`` layout; its entries and
+workflows are appended to the catalog and saved back to the fragment they
+came from.
+"""
+
+from __future__ import annotations
+
+import functools
+import glob
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+
+from sm_limits import normalize_limits
+from sm_recurring import normalize_schedule
+
+APP_DIR_NAME = "Service-APP-GUI"
+FRAGMENT_DIR = "commands.d"
+# Entries read from a fragment carry its path under this key; it is never
+# written to disk.
+SOURCE_KEY = "_source"
+
+
+def resource_path(rel_path: str) -> str:
+    base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, rel_path)
+
+
+def config_dir() -> str:
+    xdg_config_home = os.environ.get("XDG_CONFIG_HOME")
+    if not xdg_config_home:
+        xdg_config_home = os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(xdg_config_home, APP_DIR_NAME)
+
+
+def runtime_dir() -> str:
+    """Private per-user directory for sockets and locks.
+
+    Raises ``PermissionError`` if it is a symlink or belongs to someone
+    else, which matters for the shared ``/tmp`` fallback.
+    """
+    xdg_runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if xdg_runtime_dir:
+        directory = os.path.join(xdg_runtime_dir, APP_DIR_NAME)
+    else:
+        directory = os.path.join("/tmp", f"{APP_DIR_NAME}-{os.getuid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is not a directory owned by uid {os.getuid()}")
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        os.chmod(directory, 0o700)
+    return directory
+
+
+def get_commands_path() -> str:
+    """Return a writable per-user commands.json path.
+
+    - In PyInstaller onefile builds, bundled data lives in a temp dir (sys._MEIPASS)
+      and should not be written.
+    - For dev runs, we prefer the local commands.json next to the script.
+    """
+    # If frozen (built), always use per-user config
+    if getattr(sys, "frozen", False):
+        directory = config_dir()
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, "commands.json")
+        ensure_commands_file(target, resource_path("commands.json"))
+        return target
+
+    # Dev: next to script if possible
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    target = os.path.join(script_dir, "commands.json")
+    ensure_commands_file(target, target)
+    return target
+
+
+def ensure_commands_file(target_path: str, template_path: str) -> None:
+    if os.path.exists(target_path):
+        return
+    try:
+        if os.path.exists(template_path):
+            os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+            shutil.copyfile(template_path, target_path)
+            return
+    except Exception:
+        pass
+
+    try:
+        os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+        with open(target_path, "w", encoding="utf-8") as f:
+            json.dump({"commands": []}, f, ensure_ascii=False, indent=4)
+            f.write("\n")
+    except Exception:
+        pass
+
+
+@functools.lru_cache(maxsize=65536)
+def category_of(name: str) -> str:
+    """Category tab for an entry name: the part before ':' or 'General'."""
+    if ":" in name:
+        return name.split(":", 1)[0].strip() or "General"
+    return "General"
+
+
+def normalize_entry(item: object) -> dict | None:
+    """Validate one catalog entry; returns None for entries that should be skipped."""
+    if not isinstance(item, dict):
+        return None
+    name = str(item.get("name", "")).strip()
+    cmd = str(item.get("command", "")).strip()
+    if not name or not cmd:
+        return None
+    entry: dict = {"name": name, "command": cmd}
+    lock = item.get("lock")
+    if isinstance(lock, str) and lock.strip():
+        entry["lock"] = lock.strip()
+    if item.get("exclusive") is True:
+        entry["exclusive"] = True
+    ttl = item.get("cache_ttl")
+    if isinstance(ttl, (int, float)) and not isinstance(ttl, bool) and ttl > 0:
+        entry["cache_ttl"] = ttl
+    entry.update(normalize_limits(item))
+    schedule = normalize_schedule(item.get("schedule"))
+    if schedule is not None:
+        entry["schedule"] = schedule
+    return entry
+
+
+def normalize_host(item: object) -> dict | None:
+    """A fan-out host: a bare name, or ``{"name", "address"?, "port"?}``."""
+    if isinstance(item, str):
+        name = item.strip()
+        return {"name": name} if name else None
+    if not isinstance(item, dict):
+        return None
+    name = str(item.get("name", "")).strip()
+    if not name:
+        return None
+    host: dict = {"name": name}
+    address = item.get("address")
+    if isinstance(address, str) and address.strip():
+        host["address"] = address.strip()
+    port = item.get("port")
+    if isinstance(port, int) and not isinstance(port, bool) and 0 < port < 65536:
+        host["port"] = port
+    return host
+
+
+def normalize_workflow(item: object) -> dict | None:
+    """Validate the shape of one workflow; returns None for ones to skip.
+
+    Steps may be given as a bare entry name instead of an object.
+    """
+    if not isinstance(item, dict):
+        return None
+    name = str(item.get("name", "")).strip()
+    raw_steps = item.get("steps")
+    if not name or not isinstance(raw_steps, list):
+        return None
+    steps = []
+    for raw in raw_steps:
+        if isinstance(raw, str):
+            raw = {"entry": raw}
+        if not isinstance(raw, dict):
+            continue
+        entry = str(raw.get("entry", "")).strip()
+        if not entry:
+            continue
+        step: dict = {"entry": entry}
+        step_id = str(raw.get("id", "")).strip()
+        if step_id and step_id != entry:
+            step["id"] = step_id
+        after = raw.get("after")
+        if isinstance(after, str):
+            after = [after]
+        if isinstance(after, list):
+            deps = [str(a).strip() for a in after if str(a).strip()]
+            if deps:
+                step["after"] = deps
+        steps.append(step)
+    if not steps:
+        return None
+    return {"name": name, "steps": steps}
+
+
+def normalize_catalog(data: object) -> dict:
+    if not isinstance(data, dict) or "commands" not in data or not isinstance(data.get("commands"), list):
+        raise ValueError("Invalid commands.json format. Expected { 'commands': [ ... ] }")
+
+    normalized = [e for e in (normalize_entry(item) for item in data.get("commands", [])) if e is not None]
+    catalog: dict = {"commands": normalized}
+    settings = data.get("settings")
+    if isinstance(settings, dict):
+        catalog["settings"] = settings
+    workflows = data.get("workflows")
+    if isinstance(workflows, list):
+        catalog["workflows"] = [w for w in (normalize_workflow(item) for item in workflows) if w is not None]
+    hosts = data.get("hosts")
+    if isinstance(hosts, list):
+        catalog["hosts"] = [h for h in (normalize_host(item) for item in hosts) if h is not None]
+    return catalog
+
+
+def load_commands(path: str) -> dict:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"commands.json not found at {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return normalize_catalog(data)
+
+
+def save_commands(path: str, catalog: dict) -> None:
+    """Write ``catalog`` to ``path`` atomically (temp file + rename)."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix=".commands-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=4)
+            f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        except OSError:
+            pass
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def file_signature(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class CatalogStore:
+    """commands.json plus its ``commands.d`` fragments, parsed at most once per change.
+
+    Every file is cached with its ``(mtime, size)`` signature; ``load`` only
+    re-reads files whose signature moved, so a Reload of an unchanged catalog
+    is a handful of ``stat`` calls. Fragments are read on the first ``load``
+    rather than on demand: search, the scheduler and the tree all need every
+    entry, so there is nothing to defer past start-up.
+
+    Only ``commands`` and ``workflows`` are merged from fragments; any
+    ``settings`` or ``hosts`` a fragment holds are ignored by ``load`` but kept
+    in the file when ``save`` rewrites it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fragment_dir = os.path.join(os.path.dirname(path) or ".", FRAGMENT_DIR)
+        self._parsed: dict[str, tuple[tuple[int, int] | None, dict]] = {}
+        # Fragments that failed to parse on the last load, with the reason.
+        self.errors: dict[str, str] = {}
+
+    def fragment_paths(self) -> list[str]:
+        return sorted(glob.glob(os.path.join(self.fragment_dir, "*.json")))
+
+    def signature(self) -> tuple:
+        """Signature of every file the catalog is made of."""
+        return tuple((p, file_signature(p)) for p in [self.path, *self.fragment_paths()])
+
+    def changed_on_disk(self) -> bool:
+        return any(
+            p not in self._parsed or self._parsed[p][0] != sig
+            for p, sig in self.signature()
+        ) or any(p != self.path and not os.path.exists(p) for p in self._parsed)
+
+    def _parse(self, path: str) -> dict:
+        sig = file_signature(path)
+        cached = self._parsed.get(path)
+        if cached is not None and sig is not None and cached[0] == sig:
+            return cached[1]
+        catalog = load_commands(path)
+        self._parsed[path] = (sig, catalog)
+        return catalog
+
+    def load(self) -> dict:
+        """Return a fresh catalog; entries are copies callers may mutate."""
+        main = self._parse(self.path)
+        commands = [dict(e) for e in main["commands"]]
+        workflows = [dict(w) for w in main.get("workflows", [])]
+        fragments = self.fragment_paths()
+        self.errors = {}
+        for path in fragments:
+            try:
+                part = self._parse(path)
+            except Exception as e:
+                # One broken fragment should not take the whole catalog down.
+                self.errors[path] = str(e)
+                continue
+            commands.extend({**e, SOURCE_KEY: path} for e in part["commands"])
+            workflows.extend({**w, SOURCE_KEY: path} for w in part.get("workflows", []))
+        for path in list(self._parsed):
+            if path != self.path and path not in fragments:
+                del self._parsed[path]
+
+        catalog: dict = {"commands": commands}
+        if "settings" in main:
+            catalog["settings"] = dict(main["settings"])
+        if workflows or "workflows" in main:
+            catalog["workflows"] = workflows
+        if "hosts" in main:
+            catalog["hosts"] = [dict(h) for h in main["hosts"]]
+        return catalog
+
+    def save(self, catalog: dict) -> None:
+        """Write each entry back to the file it came from.
+
+        The main file is always written; fragments only when their entries
+        actually changed, keeping whatever else the fragment holds.
+        """
+        by_source: dict[str | None, dict] = {}
+        for key in ("commands", "workflows"):
+            for item in catalog.get(key, []):
+                source = item.get(SOURCE_KEY)
+                clean = {k: v for k, v in item.items() if k != SOURCE_KEY}
+                by_source.setdefault(source, {"commands": []}).setdefault(key, []).append(clean)
+
+        fragments = [p for p in self._parsed if p != self.path]
+        for path in sorted(set(fragments) | {s for s in by_source if s}):
+            data = by_source.get(path, {"commands": []})
+            cached = self._parsed.get(path)
+            if cached is not None:
+                old = cached[1]
+                if old["commands"] == data["commands"] and old.get("workflows", []) == data.get("workflows", []):
+                    continue
+                data = {**{k: v for k, v in old.items() if k not in ("commands", "workflows")}, **data}
+            self._write(path, data)
+
+        main: dict = by_source.get(None, {"commands": []})
+        if isinstance(catalog.get("settings"), dict):
+            main["settings"] = catalog["settings"]
+        if isinstance(catalog.get("hosts"), list):
+            main["hosts"] = catalog["hosts"]
+        self._write(self.path, main)
+
+    def _write(self, path: str, data: dict) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        save_commands(path, data)
+        # Remember what we wrote so our own save does not look like an
+        # external change to the watcher.
+        self._parsed[path] = (file_signature(path), normalize_catalog(data))
@@ -0,0 +1,72 @@
+"""Per-job output channels.
+
+Every job gets its own bounded buffer of ``(tag, text)`` blocks, so the log
+view can show a single job without re-filtering the shared log. Buffers are
+plain Python data; nothing here touches Tk, and a channel that is not on
+screen costs only the append.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict, deque
+
+
+class JobChannel:
+    def __init__(self, job_id: int, name: str, max_lines: int):
+        self.job_id = job_id
+        self.name = name
+        self.max_lines = max_lines
+        self.blocks: deque[tuple[str, str, int]] = deque()
+        self.line_count = 0
+
+    def append(self, tag: str, text: str) -> None:
+        lines = text.count("\n") + 1
+        self.blocks.append((tag, text, lines))
+        self.line_count += lines
+        # Drop whole blocks from the front once well over the limit.
+        if self.line_count > self.max_lines + max(100, self.max_lines // 10):
+            while self.blocks and self.line_count > self.max_lines:
+                _tag, _text, n = self.blocks.popleft()
+                self.line_count -= n
+
+
+class ChannelStore:
+    def __init__(self, max_lines_per_job: int = 5000, max_jobs: int = 30):
+        self.max_lines_per_job = max_lines_per_job
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._channels: OrderedDict[int, JobChannel] = OrderedDict()
+        # Bumped whenever a channel is opened or evicted, so the UI can tell
+        # cheaply whether its channel picker is stale.
+        self.version = 0
+
+    def open(self, job_id: int, name: str) -> None:
+        with self._lock:
+            if job_id in self._channels:
+                return
+            self._channels[job_id] = JobChannel(job_id, name, self.max_lines_per_job)
+            while len(self._channels) > self.max_jobs:
+                self._channels.popitem(last=False)
+            self.version += 1
+
+    def append(self, job_id: int, tag: str, text: str) -> None:
+        with self._lock:
+            channel = self._channels.get(job_id)
+            if channel is not None:
+                channel.append(tag, text)
+
+    def blocks(self, job_id: int) -> list[tuple[str, str]]:
+        with self._lock:
+            channel = self._channels.get(job_id)
+            if channel is None:
+                return []
+            return [(tag, text) for tag, text, _n in channel.blocks]
+
+    def jobs(self) -> list[tuple[int, str]]:
+        with self._lock:
+            return [(c.job_id, c.name) for c in self._channels.values()]
+
+    def __contains__(self, job_id: object) -> bool:
+        with self._lock:
+            return job_id in self._channels
@@ -0,0 +1,499 @@
+"""Headless command line for the catalog.
+
+Lists and runs commands.json entries without ever importing Tk or
+customtkinter, e.g. from a script or a systemd timer:
+
+    sm list
+    sm run "System: Cek Disk Usage (df)" "DNF: Full Upgrade System" --summary -
+    sm run --parallel "WARP: Status" "System: Cek Disk Usage (df)"
+    sm search "avc: denied"
+    sm fleet "DNF: Full Upgrade System" --hosts web1,db1
+
+Execution reuses the GUI's engine and scheduler, so per-entry ``lock`` and
+``exclusive`` options apply here too. Those modules are imported only when
+something is actually run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import sm_catalog
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sm", description="Fedora Manager Pro — headless catalog runner.")
+    parser.add_argument("--commands", metavar="PATH", help="commands.json to use (default: same file as the GUI)")
+    sub = parser.add_subparsers(dest="action", metavar="{list,run,history,search,fleet}")
+
+    p_list = sub.add_parser("list", help="list catalog entries")
+    p_list.add_argument("--json", action="store_true", help="print entries as JSON")
+    p_list.add_argument("--category", help="only entries of this category")
+
+    p_run = sub.add_parser("run", help="run one or more entries by name")
+    p_run.add_argument("names", nargs="+", metavar="NAME")
+    p_run.add_argument("-p", "--parallel", action="store_true", help="run entries at the same time")
+    p_run.add_argument("-j", "--jobs", type=int, metavar="N", help="max parallel jobs (default: settings.max_parallel_jobs)")
+    p_run.add_argument("--fail-fast", action="store_true", help="skip entries not yet started after the first failure")
+    p_run.add_argument("--summary", metavar="PATH", help="write a JSON summary to PATH ('-' for stdout; command output then goes to stderr)")
+    p_run.add_argument("-q", "--quiet", action="store_true", help="do not stream command output")
+    p_run.add_argument("--no-history", action="store_true", help="do not record the runs in the run history or output archive")
+
+    p_history = sub.add_parser("history", help="show per-command duration statistics")
+    p_history.add_argument("--json", action="store_true", help="print statistics as JSON")
+    p_history.add_argument("--runs", metavar="NAME", help="list the latest runs of one entry instead")
+
+    p_search = sub.add_parser("search", help="search the output archive of past runs")
+    p_search.add_argument("pattern")
+    p_search.add_argument("-E", "--regex", action="store_true", help="treat PATTERN as a regular expression")
+    p_search.add_argument("-s", "--case-sensitive", action="store_true", help="match case exactly")
+    p_search.add_argument("--json", action="store_true", help="print matches as JSON")
+
+    p_fleet = sub.add_parser("fleet", help="run one entry on the hosts listed in commands.json")
+    p_fleet.add_argument("name", metavar="NAME")
+    p_fleet.add_argument("--hosts", metavar="H1,H2", help="only these hosts (default: all)")
+    p_fleet.add_argument("-j", "--jobs", type=int, metavar="N", help="hosts at a time (default: settings.fleet_parallel)")
+    p_fleet.add_argument("--transport", choices=["ssh", "local"], help="default: settings.fleet_transport or ssh")
+    p_fleet.add_argument("--summary", metavar="PATH", help="write a JSON summary to PATH ('-' for stdout; command output then goes to stderr)")
+    p_fleet.add_argument("-q", "--quiet", action="store_true", help="do not stream command output")
+
+    # Started by the GUI through pkexec; see sm_helper.
+    p_helper = sub.add_parser("helper")
+    p_helper.add_argument("--socket", required=True)
+    p_helper.add_argument("--uid", type=int, required=True)
+    return parser
+
+
+def find_entries(catalog: dict, names: list[str]) -> list[dict]:
+    """Resolve names exactly, falling back to a case-insensitive match."""
+    commands = catalog.get("commands", [])
+    by_name = {c["name"]: c for c in commands}
+    by_lower = {c["name"].lower(): c for c in commands}
+    found: list[dict] = []
+    missing: list[str] = []
+    for name in names:
+        entry = by_name.get(name) or by_lower.get(name.strip().lower())
+        if entry is None:
+            missing.append(name)
+        else:
+            found.append(entry)
+    if missing:
+        raise KeyError(", ".join(repr(m) for m in missing))
+    return found
+
+
+class _Streamer:
+    """Write job output line by line, prefixed with the entry name when useful."""
+
+    def __init__(self, prefix: str | None, quiet: bool, archive=None, stdout=None):
+        self.prefix = prefix
+        self.quiet = quiet
+        self.archive = archive
+        self.stdout = stdout
+        self._partial = {"stdout": "", "stderr": ""}
+        self._lock = threading.Lock()
+        self.out_bytes = 0
+        self.out_lines = 0
+
+    def feed(self, text: str, stream: str) -> None:
+        self.out_bytes += len(text.encode("utf-8", "replace"))
+        self.out_lines += text.count("\n")
+        head, sep, self._partial[stream] = (self._partial[stream] + text).rpartition("\n")
+        if sep:
+            self._emit(head, stream)
+
+    def flush(self) -> None:
+        for stream, rest in self._partial.items():
+            if rest:
+                self._emit(rest, stream)
+            self._partial[stream] = ""
+
+    def _emit(self, block: str, stream: str) -> None:
+        if self.archive is not None:
+            self.archive.append("stderr" if stream == "stderr" else "info", block)
+        if self.quiet:
+            return
+        if self.prefix:
+            block = "\n".join(f"[{self.prefix}] {line}" for line in block.split("\n"))
+        out = sys.stderr if stream == "stderr" else self.stdout or sys.stdout
+        with self._lock:
+            try:
+                out.write(block + "\n")
+                out.flush()
+            except BrokenPipeError:
+                # Reader went away (sm run ... | head); keep running, stop writing.
+                self.quiet = True
+
+
+def run_entries(
+    entries: list[dict],
+    parallel: bool = False,
+    max_jobs: int = 4,
+    fail_fast: bool = False,
+    quiet: bool = False,
+    history=None,
+    archive_dir: str | None = None,
+    stdout=None,
+) -> list[dict]:
+    """Run catalog entries and return one result dict per entry, in input order.
+
+    ``history`` is an optional ``HistoryStore`` that gets one record per run;
+    with ``archive_dir`` each run's output is also archived (see sm_archive).
+    ``stdout`` redirects the commands' stdout (default ``sys.stdout``).
+    """
+    from sm_engine import ExecutionEngine
+    from sm_jobs import PENDING, JobScheduler, terminate_process
+    from sm_limits import wrap_command
+
+    engine = ExecutionEngine()
+    results: dict[tuple[str, str], dict] = {}
+    by_key = {(e["name"], e["command"]): e for e in entries}
+    for entry in entries:
+        results.setdefault((entry["name"], entry["command"]), {
+            "name": entry["name"],
+            "command": entry["command"],
+            "status": "skipped",
+            "exit_code": None,
+        })
+    done = threading.Condition()
+    prefix_output = parallel and len(entries) > 1
+    scheduler: JobScheduler
+
+    def runner(job):
+        result = results[job.key]
+        result["started"] = time.time()
+        archive = None
+        if archive_dir is not None:
+            from sm_archive import RunArchiveWriter, new_run_id
+
+            try:
+                archive = RunArchiveWriter(archive_dir, new_run_id(), job.name, job.cmd, result["started"])
+            except OSError:
+                archive = None
+        streamer = _Streamer(job.name if prefix_output else None, quiet, archive, stdout)
+        start = time.monotonic()
+        entry = by_key[job.key]
+        cmd, notes = wrap_command(job.cmd, entry)
+        for note in notes:
+            print(f"sm: {job.name}: {note}", file=sys.stderr)
+        timeout = entry.get("timeout")
+        deadline: list[threading.Timer] = []
+
+        def expire(process) -> None:
+            result["timed_out"] = True
+            terminate_process(process)
+
+        def spawned(process) -> None:
+            job.attach(process)
+            if timeout:
+                timer = threading.Timer(timeout, expire, (process,))
+                timer.daemon = True
+                timer.start()
+                deadline.append(timer)
+
+        def finished(future) -> None:
+            for timer in deadline:
+                timer.cancel()
+            streamer.flush()
+            if result.get("timed_out"):
+                print(f"sm: {job.name}: timed out after {timeout:g}s", file=sys.stderr)
+            result["duration_s"] = round(time.monotonic() - start, 3)
+            result["finished"] = time.time()
+            try:
+                result["exit_code"] = future.result()
+            except Exception as e:
+                result["exit_code"] = None
+                result["error"] = str(e)
+            if job.cancel_requested:
+                result["status"] = "cancelled"
+            else:
+                result["status"] = "ok" if result["exit_code"] == 0 else "failed"
+            if archive is not None:
+                archive.close(result["exit_code"])
+                result["run_id"] = archive.run_id
+            if history is not None:
+                usage = getattr(job.process, "rusage", None)
+                history.record({
+                    "name": job.name,
+                    "command": job.cmd,
+                    "started": result["started"],
+                    "finished": result["finished"],
+                    "wall_s": result["duration_s"],
+                    "cpu_user_s": usage.ru_utime if usage is not None else None,
+                    "cpu_sys_s": usage.ru_stime if usage is not None else None,
+                    "out_bytes": streamer.out_bytes,
+                    "out_lines": streamer.out_lines,
+                    "exit_code": result["exit_code"],
+                    "status": result["status"],
+                    "run_id": result.get("run_id"),
+                })
+            if result["status"] != "ok" and fail_fast:
+                for other in scheduler.snapshot():
+                    if other.state == PENDING:
+                        scheduler.cancel(other.id)
+
+        future = engine.run_shell(cmd, streamer.feed, on_spawn=spawned)
+        future.add_done_callback(finished)
+        return future
+
+    def changed() -> None:
+        with done:
+            done.notify_all()
+
+    scheduler = JobScheduler(runner, max_workers=max_jobs if parallel else 1, on_change=changed)
+    for entry in entries:
+        # Naming the same entry twice runs it once.
+        scheduler.submit(entry["name"], entry["command"], lock=entry.get("lock"), exclusive=bool(entry.get("exclusive")))
+
+    with done:
+        while scheduler.snapshot():
+            done.wait(0.5)
+    engine.stop()
+    return list(results.values())
+
+
+def show_history(args: argparse.Namespace) -> int:
+    from sm_history import HistoryStore, format_stats_table
+
+    try:
+        store = HistoryStore()
+    except Exception as e:
+        print(f"sm: cannot open run history: {e}", file=sys.stderr)
+        return 2
+    try:
+        if args.runs:
+            data = store.recent_runs(args.runs)
+        else:
+            data = store.command_stats()
+    finally:
+        store.close()
+
+    if args.json:
+        json.dump(data, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    elif args.runs:
+        for run in data:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started"]))
+            print(f"{stamp}  {run['status']:<9} {run['wall_s']:>9.2f}s  exit={run['exit_code']}")
+    else:
+        header, rows = format_stats_table(data)
+        print(header)
+        for line, _slower in rows:
+            print(line)
+    return 0
+
+
+def search_archive(args: argparse.Namespace) -> int:
+    from sm_archive import ArchiveSearch, archive_files, default_archive_dir
+
+    if args.regex:
+        try:
+            re.compile(args.pattern)
+        except re.error as e:
+            print(f"sm: invalid regex: {e}", file=sys.stderr)
+            return 2
+    hits: list[dict] = []
+    done = threading.Event()
+    search = ArchiveSearch()
+    try:
+        search.search(
+            archive_files(default_archive_dir()),
+            args.pattern,
+            on_hits=hits.extend,
+            on_done=lambda _n: done.set(),
+            regex=args.regex,
+            ignore_case=not args.case_sensitive,
+        )
+        done.wait()
+    finally:
+        search.shutdown()
+    hits.sort(key=lambda h: (-(h["started"] or 0), h["line"]))
+
+    if args.json:
+        json.dump(hits, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for hit in hits:
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit["started"])) if hit["started"] else "?"
+            print(f"{stamp}  {hit['name']}:{hit['line']}: {hit['text']}")
+    return 0 if hits else 1
+
+
+def run_fleet(args: argparse.Namespace, catalog: dict) -> int:
+    from sm_fleet import format_summary, host_entries, host_state, make_transport
+
+    try:
+        entry = find_entries(catalog, [args.name])[0]
+    except KeyError as e:
+        print(f"sm: unknown entry: {e.args[0]}", file=sys.stderr)
+        return 2
+    hosts = catalog.get("hosts", [])
+    if args.hosts:
+        wanted = [h.strip() for h in args.hosts.split(",") if h.strip()]
+        known = {h["name"]: h for h in hosts}
+        missing = [h for h in wanted if h not in known]
+        if missing:
+            print(f"sm: unknown host: {', '.join(missing)}", file=sys.stderr)
+            return 2
+        hosts = [known[h] for h in wanted]
+    if not hosts:
+        print("sm: no hosts; add a \"hosts\" list to commands.json", file=sys.stderr)
+        return 2
+
+    settings = catalog.get("settings") or {}
+    transport = make_transport(args.transport or settings.get("fleet_transport"))
+    max_jobs = args.jobs
+    if max_jobs is None:
+        try:
+            max_jobs = int(settings.get("fleet_parallel", 8))
+        except (TypeError, ValueError):
+            max_jobs = 8
+
+    items = host_entries(entry, hosts, transport)
+    started = time.time()
+    results = run_entries(items, parallel=True, max_jobs=max(1, max_jobs), quiet=args.quiet, stdout=_output_stream(args))
+    rows = []
+    for item, result in zip(items, results):
+        rows.append({
+            "host": item["host"],
+            "state": host_state(result["exit_code"], result["status"] == "cancelled", transport.name),
+            "exit_code": result["exit_code"],
+            "duration": result.get("duration_s"),
+        })
+    ok = all(r["state"] == "ok" for r in rows)
+
+    for line in format_summary(rows):
+        print(line, file=sys.stderr)
+    if args.summary:
+        _write_summary(args.summary, {"ok": ok, "entry": entry["name"], "started": started, "duration_s": round(time.time() - started, 3), "hosts": rows})
+    return 0 if ok else 1
+
+
+def _output_stream(args):
+    """Where streamed command stdout goes: stderr when the summary owns stdout."""
+    return sys.stderr if args.summary == "-" else None
+
+
+def _write_summary(path: str, summary: dict) -> None:
+    if path == "-":
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main(argv: list[str] | None = None) -> int:
+    try:
+        return _main(argv)
+    except BrokenPipeError:
+        # stdout closed early (sm list | head): no traceback. Point stdout at
+        # /dev/null so the flush at interpreter exit does not fail again.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+
+
+def _main(argv: list[str] | None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.action is None:
+        parser.print_help()
+        return 2
+    if args.action == "helper":
+        from sm_helper import serve
+
+        return serve(args.socket, args.uid)
+
+    path = args.commands or sm_catalog.get_commands_path()
+    try:
+        catalog = sm_catalog.CatalogStore(path).load()
+    except Exception as e:
+        print(f"sm: failed to load {path}: {e}", file=sys.stderr)
+        return 2
+
+    if args.action == "history":
+        return show_history(args)
+    if args.action == "search":
+        return search_archive(args)
+    if args.action == "fleet":
+        return run_fleet(args, catalog)
+
+    if args.action == "list":
+        entries = catalog["commands"]
+        if args.category:
+            entries = [e for e in entries if sm_catalog.category_of(e["name"]).lower() == args.category.lower()]
+        if args.json:
+            entries = [{k: v for k, v in e.items() if k != sm_catalog.SOURCE_KEY} for e in entries]
+            json.dump(entries, sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write("\n")
+        else:
+            for entry in entries:
+                print(entry["name"])
+        return 0
+
+    try:
+        entries = find_entries(catalog, args.names)
+    except KeyError as e:
+        print(f"sm: unknown entry: {e.args[0]}", file=sys.stderr)
+        return 2
+
+    max_jobs = args.jobs
+    if max_jobs is None:
+        try:
+            max_jobs = int((catalog.get("settings") or {}).get("max_parallel_jobs", 4))
+        except (TypeError, ValueError):
+            max_jobs = 4
+
+    history = None
+    archive_dir = None
+    if not args.no_history:
+        if (catalog.get("settings") or {}).get("archive_output", True):
+            from sm_archive import default_archive_dir
+
+            archive_dir = default_archive_dir()
+
+        from sm_history import HistoryStore
+
+        try:
+            history = HistoryStore()
+        except Exception as e:
+            print(f"sm: run history disabled: {e}", file=sys.stderr)
+
+    started = time.time()
+    results = run_entries(
+        entries,
+        parallel=args.parallel,
+        max_jobs=max_jobs,
+        fail_fast=args.fail_fast,
+        quiet=args.quiet,
+        history=history,
+        archive_dir=archive_dir,
+        stdout=_output_stream(args),
+    )
+    if history is not None:
+        history.close()
+    if archive_dir is not None:
+        from sm_archive import prune_archive
+
+        try:
+            archive_max_mb = int((catalog.get("settings") or {}).get("archive_max_mb", 256))
+        except (TypeError, ValueError):
+            archive_max_mb = 256
+        prune_archive(archive_dir, max(1, archive_max_mb) * 1024 * 1024)
+    ok = all(r["status"] == "ok" for r in results)
+
+    if args.summary:
+        _write_summary(args.summary, {"ok": ok, "started": started, "duration_s": round(time.time() - started, 3), "results": results})
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,711 @@
 import customtkinter as ctk
 import tkinter as tk
+from tkinter import font as tkfont
 from tkinter import messagebox
 
-import subprocess
-import json
-import os
-import sys
-import shutil
 import threading
 import queue
+import time
+import concurrent.futures
+import re
+from collections import Counter
+from typing import Callable
+
+import sm_catalog
+from sm_archive import ArchiveSearch, RunArchiveWriter, archive_files, default_archive_dir, new_run_id, prune_archive, read_window
+from sm_cache import ResultCache, default_cache_path, format_age
+from sm_channels import ChannelStore
+from sm_engine import ExecutionEngine
+from sm_fleet import FleetRun, make_transport
+from sm_helper import HelperSession, strip_pkexec
+from sm_instance import InstanceServer
+from sm_history import HistoryStore, format_stats_table
+from sm_jobs import CANCELLED, PENDING, RUNNING, Job, JobScheduler, terminate_process
+from sm_limits import describe_limits, wrap_command
+from sm_metrics import MetricsSampler, format_bytes
+from sm_recurring import RecurringTimer, describe_schedule
+from sm_scrollback import SpillLog
+from sm_search import CommandIndex
+from sm_term import ANSI_COLOURS, TerminalStream
+from sm_watch import CatalogWatcher
+from sm_workflow import WorkflowRun
+
+
+class VirtualCommandList(ctk.CTkFrame):
+    """Scrollable list of command buttons that keeps only the visible rows as widgets.
+
+    A small pool of buttons is placed at fixed row offsets and relabelled as
+    the view scrolls, so a category with thousands of entries costs the same
+    number of widgets as a screenful.
+    """
+
+    ROW_HEIGHT = 36
+    BUTTON_HEIGHT = 28
+    WHEEL_ROWS = 3
+
+    def __init__(self, master, on_activate: Callable[[str, str], None], **kwargs):
+        super().__init__(master, **kwargs)
+        self._on_activate = on_activate
+        self._items: list[tuple[str, str]] = []
+        self._offset = 0
+        self._view_height = 0
+
+        # Pool of recycled row buttons and the item each one currently shows.
+        self._slots: list[ctk.CTkButton] = []
+        self._slot_items: list[tuple[str, str] | None] = []
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self._viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self._viewport.grid(row=0, column=0, sticky="nsew")
+        self._scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self._scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self._viewport.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self._viewport)
+
+    def set_items(self, items: list[tuple[str, str]]) -> None:
+        if items == self._items:
+            return
+        self._items = list(items)
+        self._clamp_offset()
+        self._render()
+
+    # -------------------------
+    # Layout
+    # -------------------------
+    def _bind_wheel(self, widget) -> None:
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            widget.bind(seq, self._on_wheel, add="+")
+
+    def _content_height(self) -> int:
+        return len(self._items) * self.ROW_HEIGHT
+
+    def _clamp_offset(self) -> None:
+        max_offset = max(0, self._content_height() - self._view_height)
+        self._offset = max(0, min(self._offset, max_offset))
+
+    def _on_resize(self, event) -> None:
+        height = self._viewport._reverse_widget_scaling(event.height)
+        if height == self._view_height:
+            return
+        self._view_height = height
+
+        # Enough slots to cover the viewport plus one partially visible row.
+        needed = height // self.ROW_HEIGHT + 2
+        while len(self._slots) < needed:
+            slot = len(self._slots)
+            btn = ctk.CTkButton(
+                self._viewport,
+                text="",
+                anchor="w",
+                height=self.BUTTON_HEIGHT,
+                fg_color="#0f1b2e",
+                hover_color="#12223a",
+                command=lambda i=slot: self._on_slot_click(i),
+            )
+            self._bind_wheel(btn)
+            self._slots.append(btn)
+            self._slot_items.append(None)
+        for btn in self._slots[needed:]:
+            btn.destroy()
+        del self._slots[needed:]
+        del self._slot_items[needed:]
+
+        self._clamp_offset()
+        self._render()
+
+    def _render(self) -> None:
+        first = self._offset // self.ROW_HEIGHT
+        shift = self._offset % self.ROW_HEIGHT
+        for i, btn in enumerate(self._slots):
+            idx = first + i
+            if idx >= len(self._items):
+                if self._slot_items[i] is not None:
+                    btn.place_forget()
+                    self._slot_items[i] = None
+                continue
+            item = self._items[idx]
+            if self._slot_items[i] != item:
+                btn.configure(text=item[0])
+                self._slot_items[i] = item
+            btn.place(x=0, y=i * self.ROW_HEIGHT - shift, relwidth=1.0)
+
+        total = self._content_height()
+        if total <= self._view_height or total == 0:
+            self._scrollbar.set(0.0, 1.0)
+        else:
+            self._scrollbar.set(self._offset / total, (self._offset + self._view_height) / total)
+
+    # -------------------------
+    # Events
+    # -------------------------
+    def _scroll_to(self, offset: int) -> None:
+        old = self._offset
+        self._offset = offset
+        self._clamp_offset()
+        if self._offset != old:
+            self._render()
+
+    def _on_scrollbar(self, action: str, value, unit: str | None = None) -> None:
+        if action == "moveto":
+            self._scroll_to(int(float(value) * self._content_height()))
+        elif action == "scroll":
+            step = self._view_height if unit == "pages" else self.ROW_HEIGHT
+            self._scroll_to(self._offset + int(value) * step)
+
+    def _on_wheel(self, event) -> None:
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            direction = -1
+        else:
+            direction = 1
+        self._scroll_to(self._offset + direction * self.WHEEL_ROWS * self.ROW_HEIGHT)
+
+    def _on_slot_click(self, slot: int) -> None:
+        item = self._slot_items[slot] if slot < len(self._slot_items) else None
+        if item is not None:
+            self._on_activate(item[1], item[0])
+
+
+class CommandPalette(ctk.CTkToplevel):
+    """Ctrl+K popup: type to search the catalog, Up/Down to pick, Enter to run."""
+
+    MAX_RESULTS = 12
+
+    def __init__(self, master, index: CommandIndex, on_run: Callable[[str, str], None]):
+        super().__init__(master)
+        self.title("Command Palette")
+        self.geometry("640x460")
+        self.transient(master)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self._index = index
+        self._on_run = on_run
+        self._results: list[tuple[str, str]] = []
+        self._cursor = 0
+
+        self.entry = ctk.CTkEntry(self, placeholder_text="Search commands by name or command text...")
+        self.entry.pack(fill="x", padx=12, pady=(12, 8))
+        self.entry.bind("<KeyRelease>", self._on_key_release)
+        self.entry.bind("<Up>", lambda e: self._move(-1))
+        self.entry.bind("<Down>", lambda e: self._move(1))
+        self.entry.bind("<Return>", lambda e: self._run(self._cursor))
+        self.entry.bind("<Escape>", lambda e: self.close())
+
+        self.rows: list[ctk.CTkButton] = []
+        for i in range(self.MAX_RESULTS):
+            btn = ctk.CTkButton(self, text="", anchor="w", height=28, fg_color="#0f1b2e", hover_color="#12223a", command=lambda i=i: self._run(i))
+            btn.pack(fill="x", padx=12, pady=2)
+            self.rows.append(btn)
+
+        self.status = ctk.CTkLabel(self, text="", text_color=("#6b7280", "#a3b2d6"), anchor="w")
+        self.status.pack(fill="x", padx=12, pady=(4, 10))
+
+    def open(self) -> None:
+        self.deiconify()
+        self.lift()
+        self.entry.focus_set()
+        self.entry.select_range(0, tk.END)
+        self._search()
+
+    def close(self) -> None:
+        self.withdraw()
+
+    def _on_key_release(self, event) -> None:
+        if event.keysym in ("Up", "Down", "Return", "Escape"):
+            return
+        self._search()
+
+    def _search(self) -> None:
+        started = time.perf_counter()
+        self._results = self._index.search(self.entry.get() or "", self.MAX_RESULTS)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._cursor = 0
+        self._render()
+        if self.entry.get().strip():
+            self.status.configure(text=f"{len(self._results)} match(es) in {elapsed_ms:.1f} ms • {len(self._index)} commands")
+        else:
+            self.status.configure(text=f"{len(self._index)} commands • Enter runs, Esc closes")
+
+    def _render(self) -> None:
+        for i, btn in enumerate(self.rows):
+            if i < len(self._results):
+                name, cmd = self._results[i]
+                short = cmd if len(cmd) <= 60 else cmd[:57] + "..."
+                selected = i == self._cursor
+                btn.configure(
+                    text=f"{name}    —    {short}",
+                    state="normal",
+                    fg_color="#3b82f6" if selected else "#0f1b2e",
+                    hover_color="#2563eb" if selected else "#12223a",
+                )
+            else:
+                btn.configure(text="", state="disabled", fg_color="transparent")
+
+    def _move(self, step: int) -> None:
+        if self._results:
+            self._cursor = (self._cursor + step) % len(self._results)
+            self._render()
+
+    def _run(self, i: int) -> None:
+        if 0 <= i < len(self._results):
+            name, cmd = self._results[i]
+            self.close()
+            self._on_run(cmd, name)
+
+
+class HistoryWindow(ctk.CTkToplevel):
+    """Per-command duration statistics from the run history."""
+
+    SORTS = {
+        "Name": lambda s: s["name"].lower(),
+        "p95 (slowest first)": lambda s: -(s["p95_s"] or 0),
+        "Trend (slowing first)": lambda s: -(s["trend"] if s["trend"] is not None else float("-inf")),
+        "Last run": lambda s: -s["last_started"],
+    }
+    def __init__(self, master, store: HistoryStore):
+        super().__init__(master)
+        self.title("Run History")
+        self.geometry("900x480")
+        self.transient(master)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self._store = store
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=12, pady=(12, 8))
+        ctk.CTkLabel(bar, text="Sort").pack(side="left", padx=(0, 8))
+        self.sort_menu = ctk.CTkOptionMenu(bar, values=list(self.SORTS), command=lambda _v: self.refresh(), width=200)
+        self.sort_menu.pack(side="left")
+        self.sort_menu.set("Trend (slowing first)")
+        ctk.CTkButton(bar, text="Refresh", width=90, command=self.refresh).pack(side="right")
+
+        self.table = ctk.CTkTextbox(self, font=ctk.CTkFont(family="monospace", size=12), wrap="none")
+        self.table.pack(fill="both", expand=True, padx=12, pady=(0, 12))
+        self.table._textbox.tag_config("slower", foreground="#f59e0b")
+        self.table._textbox.tag_config("head", foreground="#9fb2d6")
+
+    def open(self) -> None:
+        self.deiconify()
+        self.lift()
+        self.refresh()
+
+    def close(self) -> None:
+        self.withdraw()
+
+    def refresh(self) -> None:
+        # Only what is committed; runs still queued for the writer show up
+        # when the tick sees ``HistoryStore.committed``.
+        stats = sorted(self._store.command_stats(), key=self.SORTS[self.sort_menu.get()])
+        tk_text = self.table._textbox
+        tk_text.configure(state="normal")
+        tk_text.delete("1.0", tk.END)
+        header, rows = format_stats_table(stats)
+        tk_text.insert(tk.END, header + "\n", "head")
+        if not stats:
+            tk_text.insert(tk.END, "No runs recorded yet.\n", "head")
+        for line, slower in rows:
+            tk_text.insert(tk.END, line + "\n", "slower" if slower else ())
+        tk_text.configure(state="disabled")
+
+
+class ArchiveSearchWindow(ctk.CTkToplevel):
+    """Search the output archive of past runs; click a hit to open it at that line."""
+
+    MAX_HITS = 2000
+
+    def __init__(self, master, search: ArchiveSearch, archive_dir: str):
+        super().__init__(master)
+        self.title("Search Output Archive")
+        self.geometry("900x520")
+        self.transient(master)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self._search = search
+        self._archive_dir = archive_dir
+        # Filled from pool callback threads, drained by _poll on the Tk thread.
+        self._incoming: queue.Queue[tuple[str, object]] = queue.Queue()
+        self._hits: list[dict] = []
+        self._searching = False
+        self._started = 0.0
+        self.viewer: ArchiveViewer | None = None
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=12, pady=(12, 8))
+        bar.grid_columnconfigure(0, weight=1)
+        self.entry = ctk.CTkEntry(bar, placeholder_text="Text to find in past output (e.g. avc: denied)")
+        self.entry.grid(row=0, column=0, sticky="ew", padx=(0, 10))
+        self.entry.bind("<Return>", lambda e: self.start())
+        self.entry.bind("<Escape>", lambda e: self.close())
+        self.regex_var = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(bar, text="Regex", variable=self.regex_var, width=70).grid(row=0, column=1, padx=(0, 10))
+        ctk.CTkButton(bar, text="Search", width=90, command=self.start).grid(row=0, column=2)
+
+        self.results = VirtualCommandList(self, on_activate=self._open_hit, fg_color="transparent")
+        self.results.pack(fill="both", expand=True, padx=12)
+        self.status = ctk.CTkLabel(self, text="", text_color=("#6b7280", "#a3b2d6"), anchor="w")
+        self.status.pack(fill="x", padx=12, pady=(4, 10))
+
+    def open(self) -> None:
+        self.deiconify()
+        self.lift()
+        self.entry.focus_set()
+
+    def close(self) -> None:
+        self._search.cancel()
+        self._searching = False
+        self.withdraw()
+
+    def start(self) -> None:
+        pattern = self.entry.get()
+        if not pattern.strip():
+            return
+        if self.regex_var.get():
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                self.status.configure(text=f"Invalid regex: {e}")
+                return
+        paths = archive_files(self._archive_dir)
+        self._hits = []
+        self._incoming = queue.Queue()
+        incoming = self._incoming
+        self.results.set_items([])
+        self._started = time.perf_counter()
+        self.status.configure(text=f"Searching {len(paths)} archived runs...")
+        self._search.search(
+            paths,
+            pattern,
+            on_hits=lambda hits: incoming.put(("hits", hits)),
+            on_done=lambda n: incoming.put(("done", n)),
+            regex=self.regex_var.get(),
+        )
+        if not self._searching:
+            self._searching = True
+            self.after(50, self._poll)
+
+    def _poll(self) -> None:
+        done = None
+        changed = False
+        while True:
+            try:
+                kind, payload = self._incoming.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "done":
+                done = payload
+            elif len(self._hits) < self.MAX_HITS:
+                self._hits.extend(payload[: self.MAX_HITS - len(self._hits)])
+                changed = True
+        if changed:
+            # Newest runs first, then by line.
+            self._hits.sort(key=lambda h: (-(h["started"] or 0), h["line"]))
+            self.results.set_items([(self._label(h), str(i)) for i, h in enumerate(self._hits)])
+        elapsed = time.perf_counter() - self._started
+        if done is not None:
+            self._searching = False
+            capped = " (capped)" if len(self._hits) >= self.MAX_HITS else ""
+            self.status.configure(text=f"{len(self._hits)} match(es){capped} in {done} runs • {elapsed:.2f}s • click a match to open it")
+            return
+        if changed:
+            self.status.configure(text=f"{len(self._hits)} match(es) so far... {elapsed:.1f}s")
+        if self._searching:
+            self.after(50, self._poll)
+
+    @staticmethod
+    def _label(hit: dict) -> str:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit["started"])) if hit["started"] else "?"
+        text = hit["text"].strip()
+        if len(text) > 90:
+            text = text[:87] + "..."
+        return f"{when}  {hit['name']}  :{hit['line']}  {text}"
+
+    def _open_hit(self, key: str, _label: str) -> None:
+        hit = self._hits[int(key)]
+        if self.viewer is None or not self.viewer.winfo_exists():
+            self.viewer = ArchiveViewer(self)
+        self.viewer.show(hit)
+
+
+class ArchiveViewer(ctk.CTkToplevel):
+    """Shows a window of archived output around one line, read in the background."""
+
+    BEFORE = 200
+    AFTER = 300
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.geometry("900x560")
+        self.protocol("WM_DELETE_WINDOW", self.withdraw)
+        self.title_label = ctk.CTkLabel(self, text="", anchor="w", font=ctk.CTkFont(weight="bold"))
+        self.title_label.pack(fill="x", padx=12, pady=(12, 6))
+        self.text = ctk.CTkTextbox(self, font=ctk.CTkFont(family="monospace", size=12), wrap="none")
+        self.text.pack(fill="both", expand=True, padx=12, pady=(0, 12))
+        self._tk = self.text._textbox
+        self._tk.tag_config("lineno", foreground="#64748b")
+        self._tk.tag_config("stderr", foreground="#f59e0b")
+        self._tk.tag_config("match", background="#1e3a8a")
+        self._result: queue.Queue = queue.Queue()
+        self._request = 0
+
+    def show(self, hit: dict) -> None:
+        self._request += 1
+        request = self._request
+        self.title(f"{hit['name']} — run {hit['run_id']}")
+        self.title_label.configure(text=f"{hit['name']} — line {hit['line']} (loading...)")
+        self.deiconify()
+        self.lift()
+
+        def load() -> None:
+            try:
+                self._result.put((request, hit, read_window(hit["path"], hit["line"], self.BEFORE, self.AFTER), None))
+            except Exception as e:
+                self._result.put((request, hit, None, e))
+
+        threading.Thread(target=load, name="archive-view", daemon=True).start()
+        self.after(30, self._poll)
+
+    def _poll(self) -> None:
+        try:
+            request, hit, window, error = self._result.get_nowait()
+        except queue.Empty:
+            self.after(30, self._poll)
+            return
+        if request != self._request:
+            return
+        self._tk.configure(state="normal")
+        self._tk.delete("1.0", tk.END)
+        if error is not None:
+            self.title_label.configure(text=f"Cannot read archive: {error}")
+            self._tk.configure(state="disabled")
+            return
+        header, first, lines = window
+        started = header.get("started")
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started)) if started else "?"
+        self.title_label.configure(text=f"{hit['name']} — started {when} — line {hit['line']}")
+        for offset, (tag, text) in enumerate(lines):
+            self._tk.insert(tk.END, f"{first + offset:>7}  ", "lineno")
+            self._tk.insert(tk.END, text + "\n", "stderr" if tag == "stderr" else ())
+        target = f"{hit['line'] - first + 1}.0"
+        self._tk.tag_add("match", target, f"{target} lineend")
+        self._tk.see(target)
+        self._tk.configure(state="disabled")
+
+
+class MetricsWindow(ctk.CTkToplevel):
+    """Live CPU, memory, load, disk and network figures sampled in-process.
+
+    Samples only while shown. Each row keeps the text and sparkline points
+    it last drew and touches its widgets only when those change.
+    """
+
+    INTERVAL_MS = 1000
+    # Mounts are re-read every this many samples.
+    MOUNT_REFRESH = 30
+    SPARK_W = 240
+    SPARK_H = 34
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("System Metrics")
+        self.geometry("620x520")
+        self.transient(master)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.sampler = MetricsSampler()
+        self._after_id: str | None = None
+        self._ticks = 0
+        # key -> {"value": label, "canvas": canvas | None, "line": item id, "text": str, "points": tuple}
+        self._rows: dict[str, dict] = {}
+        self.body = ctk.CTkScrollableFrame(self, fg_color="transparent")
+        self.body.pack(fill="both", expand=True, padx=12, pady=12)
+        self.body.grid_columnconfigure(1, weight=1)
+        self._build_rows()
+
+    def open(self) -> None:
+        self.deiconify()
+        self.lift()
+        if self._after_id is None:
+            self._tick()
+
+    def close(self) -> None:
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        self.withdraw()
+
+    def destroy(self) -> None:
+        self.close()
+        self.sampler.close()
+        super().destroy()
+
+    def _metric_keys(self) -> list[tuple[str, str, bool]]:
+        """``(key, title, sparkline)`` in display order."""
+        keys = [
+            ("cpu", "CPU", True),
+            ("mem", "Memory", True),
+            ("swap", "Swap", False),
+            ("load1", "Load", True),
+            ("net_rx", "Net ↓", True),
+            ("net_tx", "Net ↑", True),
+        ]
+        for point, _device in self.sampler.mounts:
+            keys.append((f"disk:{point}", f"Disk {point}", False))
+            keys.append((f"disk_read:{point}", "  read", True))
+            keys.append((f"disk_write:{point}", "  write", True))
+        return keys
+
+    def _build_rows(self) -> None:
+        for child in self.body.winfo_children():
+            child.destroy()
+        self._rows = {}
+        for row, (key, title, spark) in enumerate(self._metric_keys()):
+            ctk.CTkLabel(self.body, text=title, anchor="w", width=150).grid(row=row, column=0, sticky="w", pady=2)
+            value = ctk.CTkLabel(self.body, text="…", anchor="w", font=ctk.CTkFont(family="monospace", size=12))
+            value.grid(row=row, column=1, sticky="ew", padx=(8, 8))
+            canvas = line = None
+            if spark:
+                canvas = tk.Canvas(self.body, width=self.SPARK_W, height=self.SPARK_H, bg="#0f1b2e", highlightthickness=0)
+                canvas.grid(row=row, column=2, sticky="e", pady=2)
+                line = canvas.create_line(0, self.SPARK_H, 0, self.SPARK_H, fill="#3b82f6", width=1)
+            self._rows[key] = {"value": value, "canvas": canvas, "line": line, "text": "…", "points": ()}
+
+    def _tick(self) -> None:
+        self._after_id = self.after(self.INTERVAL_MS, self._tick)
+        self._ticks += 1
+        if self._ticks % self.MOUNT_REFRESH == 0:
+            before = self.sampler.mounts
+            self.sampler.refresh_mounts()
+            if self.sampler.mounts != before:
+                self._build_rows()
+        current = self.sampler.sample()
+        for key, row in self._rows.items():
+            text = self._format(key, current)
+            if text is not None and text != row["text"]:
+                row["text"] = text
+                row["value"].configure(text=text)
+            if row["canvas"] is not None:
+                self._draw_spark(key, row)
+
+    @staticmethod
+    def _format(key: str, cur: dict[str, float]) -> str | None:
+        if key not in cur and key != "swap":
+            return None
+        if key == "cpu":
+            return f"{cur[key]:5.1f} %"
+        if key == "mem":
+            return f"{cur[key]:5.1f} %  {format_bytes(cur['mem_used'])} / {format_bytes(cur['mem_total'])}"
+        if key == "swap":
+            if not cur.get("swap_total"):
+                return "none"
+            return f"{format_bytes(cur['swap_used'])} / {format_bytes(cur['swap_total'])}"
+        if key == "load1":
+            return f"{cur['load1']:.2f}  {cur['load5']:.2f}  {cur['load15']:.2f}"
+        if key.startswith("disk:"):
+            point = key[5:]
+            return f"{cur[key]:5.1f} %  {format_bytes(cur[f'disk_used:{point}'])} / {format_bytes(cur[f'disk_total:{point}'])}"
+        return f"{format_bytes(cur[key])}/s"
+
+    def _draw_spark(self, key: str, row: dict) -> None:
+        buf = self.sampler.series.get(key)
+        if buf is None or len(buf) < 2:
+            return
+        values = buf.values()
+        # Percentages use a fixed scale; the rest scale to their own peak.
+        top = 100.0 if key in ("cpu", "mem") else max(max(values), 1e-9)
+        step = self.SPARK_W / (buf.capacity - 1)
+        x0 = self.SPARK_W - step * (len(values) - 1)
+        h = self.SPARK_H - 2
+        points: list[int] = []
+        for i, v in enumerate(values):
+            points.append(int(x0 + i * step))
+            points.append(int(self.SPARK_H - 1 - h * min(v, top) / top))
+        points_t = tuple(points)
+        if points_t != row["points"]:
+            row["points"] = points_t
+            row["canvas"].coords(row["line"], *points_t)
+
+
+class FleetDialog(ctk.CTkToplevel):
+    """Pick hosts for running one entry on many machines."""
+
+    def __init__(self, master, entry: dict, hosts: list[dict], parallel: int, on_run: Callable[[dict, list[dict], int], None]):
+        super().__init__(master)
+        self.title("Run on Hosts")
+        self.geometry("460x440")
+        self.transient(master)
+        self._entry = entry
+        self._hosts = hosts
+        self._on_run = on_run
+
+        ctk.CTkLabel(self, text=entry["name"], anchor="w", font=ctk.CTkFont(weight="bold")).pack(fill="x", padx=12, pady=(12, 6))
+        box = ctk.CTkScrollableFrame(self, height=240)
+        box.pack(fill="both", expand=True, padx=12)
+        self._vars: list[tk.BooleanVar] = []
+        for host in hosts:
+            var = tk.BooleanVar(value=True)
+            label = host["name"] if "address" not in host else f"{host['name']}  ({host['address']})"
+            ctk.CTkCheckBox(box, text=label, variable=var).pack(anchor="w", pady=2)
+            self._vars.append(var)
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=12, pady=12)
+        ctk.CTkButton(bar, text="All", width=60, fg_color="#334155", command=lambda: self._set_all(True)).pack(side="left")
+        ctk.CTkButton(bar, text="None", width=60, fg_color="#334155", command=lambda: self._set_all(False)).pack(side="left", padx=(8, 0))
+        ctk.CTkLabel(bar, text="At a time").pack(side="left", padx=(16, 6))
+        self.parallel_entry = ctk.CTkEntry(bar, width=50)
+        self.parallel_entry.insert(0, str(parallel))
+        self.parallel_entry.pack(side="left")
+        ctk.CTkButton(bar, text="Run", width=90, command=self._run).pack(side="right")
+
+    def _set_all(self, value: bool) -> None:
+        for var in self._vars:
+            var.set(value)
+
+    def _run(self) -> None:
+        hosts = [h for h, var in zip(self._hosts, self._vars) if var.get()]
+        if not hosts:
+            return
+        try:
+            parallel = max(1, int(self.parallel_entry.get()))
+        except ValueError:
+            messagebox.showerror("Error", "'At a time' must be a number.", parent=self)
+            return
+        self.destroy()
+        self._on_run(self._entry, hosts, parallel)
 
 
 class ServiceManagerApp:
-    def __init__(self, root: ctk.CTk):
+    # Log renderer tuning: a whole tick (drain, render, trim) fits in the
+    # frame budget, which stays below 16 ms to leave slack for the engine
+    # thread holding the GIL. The drain stops early enough to leave room for
+    # rendering what it took, using the measured render cost per character;
+    # the poll interval backs off towards idle when quiet.
+    LOG_FRAME_BUDGET_S = 0.010
+    LOG_MAX_CHARS_PER_TICK = 256 * 1024
+    # Starting guess for the render cost until the first tick measures it.
+    LOG_RENDER_S_PER_CHAR = 1e-7
+    LOG_POLL_BUSY_MS = 5
+    LOG_POLL_ACTIVE_MS = 30
+    LOG_POLL_IDLE_MS = 250
+    # Scrollback: lines kept in the widget (overridable via "settings" in
+    # commands.json), trimmed in bulk and spilled to the session log file.
+    LOG_MAX_LINES = 5000
+    LOG_PAGE_LINES = 500
+    MAX_PARALLEL_JOBS = 4
+    LOG_VIEW_ALL = "All jobs"
+    PROGRESS = "progress"
+    PROGRESS_END = "progress-end"
+    # Queue marker after a background refresh's last output: it is no longer quiet.
+    QUIET_END = "quiet-end"
+    RESULT_CACHE_MB = 16
+    SAVE_DEBOUNCE_MS = 800
+    WORKFLOW_TAB = "Workflows"
+    ARCHIVE_MAX_MB = 256
+    FLEET_PARALLEL = 8
+    # Log colours for the 8 ANSI colours, normal and bright, tuned for the dark log background.
+    ANSI_NORMAL = ("#64748b", "#ef4444", "#22c55e", "#eab308", "#3b82f6", "#d946ef", "#06b6d4", "#e2e8f0")
+    ANSI_BRIGHT = ("#94a3b8", "#f87171", "#4ade80", "#facc15", "#60a5fa", "#e879f9", "#22d3ee", "#ffffff")
+
+    def __init__(self, root: ctk.CTk, instance: InstanceServer | None = None):
         self.root = root
         self.root.title("Fedora Pro Manager (Stable)")
         self.root.geometry("1000x720")
@@ -24,96 +717,221 @@ class ServiceManagerApp:
         # State
         self.commands_path = self.get_commands_path()
         self.commands_data = {"commands": []}
-        self.log_queue: queue.Queue[tuple[str, str]] = queue.Queue()
+        self.catalog_store = sm_catalog.CatalogStore(self.commands_path)
+        # Edits not yet written to disk, and the pending debounced save.
+        self._catalog_dirty = False
+        self._save_after_id: str | None = None
+        # (text, tag, job_id, ansi runs, mode); mode marks progress-line updates.
+        self.log_queue: queue.Queue[tuple[str, str, int | None, list | None, str | None]] = queue.Queue()
+        # Jobs whose redrawn progress line is on screen, at mark "progress-<job_id>".
+        self._progress_marks: set[int | None] = set()
+        self._log_poll_ms = self.LOG_POLL_ACTIVE_MS
+        self._render_s_per_char = self.LOG_RENDER_S_PER_CHAR
+        # A queue item taken but left for the next tick (it would not fit).
+        self._log_carry: tuple | None = None
+        self._log_max_lines = self.LOG_MAX_LINES
+        # Lines at the widget top brought back by "Load older"; they do not
+        # count toward the trim threshold.
+        self._log_paged_lines = 0
+        self.spill_log = SpillLog()
+        # Log view: None shows all jobs, otherwise a single job's channel.
+        self.channels = ChannelStore(max_lines_per_job=self.LOG_MAX_LINES)
+        self._log_view: int | None = None
+        self._log_view_labels: dict[str, int | None] = {self.LOG_VIEW_ALL: None}
+        self._log_view_version = self.channels.version
+        # Set from worker threads, consumed by the Tk tick in process_queue.
+        self._jobs_dirty = threading.Event()
+        self.engine = ExecutionEngine()
+        self.scheduler = JobScheduler(self._run_job, max_workers=self.MAX_PARALLEL_JOBS, on_change=self._jobs_dirty.set)
+        # Fan-out host jobs get slots of their own: fleet_parallel is not capped
+        # by max_parallel_jobs and a large fleet does not hold up local jobs.
+        self.fleet_scheduler = JobScheduler(self._run_job, max_workers=self.FLEET_PARALLEL, on_change=self._jobs_dirty.set)
+        self._job_rows: dict[int, dict] = {}
+        # Optional privileged helper for pkexec entries (settings.privileged_helper).
+        self.helper: HelperSession | None = None
+        # Latest run per workflow name (and fan-out runs), kept on screen until dismissed.
+        self.workflow_runs: dict[str, WorkflowRun | FleetRun] = {}
+        self._workflows_dirty = threading.Event()
+        self._workflow_rows: dict[str, dict] = {}
+        self._workflows_ticked = 0.0
+        # Entries with a "schedule"; polled from the Tk tick, no timer per entry.
+        self.recurring = RecurringTimer()
+        self._scheduled_keys: set[tuple[str, str]] = set()
+        # Raise / run requests handed over by later launches (sm_instance).
+        self.instance = instance
+
+        # Last output of entries with cache_ttl; background refreshes of
+        # stale entries only write to their own job channel.
+        self.result_cache = ResultCache(self.RESULT_CACHE_MB * 1024 * 1024, path=default_cache_path())
+        self.result_cache.load()
+        self._quiet_jobs: set[int] = set()
+
+        self.search_index = CommandIndex()
+        self.palette: CommandPalette | None = None
+
+        # Every finished run is recorded off the UI thread.
+        try:
+            self.history: HistoryStore | None = HistoryStore()
+        except Exception:
+            self.history = None
+        self.history_window: HistoryWindow | None = None
+
+        # Compressed output of every run, searchable across a process pool.
+        self.archive_dir = default_archive_dir()
+        self._archive_output = True
+        self._archive_max_bytes: int | None = None
+        # At most one prune pass at a time; a request during one runs it once more.
+        self._prune_lock = threading.Lock()
+        self._prune_running = False
+        self._prune_again = False
+        self.archive_search = ArchiveSearch()
+        self.archive_window: ArchiveSearchWindow | None = None
+        self.metrics_window: MetricsWindow | None = None
 
         self.selected_cmd_index: int | None = None
         self.cmd_row_buttons: list[ctk.CTkButton] = []
+        self._cmd_row_labels: list[str] = []
 
         # UI
         self.setup_ui()
         self.reload_commands()
+        self.catalog_watcher = CatalogWatcher(self.catalog_store)
+        self.catalog_watcher.start()
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_exit)
+        self.root.bind("<Control-k>", lambda e: self.open_palette())
+        self.root.bind("<Control-K>", lambda e: self.open_palette())
 
         # Process log queue
-        self.root.after(80, self.process_queue)
+        self.root.after(self._log_poll_ms, self.process_queue)
 
     # -------------------------
     # Persistence (per-user for builds)
     # -------------------------
     def get_commands_path(self) -> str:
-        """Return a writable per-user commands.json path.
-
-        - In PyInstaller onefile builds, bundled data lives in a temp dir (sys._MEIPASS)
-          and should not be written.
-        - For dev runs, we prefer the local commands.json next to the script.
-        """
-
-        def resource_path(rel_path: str) -> str:
-            base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
-            return os.path.join(base, rel_path)
-
-        app_dir_name = "Service-APP-GUI"
-
-        # If frozen (built), always use per-user config
-        if getattr(sys, "frozen", False):
-            xdg_config_home = os.environ.get("XDG_CONFIG_HOME")
-            if not xdg_config_home:
-                xdg_config_home = os.path.join(os.path.expanduser("~"), ".config")
-            config_dir = os.path.join(xdg_config_home, app_dir_name)
-            os.makedirs(config_dir, exist_ok=True)
-            target = os.path.join(config_dir, "commands.json")
-            self.ensure_commands_file(target, resource_path("commands.json"))
-            return target
-
-        # Dev: next to script if possible
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        target = os.path.join(script_dir, "commands.json")
-        self.ensure_commands_file(target, target)
-        return target
+        """Return a writable per-user commands.json path (see sm_catalog)."""
+        return sm_catalog.get_commands_path()
 
     def ensure_commands_file(self, target_path: str, template_path: str) -> None:
-        if os.path.exists(target_path):
-            return
-        try:
-            if os.path.exists(template_path):
-                os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
-                shutil.copyfile(template_path, target_path)
-                return
-        except Exception:
-            pass
+        sm_catalog.ensure_commands_file(target_path, template_path)
 
+    def load_commands_from_disk(self) -> None:
+        # Unchanged files come from the store's parse cache.
+        self.commands_data = self.catalog_store.load()
+        self._catalog_dirty = False
+        self.apply_settings()
+        for path, error in self.catalog_store.errors.items():
+            self.write_log(f"[CATALOG] Skipped {path}: {error}", "error")
+
+    @staticmethod
+    def _int_setting(settings: dict, key: str, default: int) -> int:
         try:
-            os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
-            with open(target_path, "w", encoding="utf-8") as f:
-                json.dump({"commands": []}, f, ensure_ascii=False, indent=4)
-                f.write("\n")
-        except Exception:
-            pass
+            return int(settings.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def apply_settings(self) -> None:
+        settings = self.commands_data.get("settings") or {}
+        self._log_max_lines = max(100, self._int_setting(settings, "log_max_lines", self.LOG_MAX_LINES))
+        self.channels.max_lines_per_job = self._log_max_lines
+        self.scheduler.set_max_workers(self._int_setting(settings, "max_parallel_jobs", self.MAX_PARALLEL_JOBS))
+        self.result_cache.set_limit(max(1, self._int_setting(settings, "result_cache_mb", self.RESULT_CACHE_MB)) * 1024 * 1024)
+        self.result_cache.path = default_cache_path() if settings.get("result_cache_persist", True) else None
+        self._apply_helper_setting(settings.get("privileged_helper", False))
+        self._archive_output = bool(settings.get("archive_output", True))
+        archive_max_bytes = max(1, self._int_setting(settings, "archive_max_mb", self.ARCHIVE_MAX_MB)) * 1024 * 1024
+        # At start-up and when the limit changes; otherwise after each archived run.
+        if archive_max_bytes != self._archive_max_bytes:
+            self._archive_max_bytes = archive_max_bytes
+            self.prune_archive_soon()
+
+    def prune_archive_soon(self) -> None:
+        """Prune the output archive in the background (listing it is not UI work)."""
+        with self._prune_lock:
+            if self._prune_running:
+                self._prune_again = True
+                return
+            self._prune_running = True
+        threading.Thread(target=self._prune_archive_passes, name="archive-prune", daemon=True).start()
 
-    def load_commands_from_disk(self) -> None:
-        if not os.path.exists(self.commands_path):
-            raise FileNotFoundError(f"commands.json not found at {self.commands_path}")
-        with open(self.commands_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    def _prune_archive_passes(self) -> None:
+        while True:
+            try:
+                prune_archive(self.archive_dir, self._archive_max_bytes or self.ARCHIVE_MAX_MB * 1024 * 1024)
+            finally:
+                with self._prune_lock:
+                    if not self._prune_again:
+                        self._prune_running = False
+                        return
+                    self._prune_again = False
+
+    def _apply_helper_setting(self, value) -> None:
+        mode = "pkexec" if value is True or value == "pkexec" else "local" if value == "local" else None
+        if self.helper is not None and self.helper.mode == mode:
+            return
+        if self.helper is not None:
+            self.helper.stop()
+            self.helper = None
+        if mode is not None:
+            self.helper = HelperSession(self.engine, mode=mode, on_status=self.write_log)
 
-        if not isinstance(data, dict) or "commands" not in data or not isinstance(data.get("commands"), list):
-            raise ValueError("Invalid commands.json format. Expected { 'commands': [ ... ] }")
+    def save_commands_to_disk(self) -> None:
+        if self._save_after_id is not None:
+            self.root.after_cancel(self._save_after_id)
+            self._save_after_id = None
+        self.catalog_store.save(self.commands_data)
+        self._catalog_dirty = False
+
+    def schedule_save(self) -> None:
+        """Coalesce a burst of edits into one save once they stop."""
+        self._catalog_dirty = True
+        if self._save_after_id is not None:
+            self.root.after_cancel(self._save_after_id)
+        self._save_after_id = self.root.after(self.SAVE_DEBOUNCE_MS, self._flush_scheduled_save)
+
+    def _flush_scheduled_save(self) -> None:
+        self._save_after_id = None
+        try:
+            self.save_commands_to_disk()
+        except Exception as e:
+            self.write_log(f"[CATALOG] Failed to save commands.json: {e}", "error")
 
-        normalized: list[dict[str, str]] = []
-        for item in data.get("commands", []):
-            if not isinstance(item, dict):
-                continue
-            name = str(item.get("name", "")).strip()
-            cmd = str(item.get("command", "")).strip()
-            if not name or not cmd:
-                continue
-            normalized.append({"name": name, "command": cmd})
+    def on_catalog_changed_on_disk(self) -> None:
+        """Apply edits made outside the app (another editor, git pull, ...)."""
+        if not self.catalog_store.changed_on_disk():
+            return
+        if self._catalog_dirty:
+            self.write_log("[CATALOG] commands.json changed on disk; keeping unsaved edits (Reload to discard them).", "error")
+            return
+        old = self.commands_data.get("commands", [])
+        try:
+            self.load_commands_from_disk()
+        except Exception as e:
+            self.write_log(f"[CATALOG] Ignoring external change: {e}", "error")
+            return
 
-        self.commands_data = {"commands": normalized}
+        # Patch the search index with the difference only; the list refreshes
+        # below already reconcile against what is on screen.
+        new = self.commands_data.get("commands", [])
+        old_keys = Counter((e["name"], e["command"]) for e in old)
+        new_keys = Counter((e["name"], e["command"]) for e in new)
+        removed, added = old_keys - new_keys, new_keys - old_keys
+        for entries, delta, patch in ((old, removed.copy(), self.search_index.remove), (new, added.copy(), self.search_index.add)):
+            for entry in entries:
+                key = (entry["name"], entry["command"])
+                if delta[key] > 0:
+                    delta[key] -= 1
+                    patch(entry)
 
-    def save_commands_to_disk(self) -> None:
-        with open(self.commands_path, "w", encoding="utf-8") as f:
-            json.dump(self.commands_data, f, ensure_ascii=False, indent=4)
-            f.write("\n")
+        idx = self.selected_cmd_index
+        selection_gone = idx is not None and (idx >= len(new) or (old[idx]["name"], old[idx]["command"]) != (new[idx]["name"], new[idx]["command"]))
+        self.refresh_left_tabs()
+        self.refresh_command_manager_list()
+        self.refresh_category_options()
+        self.refresh_schedules()
+        if selection_gone:
+            self.on_new_command()
+        self.write_log(f"[CATALOG] Reloaded from disk ({sum(added.values())} added, {sum(removed.values())} removed).", "info")
 
     # -------------------------
     # UI helpers
@@ -133,8 +951,11 @@ class ServiceManagerApp:
         subtitle = ctk.CTkLabel(header, text="System Control • Command Launcher", text_color=("#6b7280", "#a3b2d6"))
         subtitle.grid(row=0, column=1, sticky="e", padx=12)
 
+        self.btn_metrics = ctk.CTkButton(header, text="Metrics", fg_color="#334155", command=self.open_metrics, width=90)
+        self.btn_metrics.grid(row=0, column=2, sticky="e", padx=(0, 10))
+
         self.btn_exit = ctk.CTkButton(header, text="Exit", fg_color="#ef4444", hover_color="#dc2626", command=self.on_exit, width=90)
-        self.btn_exit.grid(row=0, column=2, sticky="e", padx=(0, 12))
+        self.btn_exit.grid(row=0, column=3, sticky="e", padx=(0, 12))
 
         # Body
         body = ctk.CTkFrame(self.root)
@@ -148,28 +969,63 @@ class ServiceManagerApp:
         self.left_container.grid_rowconfigure(0, weight=1)
         self.left_container.grid_columnconfigure(0, weight=1)
 
-        # Recreated on refresh
+        # Created once, then reconciled on refresh
         self.left_tabs: ctk.CTkTabview | None = None
+        # category -> {"list": VirtualCommandList | None, "items": [(name, cmd), ...]}
+        # A tab's list is only built the first time the tab is shown.
+        self._left_tab_rows: dict[str, dict] = {}
+        self._left_empty_label: ctk.CTkLabel | None = None
 
         # Right: manual command + log
         right = ctk.CTkFrame(body)
         right.grid(row=0, column=1, sticky="nsew", pady=12)
-        right.grid_rowconfigure(1, weight=1)
+        right.grid_rowconfigure(4, weight=1)
         right.grid_columnconfigure(0, weight=1)
 
         manual = ctk.CTkFrame(right)
         manual.grid(row=0, column=0, sticky="ew", padx=12, pady=(12, 10))
         manual.grid_columnconfigure(0, weight=1)
 
-        self.manual_entry = ctk.CTkEntry(manual, placeholder_text="Run command... (type 'clear' to clear log)")
+        self.manual_entry = ctk.CTkEntry(manual, placeholder_text="Run command... (type 'clear' to clear log, Ctrl+K to search)")
         self.manual_entry.grid(row=0, column=0, sticky="ew", padx=(0, 10))
         self.manual_entry.bind("<Return>", lambda e: self.on_run_manual_command())
 
         self.manual_run_btn = ctk.CTkButton(manual, text="Run", command=self.on_run_manual_command, width=100)
         self.manual_run_btn.grid(row=0, column=1, sticky="e")
 
+        self.btn_load_older = ctk.CTkButton(manual, text="Load older", command=self.on_load_older_log, width=100, fg_color="#334155")
+        self.btn_load_older.grid(row=0, column=2, sticky="e", padx=(10, 0))
+
+        self.btn_history = ctk.CTkButton(manual, text="History", command=self.open_history, width=100, fg_color="#334155")
+        self.btn_history.grid(row=0, column=3, sticky="e", padx=(10, 0))
+
+        self.btn_archive = ctk.CTkButton(manual, text="Search output", command=self.open_archive_search, width=110, fg_color="#334155")
+        self.btn_archive.grid(row=0, column=4, sticky="e", padx=(10, 0))
+
+        # Jobs: running + pending queue, hidden while empty
+        self.jobs_frame = ctk.CTkFrame(right)
+        self.jobs_frame.grid(row=1, column=0, sticky="ew", padx=12, pady=(0, 10))
+        self.jobs_frame.grid_columnconfigure(0, weight=1)
+        self.jobs_title = ctk.CTkLabel(self.jobs_frame, text="Jobs", font=ctk.CTkFont(weight="bold"))
+        self.jobs_title.grid(row=0, column=0, sticky="w", padx=10, pady=(6, 2))
+        self.jobs_frame.grid_remove()
+
+        # Workflows: per-step status of running and finished runs, hidden while empty
+        self.workflows_frame = ctk.CTkFrame(right)
+        self.workflows_frame.grid(row=2, column=0, sticky="ew", padx=12, pady=(0, 10))
+        self.workflows_frame.grid_columnconfigure(0, weight=1)
+        self.workflows_frame.grid_remove()
+
+        # Log view picker: all jobs, or one job's own channel
+        log_bar = ctk.CTkFrame(right, fg_color="transparent")
+        log_bar.grid(row=3, column=0, sticky="ew", padx=12, pady=(0, 6))
+        ctk.CTkLabel(log_bar, text="View").grid(row=0, column=0, sticky="w", padx=(0, 8))
+        self.log_view_menu = ctk.CTkOptionMenu(log_bar, values=[self.LOG_VIEW_ALL], command=self.on_select_log_view, width=320)
+        self.log_view_menu.grid(row=0, column=1, sticky="w")
+        self.log_view_menu.set(self.LOG_VIEW_ALL)
+
         self.log_text = ctk.CTkTextbox(right)
-        self.log_text.grid(row=1, column=0, sticky="nsew", padx=12, pady=(0, 12))
+        self.log_text.grid(row=4, column=0, sticky="nsew", padx=12, pady=(0, 12))
 
         # Setup tags on underlying tk.Text
         self._log_tk = self.log_text._textbox
@@ -177,6 +1033,16 @@ class ServiceManagerApp:
         self._log_tk.tag_config("info", foreground="#9fb2d6")
         self._log_tk.tag_config("success", foreground="#22c55e")
         self._log_tk.tag_config("error", foreground="#ef4444")
+        self._log_tk.tag_config("stderr", foreground="#f59e0b")
+        # ANSI styles from command output (sm_term); configured last so they win over the stream tag.
+        for colour, normal, bright in zip(ANSI_COLOURS, self.ANSI_NORMAL, self.ANSI_BRIGHT):
+            self._log_tk.tag_config(f"ansi-{colour}", foreground=normal)
+            self._log_tk.tag_config(f"ansi-bright-{colour}", foreground=bright)
+        bold = tkfont.Font(font=self._log_tk.cget("font"))
+        bold.configure(weight="bold")
+        self._log_bold_font = bold
+        self._log_tk.tag_config("ansi-bold", font=bold)
+        self._log_tk.tag_config("ansi-underline", underline=True)
 
         # Command Manager
         manager = ctk.CTkFrame(self.root)
@@ -229,13 +1095,14 @@ class ServiceManagerApp:
         self.btn_reload = ctk.CTkButton(actions, text="Reload", width=90, command=self.on_reload_commands, fg_color="#334155")
         self.btn_reload.grid(row=0, column=5)
 
+        self.btn_fleet = ctk.CTkButton(actions, text="Run on hosts", width=110, command=self.on_run_on_hosts, fg_color="#334155")
+        self.btn_fleet.grid(row=0, column=6, padx=(8, 0))
+
     def _category_from_name(self, name: str) -> str:
         if not isinstance(name, str):
             return "General"
-        if ":" in name:
-            prefix = name.split(":", 1)[0].strip()
-            return prefix or "General"
-        return "General"
+        # Memoized in sm_catalog, so refreshes do not re-parse every name.
+        return sm_catalog.category_of(name)
 
     def _split_name(self, full_name: str) -> tuple[str, str]:
         if isinstance(full_name, str) and ":" in full_name:
@@ -262,20 +1129,19 @@ class ServiceManagerApp:
             messagebox.showerror("Error", f"Failed to load commands.json:\n{e}")
             self.commands_data = {"commands": []}
 
+        self.search_index.rebuild(self.commands_data.get("commands", []))
         self.refresh_left_tabs()
         self.refresh_command_manager_list()
         self.refresh_category_options()
+        self.refresh_schedules()
 
     def refresh_left_tabs(self) -> None:
-        # Recreate tabs to simplify refresh
-        if self.left_tabs is not None:
-            try:
-                self.left_tabs.destroy()
-            except Exception:
-                pass
-
-        self.left_tabs = ctk.CTkTabview(self.left_container, width=300)
-        self.left_tabs.grid(row=0, column=0, sticky="nsew", padx=12, pady=12)
+        # Reconcile against what is already on screen instead of rebuilding:
+        # only tabs whose category changed are touched, and tab contents are
+        # built lazily on first activation.
+        if self.left_tabs is None:
+            self.left_tabs = ctk.CTkTabview(self.left_container, width=300, command=self._on_left_tab_changed)
+            self.left_tabs.grid(row=0, column=0, sticky="nsew", padx=12, pady=12)
 
         grouped: dict[str, list[tuple[str, str]]] = {}
         for item in self.commands_data.get("commands", []):
@@ -283,31 +1149,59 @@ class ServiceManagerApp:
             cmd = item.get("command", "")
             category = self._category_from_name(name)
             grouped.setdefault(category, []).append((name, cmd))
+        # Workflows have no command of their own; an empty cmd marks them.
+        for workflow in self.commands_data.get("workflows", []):
+            grouped.setdefault(self.WORKFLOW_TAB, []).append((workflow["name"], ""))
+
+        for category in [c for c in self._left_tab_rows if c not in grouped]:
+            self._left_tab_rows.pop(category)
+            self.left_tabs.delete(category)
 
         if not grouped:
-            tab = self.left_tabs.add("General")
-            ctk.CTkLabel(tab, text="No commands.").pack(padx=10, pady=10)
+            if self._left_empty_label is None:
+                tab = self.left_tabs.add("General")
+                self._left_empty_label = ctk.CTkLabel(tab, text="No commands.")
+                self._left_empty_label.pack(padx=10, pady=10)
             self.left_tabs.set("General")
             return
 
-        for category in sorted(grouped.keys(), key=lambda s: s.lower()):
-            tab = self.left_tabs.add(category)
-            scroll = ctk.CTkScrollableFrame(tab)
-            scroll.pack(fill="both", expand=True, padx=10, pady=10)
+        if self._left_empty_label is not None:
+            self._left_empty_label = None
+            self.left_tabs.delete("General")
+
+        categories = sorted(grouped.keys(), key=lambda s: s.lower())
+        for pos, category in enumerate(categories):
+            rows = self._left_tab_rows.get(category)
+            if rows is None:
+                self.left_tabs.insert(pos, category)
+                rows = {"list": None, "items": []}
+                self._left_tab_rows[category] = rows
+            rows["items"] = grouped[category]
+            if rows["list"] is not None:
+                rows["list"].set_items(rows["items"])
+
+        if self.left_tabs.get() not in grouped:
+            self.left_tabs.set(categories[0])
+        self._ensure_left_tab_built(self.left_tabs.get())
+
+    def _on_left_tab_changed(self) -> None:
+        if self.left_tabs is not None:
+            self._ensure_left_tab_built(self.left_tabs.get())
 
-            for name, cmd in grouped[category]:
-                btn = ctk.CTkButton(
-                    scroll,
-                    text=name,
-                    anchor="w",
-                    command=lambda c=cmd, n=name: self.start_command_thread(c, n),
-                    fg_color="#0f1b2e",
-                    hover_color="#12223a",
-                )
-                btn.pack(fill="x", pady=4)
+    def _ensure_left_tab_built(self, category: str) -> None:
+        rows = self._left_tab_rows.get(category)
+        if rows is None or rows["list"] is not None:
+            return
+        vlist = VirtualCommandList(self.left_tabs.tab(category), on_activate=self._on_left_activate, fg_color="transparent")
+        vlist.pack(fill="both", expand=True, padx=10, pady=10)
+        vlist.set_items(rows["items"])
+        rows["list"] = vlist
 
-        first = sorted(grouped.keys(), key=lambda s: s.lower())[0]
-        self.left_tabs.set(first)
+    def _on_left_activate(self, cmd: str, name: str) -> None:
+        if cmd:
+            self.start_command_thread(cmd, name)
+        else:
+            self.start_workflow(name)
 
     def refresh_category_options(self) -> None:
         categories = {"General"}
@@ -320,16 +1214,18 @@ class ServiceManagerApp:
             self.category_combo.set("General")
 
     def refresh_command_manager_list(self) -> None:
-        # Clear old
-        for child in self.cmd_list.winfo_children():
-            child.destroy()
-        self.cmd_row_buttons = []
-
-        for idx, item in enumerate(self.commands_data.get("commands", [])):
-            name = item.get("name", "")
+        # Reuse rows by position; only relabel rows whose text changed.
+        items = self.commands_data.get("commands", [])
+        for idx, item in enumerate(items):
+            label = f"{idx + 1}. {item.get('name', '')}"
+            if idx < len(self.cmd_row_buttons):
+                if self._cmd_row_labels[idx] != label:
+                    self.cmd_row_buttons[idx].configure(text=label)
+                    self._cmd_row_labels[idx] = label
+                continue
             btn = ctk.CTkButton(
                 self.cmd_list,
-                text=f"{idx + 1}. {name}",
+                text=label,
                 anchor="w",
                 fg_color="#0f1b2e",
                 hover_color="#12223a",
@@ -337,18 +1233,32 @@ class ServiceManagerApp:
             )
             btn.pack(fill="x", pady=4, padx=6)
             self.cmd_row_buttons.append(btn)
+            self._cmd_row_labels.append(label)
+
+        for btn in self.cmd_row_buttons[len(items):]:
+            btn.destroy()
+        del self.cmd_row_buttons[len(items):]
+        del self._cmd_row_labels[len(items):]
 
         # Keep selection if possible
-        if self.selected_cmd_index is not None and 0 <= self.selected_cmd_index < len(self.cmd_row_buttons):
-            self._apply_selection(self.selected_cmd_index)
+        if self.selected_cmd_index is not None and not 0 <= self.selected_cmd_index < len(self.cmd_row_buttons):
+            self.selected_cmd_index = None
 
-    def _apply_selection(self, idx: int) -> None:
+    def _set_row_selected(self, idx: int | None, selected: bool) -> None:
+        if idx is None or not 0 <= idx < len(self.cmd_row_buttons):
+            return
+        if selected:
+            self.cmd_row_buttons[idx].configure(fg_color="#3b82f6", hover_color="#2563eb")
+        else:
+            self.cmd_row_buttons[idx].configure(fg_color="#0f1b2e", hover_color="#12223a")
+
+    def _apply_selection(self, idx: int | None) -> None:
+        # Recolour just the previous and the new row.
+        prev = self.selected_cmd_index
         self.selected_cmd_index = idx
-        for i, btn in enumerate(self.cmd_row_buttons):
-            if i == idx:
-                btn.configure(fg_color="#3b82f6", hover_color="#2563eb")
-            else:
-                btn.configure(fg_color="#0f1b2e", hover_color="#12223a")
+        if prev != idx:
+            self._set_row_selected(prev, False)
+        self._set_row_selected(idx, True)
 
     # -------------------------
     # CRUD actions
@@ -360,12 +1270,11 @@ class ServiceManagerApp:
         return category, name, cmd
 
     def on_new_command(self) -> None:
+        self._set_row_selected(self.selected_cmd_index, False)
         self.selected_cmd_index = None
         self.category_combo.set("General")
         self.name_entry.delete(0, tk.END)
         self.cmd_text.delete("1.0", tk.END)
-        for btn in self.cmd_row_buttons:
-            btn.configure(fg_color="#0f1b2e", hover_color="#12223a")
 
     def on_select_command(self, idx: int) -> None:
         if idx < 0 or idx >= len(self.commands_data.get("commands", [])):
@@ -386,10 +1295,14 @@ class ServiceManagerApp:
             messagebox.showerror("Error", "Name and Command cannot be empty.")
             return
         full_name = self._build_full_name(category, name)
-        self.commands_data.setdefault("commands", []).append({"name": full_name, "command": cmd})
+        entry = {"name": full_name, "command": cmd}
+        self.commands_data.setdefault("commands", []).append(entry)
+        self.search_index.add(entry)
+        self._catalog_dirty = True
         self.refresh_left_tabs()
         self.refresh_command_manager_list()
         self.refresh_category_options()
+        self.refresh_schedules()
 
     def on_update_command(self) -> None:
         idx = self.selected_cmd_index
@@ -404,15 +1317,19 @@ class ServiceManagerApp:
 
         full_name = self._build_full_name(category, name)
         try:
-            self.commands_data["commands"][idx] = {"name": full_name, "command": cmd}
-            # Auto-save after update
-            self.save_commands_to_disk()
+            # Keep per-entry options (lock, exclusive, ...) the form does not edit.
+            old = self.commands_data["commands"][idx]
+            self.commands_data["commands"][idx] = {**old, "name": full_name, "command": cmd}
+            self.search_index.update(old, self.commands_data["commands"][idx])
+            # Auto-save after update, coalesced with any edits that follow.
+            self.schedule_save()
         except Exception as e:
-            messagebox.showerror("Error", f"Updated in memory but failed to save:\n{e}")
+            messagebox.showerror("Error", f"Failed to update item:\n{e}")
 
         self.refresh_left_tabs()
         self.refresh_command_manager_list()
         self.refresh_category_options()
+        self.refresh_schedules()
         self._apply_selection(idx)
 
     def on_delete_command(self) -> None:
@@ -432,15 +1349,17 @@ class ServiceManagerApp:
             return
 
         try:
-            del self.commands_data["commands"][idx]
+            removed = self.commands_data["commands"].pop(idx)
+            self.search_index.remove(removed)
+            self._catalog_dirty = True
         except Exception as e:
             messagebox.showerror("Error", f"Failed to delete item: {e}")
             return
 
-        self.selected_cmd_index = None
         self.refresh_left_tabs()
         self.refresh_command_manager_list()
         self.refresh_category_options()
+        self.refresh_schedules()
         self.on_new_command()
 
     def on_save_commands(self) -> None:
@@ -452,11 +1371,43 @@ class ServiceManagerApp:
         messagebox.showinfo("Saved", f"commands.json saved to:\n{self.commands_path}")
 
     def on_reload_commands(self) -> None:
+        if self._save_after_id is not None:
+            self.root.after_cancel(self._save_after_id)
+            self._save_after_id = None
+        if self.helper is not None:
+            # Allow another authentication attempt after a dismissed prompt.
+            self.helper.reset()
         self.reload_commands()
 
+    # -------------------------
+    # Command palette
+    # -------------------------
+    def open_palette(self) -> None:
+        if self.palette is None or not self.palette.winfo_exists():
+            self.palette = CommandPalette(self.root, self.search_index, on_run=self.start_command_thread)
+        self.palette.open()
+
     # -------------------------
     # Manual command runner
     # -------------------------
+    def open_history(self) -> None:
+        if self.history is None:
+            messagebox.showerror("Error", "Run history is not available (could not open the database).")
+            return
+        if self.history_window is None or not self.history_window.winfo_exists():
+            self.history_window = HistoryWindow(self.root, self.history)
+        self.history_window.open()
+
+    def open_metrics(self) -> None:
+        if self.metrics_window is None or not self.metrics_window.winfo_exists():
+            self.metrics_window = MetricsWindow(self.root)
+        self.metrics_window.open()
+
+    def open_archive_search(self) -> None:
+        if self.archive_window is None or not self.archive_window.winfo_exists():
+            self.archive_window = ArchiveSearchWindow(self.root, self.archive_search, self.archive_dir)
+        self.archive_window.open()
+
     def on_run_manual_command(self) -> None:
         cmd = (self.manual_entry.get() or "").strip()
         if not cmd:
@@ -474,70 +1425,774 @@ class ServiceManagerApp:
     # -------------------------
     # Logging + command execution
     # -------------------------
-    def write_log(self, text: str, tag: str = "info") -> None:
-        self.log_queue.put((text, tag))
+    def write_log(self, text: str, tag: str = "info", job_id: int | None = None) -> None:
+        self.log_queue.put((text, tag, job_id, None, None))
+
+    def write_output(self, text: str, tag: str, job_id: int | None, runs: list | None = None, replaces_progress: bool = False) -> None:
+        """Command output lines with optional ANSI runs; may finish the job's progress line."""
+        self.log_queue.put((text, tag, job_id, runs, self.PROGRESS_END if replaces_progress else None))
+
+    def write_progress(self, text: str, tag: str, job_id: int | None, runs: list | None = None) -> None:
+        """Replace the job's progress line in place; never stored in channels or the session file."""
+        self.log_queue.put((text, tag, job_id, runs, self.PROGRESS))
 
     def clear_log(self) -> None:
+        # Clearing only empties the view: in the "all jobs" view the lines go
+        # to the session file so "Load older" can still bring them back.
         try:
-            self._log_tk.configure(state="normal")
-            self._log_tk.delete("1.0", tk.END)
-            self._log_tk.configure(state="disabled")
+            self._trim_log(self._log_line_count())
         except Exception:
             pass
 
+    def _log_line_count(self) -> int:
+        # Every insert ends with a newline, so an empty last line is not counted.
+        line, col = self._log_tk.index("end-1c").split(".")
+        return int(line) - (1 if col == "0" else 0)
+
+    @staticmethod
+    def _base_tag(active: list[str]) -> str:
+        # ANSI styles are not kept in the session file; the stream tag is.
+        return next((t for t in active if not t.startswith("ansi-")), "info")
+
+    def _dump_log_lines(self, first: int, last: int) -> list[tuple[str, str]]:
+        """Return ``(tag, text)`` for widget lines ``first..last`` (1-based, inclusive)."""
+        lines: list[tuple[str, str]] = []
+        active: list[str] = []
+        pending: list[str] = []
+        pending_tag: str | None = None
+        for key, value, _index in self._log_tk.dump(f"{first}.0", f"{last + 1}.0", text=True, tag=True):
+            if key == "tagon":
+                active.append(value)
+            elif key == "tagoff":
+                if value in active:
+                    active.remove(value)
+            elif key == "text":
+                base = self._base_tag(active)
+                parts = value.split("\n")
+                tail = parts.pop()
+                if parts:
+                    # The first part may continue a line begun in an earlier item.
+                    pending.append(parts[0])
+                    lines.append((pending_tag or base, "".join(pending)))
+                    lines.extend((base, part) for part in parts[1:])
+                    pending = []
+                    pending_tag = None
+                if tail:
+                    if pending_tag is None:
+                        pending_tag = base
+                    pending.append(tail)
+        return lines
+
+    def _trim_log(self, count: int) -> None:
+        """Remove ``count`` lines from the widget top, spilling them to disk.
+
+        Only the "all jobs" view spills; a single job's view is backed by its
+        in-memory channel, so trimmed lines are simply dropped.
+        """
+        if count <= 0:
+            return
+        self._log_paged_lines = max(0, self._log_paged_lines - count)
+        if self._log_view is None:
+            # Lines paged back in from the file are already on disk.
+            dropped = self.spill_log.drop_paged(count)
+            if count > dropped:
+                self.spill_log.append(self._dump_log_lines(dropped + 1, count))
+        for job_id in list(self._progress_marks):
+            # A progress line scrolled out with the trimmed lines is forgotten.
+            mark = f"progress-{job_id}"
+            if int(self._log_tk.index(mark).split(".")[0]) <= count:
+                self._log_tk.mark_unset(mark)
+                self._progress_marks.discard(job_id)
+        self._log_tk.configure(state="normal")
+        self._log_tk.delete("1.0", f"{count + 1}.0")
+        self._log_tk.configure(state="disabled")
+
+    @staticmethod
+    def _styled_args(args: list, tag: str, text: str, runs: list | None) -> None:
+        """Append (text, tags) pairs for one block, split at its ANSI runs."""
+        pos = 0
+        for start, end, style in runs or ():
+            if start > pos:
+                args.extend((text[pos:start], tag))
+            args.extend((text[start:end], (tag, *style.split())))
+            pos = end
+        args.extend((text[pos:] + "\n", tag))
+
+    def _insert_log_blocks(self, index: str, blocks: list[tuple]) -> None:
+        # One insert call for the whole batch: tk.Text takes alternating
+        # (text, tags) pairs, so each same-tag run becomes a single chunk.
+        args: list = []
+        for block in blocks:
+            tag, text = block[0], block[1]
+            if len(block) > 2 and block[2]:
+                self._styled_args(args, tag, text, block[2])
+            elif args and args[-1] == tag:
+                args[-2] += text + "\n"
+            else:
+                args.extend((text + "\n", tag))
+        if not args:
+            return
+        self._log_tk.configure(state="normal")
+        self._log_tk.insert(index, *args)
+        self._log_tk.configure(state="disabled")
+
+    def _render_progress(self, job_id: int | None, tag: str, text: str, runs: list | None, final: bool) -> None:
+        """Draw a job's redrawn line in place; ``final`` ends it as a normal line."""
+        mark = f"progress-{job_id}"
+        args: list = []
+        self._styled_args(args, tag, text, runs)
+        self._log_tk.configure(state="normal")
+        if job_id in self._progress_marks:
+            args[-2] = args[-2][:-1]
+            self._log_tk.delete(mark, f"{mark} lineend")
+            self._log_tk.insert(mark, *args)
+        else:
+            if not final:
+                self._log_tk.mark_set(mark, "end-1c")
+                self._log_tk.mark_gravity(mark, "left")
+                self._progress_marks.add(job_id)
+            self._log_tk.insert(tk.END, *args)
+        if final and job_id in self._progress_marks:
+            self._log_tk.mark_unset(mark)
+            self._progress_marks.discard(job_id)
+        self._log_tk.configure(state="disabled")
+
+    def on_load_older_log(self) -> None:
+        if self._log_view is not None:
+            return
+        try:
+            lines = self.spill_log.read_older(self.LOG_PAGE_LINES)
+        except Exception as e:
+            self.write_log(f"[EXCEPTION] Failed to read session log: {e}", "error")
+            return
+        if not lines:
+            return
+        self._insert_log_blocks("1.0", lines)
+        self._log_paged_lines += len(lines)
+        self._log_tk.see("1.0")
+
+    # -------------------------
+    # Log views (all jobs / single job)
+    # -------------------------
+    def refresh_log_view_options(self) -> None:
+        if self._log_view_version == self.channels.version:
+            return
+        self._log_view_version = self.channels.version
+        self._log_view_labels = {self.LOG_VIEW_ALL: None}
+        for job_id, name in reversed(self.channels.jobs()):
+            self._log_view_labels[f"#{job_id} {name}"] = job_id
+        self.log_view_menu.configure(values=list(self._log_view_labels))
+
+        if self._log_view is not None and self._log_view not in self.channels:
+            self.set_log_view(None)
+
+    def on_select_log_view(self, label: str) -> None:
+        self.set_log_view(self._log_view_labels.get(label))
+
+    def set_log_view(self, job_id: int | None) -> None:
+        if job_id == self._log_view:
+            return
+        # Park the current view: "all" goes to the session file, a job view
+        # is just discarded since its channel still holds the lines.
+        self._trim_log(self._log_line_count())
+        self._log_view = job_id
+
+        if job_id is None:
+            self.log_view_menu.set(self.LOG_VIEW_ALL)
+            blocks = self.spill_log.read_older(self._log_max_lines)
+        else:
+            label = next((k for k, v in self._log_view_labels.items() if v == job_id), None)
+            if label:
+                self.log_view_menu.set(label)
+            blocks = self.channels.blocks(job_id)
+        self._insert_log_blocks(tk.END, blocks)
+        self._log_paged_lines = 0
+        self._log_tk.see(tk.END)
+
+    # -------------------------
+    # Log queue rendering
+    # -------------------------
     def process_queue(self) -> None:
+        deadline = time.monotonic() + self.LOG_FRAME_BUDGET_S
+        blocks, chars = self._drain_log_queue(deadline)
+        if blocks:
+            started = time.monotonic()
+            self._render_log_blocks(blocks, deadline)
+            # Smoothed, so one slow trim does not starve the next ticks.
+            cost = (time.monotonic() - started) / max(1, chars)
+            self._render_s_per_char = 0.7 * self._render_s_per_char + 0.3 * cost
+        self.refresh_log_view_options()
+        if self.catalog_watcher.changed.is_set():
+            self.catalog_watcher.changed.clear()
+            self.on_catalog_changed_on_disk()
+        if self._jobs_dirty.is_set():
+            self._jobs_dirty.clear()
+            self.refresh_jobs_panel()
+        if self.history is not None and self.history.committed.is_set():
+            self.history.committed.clear()
+            if self.history_window is not None and self.history_window.winfo_exists() and self.history_window.winfo_viewable():
+                self.history_window.refresh()
+        for key, catch_up in self.recurring.pop_due():
+            self.run_scheduled(key, catch_up)
+        if self.instance is not None:
+            self._drain_instance_requests()
+        # Step timings of running workflows tick once a second.
+        now = time.monotonic()
+        if self._workflows_dirty.is_set() or (now - self._workflows_ticked >= 1.0 and any(not r.done for r in self.workflow_runs.values())):
+            self._workflows_dirty.clear()
+            self._workflows_ticked = now
+            self.refresh_workflows_panel()
+
+        # Adapt the poll interval to the backlog: come straight back while the
+        # queue still holds lines, stay responsive while output is flowing and
+        # back off gradually once it stops.
+        if self.log_backlog():
+            self._log_poll_ms = self.LOG_POLL_BUSY_MS
+        elif blocks:
+            self._log_poll_ms = self.LOG_POLL_ACTIVE_MS
+        else:
+            self._log_poll_ms = min(self.LOG_POLL_IDLE_MS, max(self.LOG_POLL_ACTIVE_MS, self._log_poll_ms * 2))
+        self.root.after(self._log_poll_ms, self.process_queue)
+
+    def log_backlog(self) -> bool:
+        return self._log_carry is not None or not self.log_queue.empty()
+
+    def _drain_log_queue(self, deadline: float) -> tuple[list[tuple], int]:
+        """Pull queued output while it can still be rendered before ``deadline``.
+
+        Every block is filed into its job channel; only blocks belonging to
+        the view on screen are returned for rendering, with their size in
+        characters. While a single job is shown, the "all jobs" stream goes
+        straight to the session file.
+        """
+        visible: list[tuple[str, str]] = []
+        parked: list[tuple[str, str]] = []
+        chars = 0
+        visible_chars = 0
         try:
-            while True:
-                msg, tag = self.log_queue.get_nowait()
-                self._log_tk.configure(state="normal")
-                self._log_tk.insert(tk.END, msg + "\n", tag)
-                self._log_tk.see(tk.END)
-                self._log_tk.configure(state="disabled")
+            while chars < self.LOG_MAX_CHARS_PER_TICK:
+                item = self._log_carry or self.log_queue.get_nowait()
+                self._log_carry = None
+                msg, tag, job_id, runs, mode = item
+                if mode == self.QUIET_END:
+                    self._quiet_jobs.discard(job_id)
+                    continue
+                if visible and time.monotonic() + (visible_chars + len(msg)) * self._render_s_per_char >= deadline:
+                    # Leave the rest of the budget for rendering what was taken.
+                    self._log_carry = item
+                    break
+                chars += len(msg)
+                # Plain blocks stay (tag, text); styled or progress ones carry the rest.
+                block = (tag, msg) if runs is None and mode is None else (tag, msg, runs, job_id, mode)
+                shown = len(visible)
+                if mode == self.PROGRESS:
+                    # Transient: only drawn, if the job is on screen.
+                    if self._log_view == job_id or (self._log_view is None and job_id not in self._quiet_jobs):
+                        visible.append(block)
+                else:
+                    if job_id is not None:
+                        self.channels.append(job_id, tag, msg)
+                    if job_id in self._quiet_jobs:
+                        # Background refreshes stay out of the "all jobs" stream.
+                        if self._log_view == job_id:
+                            visible.append(block)
+                    elif self._log_view is None:
+                        visible.append(block)
+                    else:
+                        parked.extend((tag, line) for line in msg.split("\n"))
+                        if job_id == self._log_view:
+                            visible.append(block)
+                if len(visible) > shown:
+                    visible_chars += len(msg)
         except queue.Empty:
             pass
-        self.root.after(80, self.process_queue)
+        if parked:
+            self.spill_log.append(parked)
+        return visible, visible_chars
+
+    def _render_log_blocks(self, blocks: list[tuple], deadline: float | None = None) -> None:
+        try:
+            # Scrolled up into a page of older lines: keep the view where the
+            # user put it until they come back to the bottom.
+            following = not self._log_paged_lines or self._log_tk.yview()[1] >= 1.0
+            batch: list[tuple] = []
+            for block in blocks:
+                if len(block) == 2 or block[4] is None:
+                    batch.append(block)
+                    continue
+                self._insert_log_blocks(tk.END, batch)
+                batch = []
+                tag, text, runs, job_id, mode = block
+                self._render_progress(job_id, tag, text, runs, final=mode == self.PROGRESS_END)
+            self._insert_log_blocks(tk.END, batch)
+            # Trim in bulk so the widget is not shuffled on every batch, and
+            # only with budget left unless the widget is far over its limit.
+            # Paged-in lines are not counted, so a page never pushes the next
+            # line of output over the threshold.
+            excess = self._log_line_count() - self._log_max_lines
+            live_excess = excess - self._log_paged_lines
+            threshold = max(100, self._log_max_lines // 10)
+            urgent = live_excess >= 4 * threshold
+            if live_excess >= threshold and (urgent or (following and (deadline is None or time.monotonic() < deadline))):
+                self._trim_log(excess)
+            if following:
+                self._log_tk.see(tk.END)
+        except tk.TclError:
+            pass
+
+    def _entry_options(self, cmd: str, name: str) -> dict:
+        for item in self.commands_data.get("commands", []):
+            if item.get("name") == name and item.get("command") == cmd:
+                return item
+        return {}
 
     def start_command_thread(self, cmd: str, name: str) -> None:
-        thread = threading.Thread(target=self.execute_command, args=(cmd, name), daemon=True)
-        thread.start()
+        """Queue a command on the scheduler (kept under its old name for callers)."""
+        opts = self._entry_options(cmd, name)
+        refresh_quietly = False
+        ttl = opts.get("cache_ttl")
+        if ttl:
+            cached = self.result_cache.get((name, cmd))
+            if cached is not None:
+                # Stale-while-revalidate: show the last output right away and
+                # only re-run once it is older than the entry's TTL.
+                stale = cached.age >= ttl
+                self._replay_cached(name, cached, stale)
+                if not stale:
+                    return
+                refresh_quietly = True
+
+        job = self.scheduler.submit(name, cmd, lock=opts.get("lock"), exclusive=bool(opts.get("exclusive")), options=opts)
+        if job is None:
+            if not refresh_quietly:
+                self.write_log(f"[SKIPPED] {name} is already queued or running.", "info")
+            return
+        if refresh_quietly:
+            self._quiet_jobs.add(job.id)
+        reason = self.scheduler.blocked_reason(job) if job.state == PENDING else None
+        if reason:
+            self.write_log(f"[QUEUED] {name} ({reason})", "info")
+
+    def _replay_cached(self, name: str, cached, stale: bool) -> None:
+        code = "?" if cached.exit_code is None else cached.exit_code
+        self.write_log(f"\n[CACHED] {name} — output from {format_age(cached.age)} ago (kode {code})", "info")
+        for tag, text in cached.blocks:
+            self.write_log(text, tag)
+        if stale:
+            self.write_log(f"[REFRESHING] {name} in the background...", "info")
+
+    def _run_job(self, job: Job) -> concurrent.futures.Future:
+        return self.execute_command(job.cmd, job.name, job)
+
+    def on_cancel_job(self, job_id: int) -> None:
+        job = self.scheduler.cancel(job_id) or self.fleet_scheduler.cancel(job_id)
+        # Running jobs report their own cancellation when the process exits.
+        if job is not None and job.state == CANCELLED:
+            self._quiet_jobs.discard(job_id)
+            self.write_log(f"[CANCELLED] {job.name}", "error")
+
+    def refresh_jobs_panel(self) -> None:
+        jobs = self.scheduler.snapshot() + self.fleet_scheduler.snapshot()
+        live = {job.id for job in jobs}
+
+        for job_id in [j for j in self._job_rows if j not in live]:
+            self._job_rows.pop(job_id)["frame"].destroy()
+
+        for pos, job in enumerate(jobs):
+            row = self._job_rows.get(job.id)
+            if row is None:
+                frame = ctk.CTkFrame(self.jobs_frame, fg_color="transparent")
+                frame.grid_columnconfigure(0, weight=1)
+                label = ctk.CTkLabel(frame, text="", anchor="w")
+                label.grid(row=0, column=0, sticky="ew")
+                btn = ctk.CTkButton(frame, text="Cancel", width=70, height=24, fg_color="#ef4444", hover_color="#dc2626", command=lambda i=job.id: self.on_cancel_job(i))
+                btn.grid(row=0, column=1, sticky="e")
+                row = {"frame": frame, "label": label, "text": "", "pos": -1}
+                self._job_rows[job.id] = row
+            text = f"{'[running]' if job.state == RUNNING else '[pending]'}  {job.name}"
+            if job.cancel_requested:
+                text += "  (cancelling...)"
+            if row["text"] != text:
+                row["label"].configure(text=text)
+                row["text"] = text
+            if row["pos"] != pos:
+                row["frame"].grid(row=pos + 1, column=0, sticky="ew", padx=10, pady=(0, 4))
+                row["pos"] = pos
+
+        running = sum(1 for j in jobs if j.state == RUNNING)
+        self.jobs_title.configure(text=f"Jobs — {running} running, {len(jobs) - running} pending")
+        if jobs:
+            self.jobs_frame.grid()
+        else:
+            self.jobs_frame.grid_remove()
 
-    def execute_command(self, cmd: str, name: str) -> None:
-        self.write_log(f"\n[STARTING] {name}...", "info")
-        try:
-            process = subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-            )
+    # -------------------------
+    # Workflows
+    # -------------------------
+    def start_workflow(self, name: str) -> None:
+        workflow = next((w for w in self.commands_data.get("workflows", []) if w["name"] == name), None)
+        if workflow is None:
+            return
+        current = self.workflow_runs.get(name)
+        if current is not None and not current.done:
+            self.write_log(f"[SKIPPED] Workflow {name} is already running.", "info")
+            return
 
-            assert process.stdout is not None
-            for line in iter(process.stdout.readline, ""):
-                if line:
-                    self.write_log(line.rstrip("\n"), "info")
+        entries: dict[str, dict] = {}
+        for item in self.commands_data.get("commands", []):
+            entries.setdefault(item["name"], item)
+        try:
+            run = WorkflowRun(workflow, entries, self.scheduler, on_change=self._workflows_dirty.set)
+        except ValueError as e:
+            self.write_log(f"[WORKFLOW] {name} cannot run: {e}", "error")
+            return
+        self.workflow_runs[name] = run
+        self.write_log(f"\n[WORKFLOW] {name} started ({len(run.steps)} steps).", "info")
+        run.start()
+
+    def refresh_schedules(self) -> None:
+        schedules = {(c["name"], c["command"]): c["schedule"] for c in self.commands_data.get("commands", []) if "schedule" in c}
+        self.recurring.set_schedules(schedules)
+        if set(schedules) == self._scheduled_keys:
+            return
+        self._scheduled_keys = set(schedules)
+        if not schedules:
+            self.write_log("[SCHEDULE] No scheduled entries.", "info")
+            return
+        due, key = self.recurring.next_due()
+        self.write_log(
+            f"[SCHEDULE] {len(schedules)} scheduled entries; next: {key[0]} ({describe_schedule(schedules[key])}) "
+            f"at {time.strftime('%Y-%m-%d %H:%M', time.localtime(due))}.",
+            "info",
+        )
+
+    def run_scheduled(self, key: tuple[str, str], catch_up: bool) -> None:
+        entry = next((c for c in self.commands_data.get("commands", []) if (c["name"], c["command"]) == key), None)
+        if entry is None:
+            return
+        job = self.scheduler.submit(entry["name"], entry["command"], lock=entry.get("lock"), exclusive=bool(entry.get("exclusive")), options=entry)
+        if job is None:
+            # Never stack runs: the previous one is still queued or running.
+            self.write_log(f"[SCHEDULE] {entry['name']} dilewati — run sebelumnya masih berjalan.", "info")
+        elif catch_up:
+            self.write_log(f"[SCHEDULE] {entry['name']} — catch-up run for missed schedule.", "info")
+
+    def _drain_instance_requests(self) -> None:
+        try:
+            while True:
+                self.on_instance_request(self.instance.requests.get_nowait())
+        except queue.Empty:
+            pass
 
-            process.stdout.close()
-            return_code = process.wait()
+    def on_instance_request(self, request: dict) -> None:
+        """A later launch asked to show the window and maybe run entries by name."""
+        self.root.deiconify()
+        self.root.lift()
+        self.root.focus_force()
+        for name in request.get("names") or []:
+            entry = next((c for c in self.commands_data.get("commands", []) if c.get("name") == name), None)
+            if entry is not None:
+                self.start_command_thread(entry["command"], entry["name"])
+            elif any(w["name"] == name for w in self.commands_data.get("workflows", [])):
+                self.start_workflow(name)
+            else:
+                self.write_log(f"[ERROR] --run: entry tidak ditemukan: {name}", "error")
 
-            if return_code == 0:
-                self.write_log(f"[FINISHED] {name} berhasil.", "success")
+    def on_run_on_hosts(self) -> None:
+        idx = self.selected_cmd_index
+        if idx is None:
+            messagebox.showerror("Error", "Select an item to run on hosts.")
+            return
+        hosts = self.commands_data.get("hosts", [])
+        if not hosts:
+            messagebox.showerror("Error", "No hosts configured. Add a \"hosts\" list to commands.json.")
+            return
+        entry = self.commands_data["commands"][idx]
+        parallel = max(1, self._int_setting(self.commands_data.get("settings") or {}, "fleet_parallel", self.FLEET_PARALLEL))
+        FleetDialog(self.root, entry, hosts, parallel, on_run=self.start_fleet)
+
+    def start_fleet(self, entry: dict, hosts: list[dict], parallel: int) -> None:
+        key = f"{entry['name']} @ {len(hosts)} hosts"
+        current = self.workflow_runs.get(key)
+        if current is not None and not current.done:
+            self.write_log(f"[SKIPPED] {key} is already running.", "info")
+            return
+        transport = make_transport((self.commands_data.get("settings") or {}).get("fleet_transport"))
+        # Runs side by side share the fleet slots, as many as the widest of them asks for.
+        widest = max([parallel] + [r.max_parallel for r in self.workflow_runs.values() if isinstance(r, FleetRun) and not r.done])
+        self.fleet_scheduler.set_max_workers(widest)
+        run = FleetRun(entry, hosts, self.fleet_scheduler, transport, max_parallel=parallel, on_change=self._workflows_dirty.set)
+        self.workflow_runs[key] = run
+        self.write_log(f"\n[FLEET] {entry['name']} on {len(hosts)} hosts via {transport.name}, {parallel} at a time.", "info")
+        run.start()
+
+    def on_cancel_workflow(self, name: str) -> None:
+        run = self.workflow_runs.get(name)
+        if run is None:
+            return
+        if run.done:
+            # Finished runs only get dismissed from the panel.
+            del self.workflow_runs[name]
+        else:
+            run.cancel()
+        self._workflows_dirty.set()
+
+    @staticmethod
+    def _format_step(step) -> str:
+        duration = step.duration
+        text = f"[{step.state}]".ljust(12) + step.id
+        if duration is not None:
+            text += f"  {duration:.1f}s"
+        if step.exit_code not in (None, 0):
+            text += f"  (kode {step.exit_code})"
+        if step.note:
+            text += f"  — {step.note}"
+        return text
+
+    def refresh_workflows_panel(self) -> None:
+        runs = list(self.workflow_runs.items())
+        for name in [n for n in self._workflow_rows if n not in self.workflow_runs]:
+            self._workflow_rows.pop(name)["frame"].destroy()
+
+        for pos, (name, run) in enumerate(runs):
+            row = self._workflow_rows.get(name)
+            if row is None or row["run"] is not run:
+                if row is not None:
+                    row["frame"].destroy()
+                frame = ctk.CTkFrame(self.workflows_frame, fg_color="transparent")
+                frame.grid_columnconfigure(0, weight=1)
+                title = ctk.CTkLabel(frame, text="", anchor="w", font=ctk.CTkFont(weight="bold"))
+                title.grid(row=0, column=0, sticky="ew")
+                btn = ctk.CTkButton(frame, text="Cancel", width=70, height=24, fg_color="#ef4444", hover_color="#dc2626", command=lambda n=name: self.on_cancel_workflow(n))
+                btn.grid(row=0, column=1, sticky="e")
+                steps = ctk.CTkLabel(frame, text="", anchor="w", justify="left", font=ctk.CTkFont(family="monospace", size=12))
+                steps.grid(row=1, column=0, columnspan=2, sticky="ew", padx=(12, 0))
+                row = {"run": run, "frame": frame, "title": title, "button": btn, "steps": steps, "text": "", "steps_text": "", "done": False, "pos": -1}
+                self._workflow_rows[name] = row
+
+            counts = run.counts()
+            elapsed = (run.finished or time.time()) - run.started
+            summary = ", ".join(f"{n} {state}" for state, n in counts.items())
+            title = f"{name} — {summary} ({elapsed:.0f}s)"
+            if row["text"] != title:
+                row["title"].configure(text=title)
+                row["text"] = title
+            if isinstance(run, FleetRun):
+                steps_text = "\n".join(run.summary())
             else:
-                self.write_log(f"[FAILED] {name} berhenti dengan kode {return_code}", "error")
-        except Exception as e:
-            self.write_log(f"[EXCEPTION] {e}", "error")
+                steps_text = "\n".join(self._format_step(step) for step in run.steps)
+            if row["steps_text"] != steps_text:
+                row["steps"].configure(text=steps_text)
+                row["steps_text"] = steps_text
+            if run.done and not row["done"]:
+                row["done"] = True
+                row["button"].configure(text="Dismiss", fg_color="#334155", hover_color="#1e293b")
+                kind = "FLEET" if isinstance(run, FleetRun) else "WORKFLOW"
+                self.write_log(f"[{kind}] {name} {'berhasil' if run.ok else 'selesai dengan error'}: {summary} ({elapsed:.1f}s)", "success" if run.ok else "error")
+                if isinstance(run, FleetRun):
+                    self.write_log("\n".join(run.summary()), "info")
+            if row["pos"] != pos:
+                row["frame"].grid(row=pos, column=0, sticky="ew", padx=10, pady=6)
+                row["pos"] = pos
+
+        if runs:
+            self.workflows_frame.grid()
+        else:
+            self.workflows_frame.grid_remove()
+
+    def execute_command(self, cmd: str, name: str, job: Job | None = None) -> concurrent.futures.Future:
+        """Start ``cmd`` on the execution engine and return its future.
+
+        Output reaches the log as whole-line blocks, stdout and stderr kept
+        apart, on the job's own channel; [FINISHED]/[FAILED] is written once
+        the process exits.
+        """
+        job_id = job.id if job is not None else None
+        if job_id is not None:
+            self.channels.open(job_id, name)
+        self.write_log(f"\n[STARTING] {name}...", "info", job_id)
+        tags = {"stdout": "info", "stderr": "stderr"}
+
+        # Options were copied onto the job when it was queued; the catalog is
+        # only read on the Tk thread.
+        opts = job.options if job is not None else {}
+        # Entries with cache_ttl keep their output for the result cache.
+        capture: list[tuple[str, str]] | None = [] if opts.get("cache_ttl") else None
+        captured = [0]
+        # Telemetry for the run history: [bytes, lines] and the process object.
+        output_size = [0, 0]
+        spawned: list = []
+        started = time.time()
+        started_mono = time.monotonic()
+        archive: RunArchiveWriter | None = None
+        if self._archive_output:
+            try:
+                archive = RunArchiveWriter(self.archive_dir, new_run_id(), name, cmd, started)
+            except OSError:
+                archive = None
+
+        def emit(text: str, tag: str, runs: list | None = None, replaces_progress: bool = False) -> None:
+            nonlocal capture
+            self.write_output(text, tag, job_id, runs, replaces_progress)
+            if archive is not None:
+                archive.append(tag, text)
+            if capture is not None:
+                captured[0] += len(text)
+                if captured[0] > self.result_cache.max_entry_bytes:
+                    capture = None
+                else:
+                    capture.append((tag, text))
+
+        # \r redraws become one in-place progress line, ANSI colours become tags.
+        terminals = {
+            stream: TerminalStream(
+                on_lines=lambda text, runs, replaces, tag=tag: emit(text, tag, runs, replaces),
+                on_progress=lambda text, runs, tag=tag: self.write_progress(text, tag, job_id, runs),
+            )
+            for stream, tag in tags.items()
+        }
+
+        def on_output(text: str, stream: str) -> None:
+            output_size[0] += len(text.encode("utf-8", "replace"))
+            output_size[1] += text.count("\n")
+            terminals[stream].feed(text)
+
+        def on_done(future: concurrent.futures.Future) -> None:
+            if deadline is not None:
+                deadline.cancel()
+            for terminal in terminals.values():
+                terminal.flush()
+            cancelled = job is not None and job.cancel_requested
+            run_id = archive.run_id if archive is not None else None
+            try:
+                return_code = future.result()
+            except Exception as e:
+                self.write_log(f"[EXCEPTION] {e}", "error", job_id)
+                if archive is not None:
+                    archive.close(None)
+                    self.prune_archive_soon()
+                self._record_run(name, cmd, started, started_mono, spawned, output_size, None, "cancelled" if cancelled else "failed", run_id)
+                if job_id in self._quiet_jobs:
+                    self.log_queue.put(("", "info", job_id, None, self.QUIET_END))
+                return
+            if archive is not None:
+                archive.close(return_code)
+                self.prune_archive_soon()
+            self._record_run(name, cmd, started, started_mono, spawned, output_size, return_code, "cancelled" if cancelled else "ok" if return_code == 0 else "failed", run_id)
+            if capture is not None and not cancelled:
+                self.result_cache.put((name, cmd), capture, return_code)
+            if job_id in self._quiet_jobs:
+                self.write_log(f"[REFRESHED] {name} — cached output updated (kode {return_code}), see job #{job_id}.", "success")
+                # Behind the job's own output in the queue, so all of it is still routed quietly.
+                self.log_queue.put(("", "info", job_id, None, self.QUIET_END))
+            if timed_out:
+                self.write_log(f"[TIMEOUT] {name} dihentikan setelah {timeout:g}s (kode {return_code})", "error", job_id)
+            elif cancelled:
+                self.write_log(f"[CANCELLED] {name} (kode {return_code})", "error", job_id)
+            elif return_code == 0:
+                self.write_log(f"[FINISHED] {name} berhasil.", "success", job_id)
+            else:
+                self.write_log(f"[FAILED] {name} berhenti dengan kode {return_code}", "error", job_id)
+
+        # Wall-clock limit: the timer kills the whole process group.
+        timeout = opts.get("timeout")
+        deadline: threading.Timer | None = None
+        timed_out = False
+
+        def expire(process) -> None:
+            nonlocal timed_out
+            timed_out = True
+            terminate_process(process)
+
+        def on_spawn(process) -> None:
+            nonlocal deadline
+            spawned.append(process)
+            if job is not None:
+                job.attach(process)
+            if timeout:
+                deadline = threading.Timer(timeout, expire, (process,))
+                deadline.daemon = True
+                deadline.start()
+
+        limits = describe_limits(opts)
+        if limits:
+            self.write_log(f"[LIMITS] {limits}", "info", job_id)
+        helper_cmd = strip_pkexec(cmd) if self.helper is not None else None
+        run_cmd, notes = wrap_command(cmd, opts)
+        if helper_cmd is not None:
+            helper_cmd, notes = wrap_command(helper_cmd, opts, user=False)
+        for note in notes:
+            self.write_log(f"[LIMITS] {note}", "stderr", job_id)
+        if helper_cmd is not None:
+            # Runs as root in the helper session; falls back to plain pkexec
+            # if the helper cannot be started.
+            future = self.helper.run(helper_cmd, on_output, on_spawn=on_spawn, fallback_cmd=run_cmd)
+        else:
+            future = self.engine.run_shell(run_cmd, on_output, on_spawn=on_spawn)
+        future.add_done_callback(on_done)
+        return future
+
+    def _record_run(
+        self,
+        name: str,
+        cmd: str,
+        started: float,
+        started_mono: float,
+        spawned: list,
+        output_size: list[int],
+        exit_code: int | None,
+        status: str,
+        run_id: str | None = None,
+    ) -> None:
+        if self.history is None:
+            return
+        usage = getattr(spawned[0], "rusage", None) if spawned else None
+        self.history.record({
+            "name": name,
+            "command": cmd,
+            "started": started,
+            "finished": time.time(),
+            "wall_s": time.monotonic() - started_mono,
+            "cpu_user_s": usage.ru_utime if usage is not None else None,
+            "cpu_sys_s": usage.ru_stime if usage is not None else None,
+            "out_bytes": output_size[0],
+            "out_lines": output_size[1],
+            "exit_code": exit_code,
+            "status": status,
+            "run_id": run_id,
+        })
 
     def on_exit(self) -> None:
+        if self._save_after_id is not None:
+            self._flush_scheduled_save()
+        self.catalog_watcher.stop()
+        if self.helper is not None:
+            self.helper.stop()
+        try:
+            self.result_cache.save()
+        except Exception:
+            pass
+        self.engine.stop()
+        self.archive_search.shutdown()
+        if self.instance is not None:
+            self.instance.close()
+        if self.metrics_window is not None:
+            self.metrics_window.close()
+        if self.history is not None:
+            self.history.close()
+        self.spill_log.close()
         try:
             self.root.destroy()
         except Exception:
             pass
 
 
-def main() -> None:
+def main(instance: InstanceServer | None = None, run_names: list[str] | None = None) -> None:
     root = ctk.CTk()
-    ServiceManagerApp(root)
+    app = ServiceManagerApp(root, instance)
+    if run_names:
+        # ``--run`` without an instance server to queue it on.
+        root.after_idle(app.on_instance_request, {"op": "run", "names": run_names})
     root.mainloop()
 
 
@@ -0,0 +1,211 @@
+"""Single-loop subprocess engine.
+
+One asyncio event loop runs in a background thread and multiplexes every
+running command. stdout and stderr are read separately in large byte chunks
+and decoded incrementally, so callers receive text blocks rather than one
+call per line, and the thread count stays flat no matter how many jobs run
+at once.
+
+Children are reaped with ``os.wait4`` where the interpreter still allows a
+custom child watcher, so every finished process carries its own CPU time
+(``process.rusage``). Its ``ru_maxrss`` is not the command's own: a child
+forked from this process inherits our peak RSS at fork/exec time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import concurrent.futures
+import os
+import threading
+import warnings
+from typing import Any, Callable, Coroutine
+
+CHUNK_SIZE = 64 * 1024
+
+
+# pid -> resource usage of reaped children, until the engine picks it up.
+_child_rusage: dict[int, Any] = {}
+
+
+if hasattr(asyncio, "AbstractChildWatcher"):
+
+    class _RusageChildWatcher(asyncio.AbstractChildWatcher):
+        """pidfd-based child watcher that reaps with ``os.wait4``.
+
+        Same approach as asyncio's PidfdChildWatcher (no threads, no SIGCHLD),
+        but keeps each child's rusage instead of throwing it away.
+        """
+
+        def __init__(self) -> None:
+            self._loop: asyncio.AbstractEventLoop | None = None
+            self._pidfds: dict[int, int] = {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc) -> None:
+            pass
+
+        def is_active(self) -> bool:
+            return self._loop is not None and self._loop.is_running()
+
+        def close(self) -> None:
+            self.attach_loop(None)
+
+        def attach_loop(self, loop) -> None:
+            for pidfd in self._pidfds.values():
+                if self._loop is not None:
+                    self._loop.remove_reader(pidfd)
+                os.close(pidfd)
+            self._pidfds.clear()
+            self._loop = loop
+
+        def add_child_handler(self, pid, callback, *args) -> None:
+            assert self._loop is not None
+            pidfd = self._pidfds.get(pid)
+            if pidfd is None:
+                pidfd = os.pidfd_open(pid)
+                self._pidfds[pid] = pidfd
+            self._loop.add_reader(pidfd, self._reap, pid, callback, args)
+
+        def remove_child_handler(self, pid) -> bool:
+            pidfd = self._pidfds.pop(pid, None)
+            if pidfd is None:
+                return False
+            assert self._loop is not None
+            self._loop.remove_reader(pidfd)
+            os.close(pidfd)
+            return True
+
+        def _reap(self, pid: int, callback, args) -> None:
+            self.remove_child_handler(pid)
+            try:
+                _pid, status, usage = os.wait4(pid, 0)
+            except ChildProcessError:
+                returncode = 255
+            else:
+                returncode = os.waitstatus_to_exitcode(status)
+                _child_rusage[pid] = usage
+            callback(pid, returncode, *args)
+
+
+def _install_child_watcher(loop: asyncio.AbstractEventLoop) -> None:
+    """Use a pidfd child watcher that records rusage.
+
+    Before 3.12 the default watcher would also start one thread per child
+    process. Interpreters without child watchers (3.14+) keep their own
+    pidfd reaping; runs then have no rusage.
+    """
+    if not hasattr(asyncio, "AbstractChildWatcher") or not hasattr(os, "pidfd_open"):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        watcher = _RusageChildWatcher()
+        watcher.attach_loop(loop)
+        asyncio.set_child_watcher(watcher)
+
+
+class ExecutionEngine:
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # Loop management
+    # -------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run() -> None:
+                asyncio.set_event_loop(loop)
+                _install_child_watcher(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=_run, name="exec-engine", daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            return loop
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def call_soon(self, callback: Callable[..., Any], *args: Any) -> None:
+        self._ensure_loop().call_soon_threadsafe(callback, *args)
+
+    def stop(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+
+    # -------------------------
+    # Subprocesses
+    # -------------------------
+    def run_shell(
+        self,
+        cmd: str,
+        on_output: Callable[[str, str], None],
+        on_spawn: Callable[[Any], None] | None = None,
+    ) -> concurrent.futures.Future:
+        """Run ``cmd`` through the shell; resolves to its return code.
+
+        ``on_output(text, stream)`` receives decoded chunks, with ``stream``
+        being ``"stdout"`` or ``"stderr"``; ``on_spawn`` gets the asyncio
+        process object. Both run on the loop thread. Once the future is done
+        the process object has a ``rusage`` attribute (``None`` if unknown).
+        """
+        return self.submit(self.shell(cmd, on_output, on_spawn))
+
+    async def _pump(self, reader: asyncio.StreamReader, stream: str, on_output: Callable[[str, str], None]) -> None:
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        while True:
+            data = await reader.read(self.chunk_size)
+            if not data:
+                break
+            text = decoder.decode(data)
+            if text:
+                on_output(text, stream)
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            on_output(tail, stream)
+
+    async def shell(
+        self,
+        cmd: str,
+        on_output: Callable[[str, str], None],
+        on_spawn: Callable[[Any], None] | None = None,
+    ) -> int:
+        """Coroutine behind ``run_shell``, for code already running on the loop."""
+        process = await asyncio.create_subprocess_shell(
+            cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            # Own process group, so cancel can kill the whole pipeline.
+            start_new_session=True,
+            limit=self.chunk_size,
+        )
+        if on_spawn is not None:
+            on_spawn(process)
+
+        assert process.stdout is not None and process.stderr is not None
+        await asyncio.gather(
+            self._pump(process.stdout, "stdout", on_output),
+            self._pump(process.stderr, "stderr", on_output),
+        )
+        code = await process.wait()
+        process.rusage = _child_rusage.pop(process.pid, None)
+        return code
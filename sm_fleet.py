@@ -0,0 +1,262 @@
+"""Fan-out: run one catalog entry on many hosts.
+
+Hosts are listed next to the entries in ``commands.json``::
+
+    "hosts": [
+        "web1.lan",
+        {"name": "db1", "address": "admin@10.0.0.12", "port": 2222}
+    ]
+
+Each host becomes an ordinary scheduler job named ``"<entry> @ <host>"``,
+so it gets its own log channel, Cancel button, history row and archive.
+The command reaching the job is produced by a transport: ``SSHTransport``
+wraps it in ``ssh`` with a shared ControlMaster socket per host (the first
+run opens the connection, later runs reuse it for ``CONTROL_PERSIST_S``);
+``LocalTransport`` runs it on this machine with ``FLEET_HOST`` set, as a
+stand-in for trying fan-out without a fleet.
+
+``pkexec`` has no agent over SSH, so remote commands use ``sudo -n``
+instead (passwordless sudo on the hosts).
+"""
+
+from __future__ import annotations
+
+import os
+import shlex
+import threading
+import time
+from typing import Callable
+
+from sm_catalog import runtime_dir
+from sm_helper import PKEXEC_RE, split_list
+from sm_jobs import CANCELLED, Job, JobScheduler
+
+HOST_WAITING = "waiting"
+HOST_RUNNING = "running"
+HOST_OK = "ok"
+HOST_FAILED = "failed"
+HOST_UNREACHABLE = "unreachable"
+HOST_CANCELLED = "cancelled"
+FINAL_STATES = (HOST_OK, HOST_FAILED, HOST_UNREACHABLE, HOST_CANCELLED)
+
+CONTROL_PERSIST_S = 600
+CONNECT_TIMEOUT_S = 10
+# ssh exits with 255 when it could not connect or authenticate.
+SSH_ERROR = 255
+
+
+def remote_command(cmd: str) -> str:
+    """``cmd`` as run on a host: each list element's leading ``pkexec`` becomes ``sudo -n``.
+
+    There is no polkit agent on the far end of a batch ssh session. Commands
+    the split cannot follow (subshells, substitutions) are sent unchanged.
+    """
+    parts = split_list(cmd)
+    if parts is None:
+        return cmd
+    return "".join(PKEXEC_RE.sub(r"\1sudo -n ", p) if n % 2 == 0 else p for n, p in enumerate(parts))
+
+
+# -------------------------
+# Transports
+# -------------------------
+class SSHTransport:
+    name = "ssh"
+
+    def __init__(self, control_dir: str | None = None, persist_s: int = CONTROL_PERSIST_S):
+        self.control_dir = control_dir
+        self.persist_s = persist_s
+
+    def command(self, host: dict, cmd: str) -> str:
+        control_dir = self.control_dir or runtime_dir()
+        argv = [
+            "ssh",
+            "-o", "BatchMode=yes",
+            "-o", f"ConnectTimeout={CONNECT_TIMEOUT_S}",
+            "-o", "ControlMaster=auto",
+            # %C is a hash of the connection, short enough for a socket path.
+            "-o", f"ControlPath={os.path.join(control_dir, 'ssh-%C')}",
+            "-o", f"ControlPersist={self.persist_s}",
+        ]
+        if "port" in host:
+            argv += ["-p", str(host["port"])]
+        argv += [host.get("address", host["name"]), "--", remote_command(cmd)]
+        return shlex.join(argv)
+
+
+class LocalTransport:
+    """Runs every "host" here; for trying fan-out without real machines."""
+
+    name = "local"
+
+    def command(self, host: dict, cmd: str) -> str:
+        return f"env FLEET_HOST={shlex.quote(host['name'])} sh -c {shlex.quote(remote_command(cmd))}"
+
+
+TRANSPORTS = {"ssh": SSHTransport, "local": LocalTransport}
+
+
+def make_transport(name: str | None):
+    return TRANSPORTS.get(name or "ssh", SSHTransport)()
+
+
+def host_entries(entry: dict, hosts: list[dict], transport) -> list[dict]:
+    """One pseudo catalog entry per host, ready for the scheduler or CLI runner.
+
+    A ``lock`` is kept per host (two dnf runs on one host still wait for
+    each other); ``exclusive`` is about this machine and is dropped.
+    """
+    entries = []
+    for host in hosts:
+        item = {
+            "name": f"{entry['name']} @ {host['name']}",
+            "command": transport.command(host, entry["command"]),
+            "host": host["name"],
+        }
+        if entry.get("lock"):
+            item["lock"] = f"{entry['lock']}@{host['name']}"
+        entries.append(item)
+    return entries
+
+
+def host_state(exit_code: int | None, cancelled: bool, transport_name: str) -> str:
+    if cancelled:
+        return HOST_CANCELLED
+    if exit_code == 0:
+        return HOST_OK
+    if exit_code == SSH_ERROR and transport_name == "ssh":
+        return HOST_UNREACHABLE
+    return HOST_FAILED
+
+
+def format_summary(rows: list[dict]) -> list[str]:
+    """Table lines for ``[{"host", "state", "exit_code", "duration"}]``."""
+    width = max([4] + [len(r["host"]) for r in rows])
+    lines = [f"{'Host':<{width}}  {'Status':<11} {'Exit':>5} {'Time':>8}"]
+    for r in rows:
+        exit_code = "-" if r["exit_code"] is None else str(r["exit_code"])
+        duration = "-" if r["duration"] is None else f"{r['duration']:.1f}s"
+        lines.append(f"{r['host']:<{width}}  {r['state']:<11} {exit_code:>5} {duration:>8}")
+    return lines
+
+
+# -------------------------
+# Runs
+# -------------------------
+class HostRun:
+    __slots__ = ("host", "entry", "state", "job", "exit_code", "finished")
+
+    def __init__(self, host: str, entry: dict):
+        self.host = host
+        self.entry = entry
+        self.state = HOST_WAITING
+        self.job: Job | None = None
+        self.exit_code: int | None = None
+        self.finished: float | None = None
+
+    @property
+    def duration(self) -> float | None:
+        if self.job is None or self.job.started is None:
+            return None
+        return (self.finished or time.time()) - self.job.started
+
+
+class FleetRun:
+    """One entry fanned out over hosts, at most ``max_parallel`` at a time.
+
+    Hosts are handed to the scheduler only as slots free up, so a large
+    fleet does not flood the job queue. ``on_change`` is called from
+    whichever thread finished a host.
+    """
+
+    def __init__(
+        self,
+        entry: dict,
+        hosts: list[dict],
+        scheduler: JobScheduler,
+        transport,
+        max_parallel: int = 8,
+        on_change: Callable[[], None] | None = None,
+    ):
+        self.name = entry["name"]
+        self.scheduler = scheduler
+        self.transport = transport
+        self.max_parallel = max(1, int(max_parallel))
+        self._on_change = on_change
+        self._lock = threading.Lock()
+        self.hosts = [HostRun(item["host"], item) for item in host_entries(entry, hosts, transport)]
+        self.started = time.time()
+        self.finished: float | None = None
+        self.cancel_requested = False
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    @property
+    def ok(self) -> bool:
+        return all(h.state == HOST_OK for h in self.hosts)
+
+    def counts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for h in self.hosts:
+            counts[h.state] = counts.get(h.state, 0) + 1
+        return counts
+
+    def summary(self) -> list[str]:
+        return format_summary([{"host": h.host, "state": h.state, "exit_code": h.exit_code, "duration": h.duration} for h in self.hosts])
+
+    def start(self) -> None:
+        self._fill()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancel_requested = True
+            job_ids = [h.job.id for h in self.hosts if h.state == HOST_RUNNING and h.job is not None]
+            for h in self.hosts:
+                if h.state == HOST_WAITING:
+                    h.state = HOST_CANCELLED
+        for job_id in job_ids:
+            self.scheduler.cancel(job_id)
+        self._fill()
+
+    def _fill(self) -> None:
+        to_submit: list[HostRun] = []
+        with self._lock:
+            running = sum(1 for h in self.hosts if h.state == HOST_RUNNING)
+            for h in self.hosts:
+                if running >= self.max_parallel:
+                    break
+                if h.state == HOST_WAITING:
+                    h.state = HOST_RUNNING
+                    running += 1
+                    to_submit.append(h)
+            if not to_submit and self.finished is None and all(h.state in FINAL_STATES for h in self.hosts):
+                self.finished = time.time()
+        for h in to_submit:
+            job = self.scheduler.submit(h.entry["name"], h.entry["command"], lock=h.entry.get("lock"))
+            if job is None:
+                # Same host run already queued by hand; do not start a second one.
+                self._host_finished(h, None, HOST_FAILED)
+                continue
+            h.job = job
+            job.add_done_callback(lambda j, h=h: self._on_job_done(h, j))
+        self._changed()
+
+    def _on_job_done(self, h: HostRun, job: Job) -> None:
+        cancelled = job.state == CANCELLED or job.cancel_requested
+        self._host_finished(h, job.exit_code, host_state(job.exit_code, cancelled, self.transport.name))
+
+    def _host_finished(self, h: HostRun, exit_code: int | None, state: str) -> None:
+        with self._lock:
+            h.exit_code = exit_code
+            h.finished = time.time()
+            h.state = state
+        self._fill()
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            try:
+                self._on_change()
+            except Exception:
+                pass
@@ -0,0 +1,490 @@
+"""Privileged helper session for ``pkexec`` entries.
+
+Instead of one polkit prompt and one ``pkexec`` spawn per command, the GUI
+can start a single helper process through ``pkexec`` once per session. The
+helper listens on a Unix socket in the user's runtime directory, accepts
+exactly one client (checked by peer uid and a random token handed over on
+stdin), runs the commands it is sent as root and streams their output back.
+It exits as soon as that client disconnects.
+
+The wire format is one JSON object per line. Client to helper::
+
+    {"op": "hello", "token": "..."}
+    {"op": "run", "id": 1, "cmd": "dnf clean all"}
+    {"op": "signal", "id": 1, "sig": 15}
+
+Helper to client::
+
+    {"ok": true}
+    {"id": 1, "pid": 4242}
+    {"id": 1, "stream": "stdout", "data": "..."}
+    {"id": 1, "exit": 0}
+
+With ``mode="local"`` the same helper is started without ``pkexec`` as an
+unprivileged stand-in, which exercises the whole path without root.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import concurrent.futures
+import hmac
+import itertools
+import json
+import os
+import re
+import secrets
+import shlex
+import signal
+import socket
+import struct
+import sys
+from typing import Any, Callable
+
+from sm_catalog import runtime_dir
+from sm_engine import CHUNK_SIZE, ExecutionEngine
+
+CONNECT_TIMEOUT_S = 120.0
+# ``pkexec`` as the literal first word of a list element, options excluded.
+PKEXEC_RE = re.compile(r"^(\s*)pkexec\s+(?!-)")
+# Outside quotes these start subshells, groups or substitutions, whose
+# inner commands the split below cannot see.
+_UNSPLITTABLE = frozenset("(){}`")
+
+
+def split_list(cmd: str) -> list[str] | None:
+    """Split a shell list at its top-level ``&&``, ``||``, ``;``, ``|``, ``&``
+    and newlines, quote-aware and keeping every character.
+
+    Returns ``[element, separator, element, ...]``, or None for anything it
+    does not model: subshells, ``$(...)``, backticks, unbalanced quotes.
+    """
+    parts: list[str] = []
+    start = i = 0
+    quote = ""
+    while i < len(cmd):
+        c = cmd[i]
+        if quote == "'":
+            if c == "'":
+                quote = ""
+        elif c == "\\":
+            i += 1
+        elif quote == '"':
+            if c == '"':
+                quote = ""
+            elif c == "`" or cmd.startswith("$(", i):
+                return None
+        elif c in "'\"":
+            quote = c
+        elif c in _UNSPLITTABLE or cmd.startswith("$(", i):
+            return None
+        elif c in "&|" and (cmd[i - 1:i] in ("<", ">") and i > 0 or cmd[i:i + 2] == "&>"):
+            pass  # a redirection: 2>&1, &>file, >|file
+        elif c in "&|;\n":
+            sep = cmd[i:i + 2] if cmd[i:i + 2] in ("&&", "||") else c
+            parts += [cmd[start:i], sep]
+            i += len(sep)
+            start = i
+            continue
+        i += 1
+    if quote or i > len(cmd):
+        return None
+    parts.append(cmd[start:])
+    return parts
+
+
+def _runs_pkexec(element: str) -> bool:
+    if not PKEXEC_RE.match(element):
+        return False
+    try:
+        words = shlex.split(element)
+    except ValueError:
+        return False
+    return len(words) >= 2 and words[0] == "pkexec"
+
+
+def strip_pkexec(cmd: str) -> str | None:
+    """Command to send to the helper, or None if it should not go there.
+
+    Only a list whose every element starts with a plain ``pkexec`` (no
+    options) qualifies: ``pkexec a && pkexec b`` becomes ``a && b`` run by
+    the (already root) helper. Anything else, including ``a | pkexec b``,
+    keeps running through pkexec as written.
+    """
+    parts = split_list(cmd.strip())
+    if parts is None or not all(_runs_pkexec(e) for e in parts[::2]):
+        return None
+    return "".join(PKEXEC_RE.sub(r"\1", p) if n % 2 == 0 else p for n, p in enumerate(parts))
+
+
+def helper_argv(socket_path: str, uid: int) -> list[str]:
+    """Command line that starts the helper side (``sm helper ...``)."""
+    if getattr(sys, "frozen", False):
+        base = [sys.executable]
+    else:
+        base = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "sm.py")]
+    return [*base, "helper", "--socket", socket_path, "--uid", str(uid)]
+
+
+def _send(writer: asyncio.StreamWriter, message: dict) -> None:
+    writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+# -------------------------
+# Helper side
+# -------------------------
+class HelperServer:
+    def __init__(self, socket_path: str, uid: int, token: str):
+        self.socket_path = socket_path
+        self.uid = uid
+        self.token = token
+        self._client_seen = False
+        self._done: asyncio.Event | None = None
+        self._processes: dict[int, asyncio.subprocess.Process] = {}
+
+    def _bind(self) -> tuple[socket.socket, int]:
+        """Listening socket in the client's runtime directory, plus a fd on that directory.
+
+        The helper runs as root inside a directory the user controls, so
+        nothing here goes by path twice: the directory is opened once (not
+        through a symlink) and checked to be the user's private one, and
+        the socket is bound and later unlinked relative to that fd. The
+        socket is created connectable by anyone under a zero umask instead
+        of being chmod/chown-ed afterwards; the 0700 directory, the peer
+        uid check and the token keep everyone else out.
+        """
+        directory, name = os.path.split(self.socket_path)
+        dir_fd = os.open(directory or ".", os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW | os.O_CLOEXEC)
+        try:
+            st = os.fstat(dir_fd)
+            if st.st_uid != self.uid or st.st_mode & 0o077:
+                raise PermissionError(f"{directory} is not a private directory of uid {self.uid}")
+            try:
+                os.unlink(name, dir_fd=dir_fd)
+            except FileNotFoundError:
+                pass
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_CLOEXEC)
+            old_umask = os.umask(0)
+            try:
+                sock.bind(f"/proc/self/fd/{dir_fd}/{name}")
+            finally:
+                os.umask(old_umask)
+        except BaseException:
+            os.close(dir_fd)
+            raise
+        return sock, dir_fd
+
+    async def serve(self) -> None:
+        self._done = asyncio.Event()
+        sock, dir_fd = self._bind()
+        server = await asyncio.start_unix_server(self._handle, sock=sock, limit=CHUNK_SIZE)
+        try:
+            try:
+                await asyncio.wait_for(self._done.wait(), CONNECT_TIMEOUT_S)
+            except asyncio.TimeoutError:
+                if not self._client_seen:
+                    return
+                await self._done.wait()
+        finally:
+            server.close()
+            try:
+                os.unlink(os.path.basename(self.socket_path), dir_fd=dir_fd)
+            except OSError:
+                pass
+            os.close(dir_fd)
+
+    def _peer_uid(self, writer: asyncio.StreamWriter) -> int | None:
+        sock = writer.get_extra_info("socket")
+        if sock is None:
+            return None
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _pid, uid, _gid = struct.unpack("3i", creds)
+        return uid
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self._client_seen or self._peer_uid(writer) != self.uid:
+            writer.close()
+            return
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+        except ValueError:
+            hello = {}
+        if not hmac.compare_digest(str(hello.get("token", "")), self.token):
+            writer.close()
+            return
+        self._client_seen = True
+        _send(writer, {"ok": True})
+
+        tasks: set[asyncio.Task] = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if message.get("op") == "run":
+                    task = asyncio.ensure_future(self._run(int(message["id"]), str(message["cmd"]), writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif message.get("op") == "signal":
+                    process = self._processes.get(int(message.get("id", -1)))
+                    if process is not None and process.returncode is None:
+                        try:
+                            os.killpg(process.pid, int(message.get("sig", signal.SIGTERM)))
+                        except ProcessLookupError:
+                            pass
+                elif message.get("op") == "shutdown":
+                    break
+        finally:
+            # The session ends with its client: nothing keeps running as root.
+            for process in self._processes.values():
+                if process.returncode is None:
+                    try:
+                        os.killpg(process.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+            writer.close()
+            assert self._done is not None
+            self._done.set()
+
+    async def _run(self, run_id: int, cmd: str, writer: asyncio.StreamWriter) -> None:
+        try:
+            process = await asyncio.create_subprocess_shell(
+                cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+                limit=CHUNK_SIZE,
+            )
+        except OSError as e:
+            _send(writer, {"id": run_id, "stream": "stderr", "data": f"{e}\n"})
+            _send(writer, {"id": run_id, "exit": 127})
+            return
+        self._processes[run_id] = process
+        _send(writer, {"id": run_id, "pid": process.pid})
+
+        async def pump(stream_reader: asyncio.StreamReader, stream: str) -> None:
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+            while True:
+                data = await stream_reader.read(CHUNK_SIZE)
+                text = decoder.decode(data, final=not data)
+                if text:
+                    _send(writer, {"id": run_id, "stream": stream, "data": text})
+                    await writer.drain()
+                if not data:
+                    break
+
+        assert process.stdout is not None and process.stderr is not None
+        await asyncio.gather(pump(process.stdout, "stdout"), pump(process.stderr, "stderr"))
+        code = await process.wait()
+        self._processes.pop(run_id, None)
+        _send(writer, {"id": run_id, "exit": code})
+        await writer.drain()
+
+
+def serve(socket_path: str, uid: int) -> int:
+    """Entry point of the helper process; the token arrives on stdin."""
+    token = sys.stdin.readline().strip()
+    if not token:
+        return 2
+    asyncio.run(HelperServer(socket_path, uid, token).serve())
+    return 0
+
+
+# -------------------------
+# GUI side
+# -------------------------
+class HelperUnavailable(RuntimeError):
+    pass
+
+
+class RemoteProcess:
+    """Stands in for a local process object on a Job; cancel goes through the helper."""
+
+    def __init__(self, session: "HelperSession", run_id: int):
+        self._session = session
+        self.run_id = run_id
+        self.pid: int | None = None
+        self.returncode: int | None = None
+
+    def signal_group(self, sig: int) -> None:
+        self._session.engine.call_soon(self._session._send, {"op": "signal", "id": self.run_id, "sig": int(sig)})
+
+
+class HelperSession:
+    """Client for one helper process, living on the execution engine's loop.
+
+    The helper is started lazily by the first ``run``; if starting fails
+    (prompt dismissed, no polkit agent...) runs fall back to the original
+    command line until ``reset``.
+    """
+
+    def __init__(self, engine: ExecutionEngine, mode: str = "pkexec", on_status: Callable[[str, str], None] | None = None):
+        self.engine = engine
+        self.mode = mode
+        self.on_status = on_status
+        self.failed: str | None = None
+        self._ids = itertools.count(1)
+        self._starting: asyncio.Task | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._helper: asyncio.subprocess.Process | None = None
+        self._runs: dict[int, tuple[Callable[[str, str], None], asyncio.Future, RemoteProcess]] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    def run(
+        self,
+        cmd: str,
+        on_output: Callable[[str, str], None],
+        on_spawn: Callable[[Any], None] | None = None,
+        fallback_cmd: str | None = None,
+    ) -> concurrent.futures.Future:
+        """Like ``ExecutionEngine.run_shell`` but executed by the helper."""
+        return self.engine.submit(self._run(cmd, on_output, on_spawn, fallback_cmd))
+
+    def reset(self) -> None:
+        self.failed = None
+
+    def stop(self) -> None:
+        self.engine.call_soon(self._close)
+
+    # -------------------------
+    # Loop side
+    # -------------------------
+    def _status(self, text: str, tag: str = "info") -> None:
+        if self.on_status is not None:
+            try:
+                self.on_status(text, tag)
+            except Exception:
+                pass
+
+    def _send(self, message: dict) -> None:
+        if self._writer is not None:
+            _send(self._writer, message)
+
+    def _close(self) -> None:
+        if self._writer is not None:
+            self._send({"op": "shutdown"})
+            self._writer.close()
+            self._writer = None
+
+    async def _run(self, cmd: str, on_output, on_spawn, fallback_cmd: str | None) -> int:
+        try:
+            await self._ensure_started()
+        except HelperUnavailable:
+            if fallback_cmd is None:
+                raise
+            return await self.engine.shell(fallback_cmd, on_output, on_spawn)
+
+        run_id = next(self._ids)
+        process = RemoteProcess(self, run_id)
+        future = asyncio.get_running_loop().create_future()
+        self._runs[run_id] = (on_output, future, process)
+        if on_spawn is not None:
+            on_spawn(process)
+        self._send({"op": "run", "id": run_id, "cmd": cmd})
+        return await future
+
+    async def _ensure_started(self) -> None:
+        if self._writer is not None:
+            return
+        if self.failed is not None:
+            raise HelperUnavailable(self.failed)
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._start())
+        try:
+            await asyncio.shield(self._starting)
+        except Exception as e:
+            self.failed = str(e)
+            raise HelperUnavailable(str(e)) from e
+        finally:
+            if self._starting is not None and self._starting.done():
+                self._starting = None
+
+    async def _start(self) -> None:
+        socket_path = os.path.join(runtime_dir(), f"helper-{os.getpid()}.sock")
+        token = secrets.token_hex(32)
+        argv = helper_argv(socket_path, os.getuid())
+        if self.mode != "local":
+            argv = ["pkexec", *argv]
+        self._status(f"[HELPER] Starting privileged helper ({'local stand-in' if self.mode == 'local' else 'pkexec'})...")
+        try:
+            helper = await asyncio.create_subprocess_exec(
+                *argv,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as e:
+            raise HelperUnavailable(f"cannot start helper: {e}") from e
+        assert helper.stdin is not None
+        helper.stdin.write(token.encode() + b"\n")
+        await helper.stdin.drain()
+        helper.stdin.close()
+
+        # Wait for the socket while the user answers the polkit prompt.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CONNECT_TIMEOUT_S
+        while True:
+            if helper.returncode is not None:
+                err = (await helper.stderr.read()).decode("utf-8", "replace").strip() if helper.stderr else ""
+                raise HelperUnavailable(f"helper exited with code {helper.returncode}" + (f": {err}" if err else ""))
+            try:
+                reader, writer = await asyncio.open_unix_connection(socket_path, limit=CHUNK_SIZE)
+                break
+            except OSError:
+                if loop.time() > deadline:
+                    helper.kill()
+                    raise HelperUnavailable("timed out waiting for the helper")
+                await asyncio.sleep(0.1)
+
+        _send(writer, {"op": "hello", "token": token})
+        reply = await reader.readline()
+        if not reply or not json.loads(reply).get("ok"):
+            writer.close()
+            raise HelperUnavailable("helper refused the session")
+        self._helper = helper
+        self._writer = writer
+        asyncio.ensure_future(self._read_loop(reader))
+        self._status("[HELPER] Privileged helper ready; pkexec entries now run without further prompts.", "success")
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                run = self._runs.get(message.get("id"))
+                if run is None:
+                    continue
+                on_output, future, process = run
+                if "data" in message:
+                    on_output(message["data"], message.get("stream", "stdout"))
+                elif "pid" in message:
+                    process.pid = message["pid"]
+                elif "exit" in message:
+                    process.returncode = message["exit"]
+                    del self._runs[message["id"]]
+                    if not future.done():
+                        future.set_result(message["exit"])
+        finally:
+            self._writer = None
+            for _on_output, future, _process in self._runs.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("privileged helper went away"))
+            self._runs.clear()
+            if self._helper is not None and self._helper.returncode is None:
+                await self._helper.wait()
+            self._helper = None
+            self._status("[HELPER] Privileged helper session ended.")
@@ -0,0 +1,244 @@
+"""Run history in a local SQLite database.
+
+Every finished run becomes one row: name, command, start/end, wall time,
+child CPU time (from ``os.wait4`` via the engine), output bytes/lines, exit
+code and the run ID of its output archive (sm_archive).
+``record`` only queues the row; a writer thread inserts queued rows in
+batches, one transaction each, so the UI thread never waits on the disk.
+
+Reads (``command_stats``, ``recent_runs``) use their own connection and are
+cheap thanks to the ``(name, started)`` index.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from sm_catalog import APP_DIR_NAME
+
+BATCH_SIZE = 200
+FLUSH_INTERVAL_S = 1.0
+# Runs per command considered for percentiles and the trend.
+STATS_WINDOW = 200
+# A median this much slower than before is flagged.
+SLOWER_FLAG = 0.2
+
+# max_rss_kb is no longer recorded: wait4's ru_maxrss of a child forked from
+# the GUI includes the GUI's own peak. The column stays for old databases.
+COLUMNS = (
+    "name", "command", "started", "finished", "wall_s", "cpu_user_s", "cpu_sys_s",
+    "max_rss_kb", "out_bytes", "out_lines", "exit_code", "status", "run_id",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    command TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    wall_s REAL NOT NULL,
+    cpu_user_s REAL,
+    cpu_sys_s REAL,
+    max_rss_kb INTEGER,
+    out_bytes INTEGER NOT NULL DEFAULT 0,
+    out_lines INTEGER NOT NULL DEFAULT 0,
+    exit_code INTEGER,
+    status TEXT NOT NULL,
+    run_id TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_name_started ON runs (name, started);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+"""
+
+
+def default_history_path() -> str:
+    state_home = os.environ.get("XDG_STATE_HOME")
+    if not state_home:
+        state_home = os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(state_home, APP_DIR_NAME, "history.sqlite3")
+
+
+def percentile(sorted_values: list[float], pct: float) -> float | None:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    if seconds < 3600:
+        return f"{int(seconds) // 60}m {int(seconds) % 60}s"
+    return f"{int(seconds) // 3600}h {int(seconds) % 3600 // 60}m"
+
+
+def format_stats_table(stats: list[dict], name_width: int = 44) -> tuple[str, list[tuple[str, bool]]]:
+    """Header and ``(line, slower)`` rows for ``command_stats`` output.
+
+    ``slower`` flags commands whose median got at least ``SLOWER_FLAG`` slower.
+    """
+    header = f"{'Command':<{name_width}} {'runs':>5} {'p50':>8} {'p95':>8} {'last':>8} {'trend':>7} {'fail':>5} {'cpu p50':>8}"
+    rows = []
+    for st in stats:
+        name = st["name"] if len(st["name"]) <= name_width else st["name"][:name_width - 3] + "..."
+        trend = "-" if st["trend"] is None else f"{st['trend']:+.0%}"
+        line = (
+            f"{name:<{name_width}} {st['runs']:>5} {format_duration(st['p50_s']):>8} {format_duration(st['p95_s']):>8} "
+            f"{format_duration(st['last_s']):>8} {trend:>7} {st['failed']:>5} {format_duration(st['cpu_p50_s']):>8}"
+        )
+        rows.append((line, st["trend"] is not None and st["trend"] >= SLOWER_FLAG))
+    return header, rows
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class HistoryStore:
+    def __init__(self, path: str | None = None):
+        self.path = path or default_history_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with _connect(self.path) as conn:
+            conn.executescript(_SCHEMA)
+            # Databases from before output archiving lack run_id.
+            if "run_id" not in {row[1] for row in conn.execute("PRAGMA table_info(runs)")}:
+                conn.execute("ALTER TABLE runs ADD COLUMN run_id TEXT")
+        self._queue: queue.Queue[dict | None] = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._reader: sqlite3.Connection | None = None
+        self._read_lock = threading.Lock()
+        # Set after every committed batch; readers clear it and re-query.
+        self.committed = threading.Event()
+        self._thread = threading.Thread(target=self._writer, name="history-writer", daemon=True)
+        self._thread.start()
+
+    # -------------------------
+    # Writing
+    # -------------------------
+    def record(self, run: dict) -> None:
+        """Queue one run (a dict with the keys in ``COLUMNS``); never blocks."""
+        with self._idle:
+            self._pending += 1
+        self._queue.put(run)
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """Wait until everything queued so far is committed."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending and time.monotonic() < deadline:
+                self._idle.wait(deadline - time.monotonic())
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def _writer(self) -> None:
+        conn = _connect(self.path)
+        sql = f"INSERT INTO runs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})"
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch: list[dict] = []
+            deadline = time.monotonic() + FLUSH_INTERVAL_S
+            # Collect whatever else arrives shortly, up to one batch.
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if item is None:
+                stop = True
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(sql, [tuple(run.get(c) for c in COLUMNS) for run in batch])
+                except sqlite3.Error:
+                    pass
+                with self._idle:
+                    self._pending -= len(batch)
+                    self._idle.notify_all()
+                self.committed.set()
+        conn.close()
+
+    # -------------------------
+    # Reading
+    # -------------------------
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._read_lock:
+            if self._reader is None:
+                self._reader = _connect(self.path)
+            return self._reader.execute(sql, params).fetchall()
+
+    def recent_runs(self, name: str | None = None, limit: int = 50) -> list[dict]:
+        where, params = ("WHERE name = ?", (name,)) if name else ("", ())
+        rows = self._query(f"SELECT {', '.join(COLUMNS)} FROM runs {where} ORDER BY started DESC LIMIT ?", (*params, limit))
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def command_stats(self, window: int = STATS_WINDOW) -> list[dict]:
+        """Per command: run count, p50/p95 wall time, failures and trend.
+
+        Only the last ``window`` runs of each command count. ``trend`` is the
+        relative change of the median wall time of the newer half of those
+        runs against the older half (``0.25`` = 25% slower), or None with
+        fewer than 4 runs.
+        """
+        rows = self._query(
+            """
+            SELECT name, wall_s, status, cpu_user_s, cpu_sys_s, started FROM (
+                SELECT name, wall_s, status, cpu_user_s, cpu_sys_s, started,
+                       ROW_NUMBER() OVER (PARTITION BY name ORDER BY started DESC) AS rn
+                FROM runs
+            ) WHERE rn <= ? ORDER BY name, started
+            """,
+            (window,),
+        )
+        grouped: dict[str, list[tuple]] = {}
+        for row in rows:
+            grouped.setdefault(row[0], []).append(row)
+
+        stats = []
+        for name, runs in grouped.items():
+            walls = [r[1] for r in runs]
+            ordered = sorted(walls)
+            trend = None
+            if len(walls) >= 4:
+                half = len(walls) // 2
+                older = percentile(sorted(walls[:half]), 50)
+                newer = percentile(sorted(walls[-half:]), 50)
+                if older:
+                    trend = (newer - older) / older
+            cpu = [r[3] + r[4] for r in runs if r[3] is not None and r[4] is not None]
+            stats.append({
+                "name": name,
+                "runs": len(runs),
+                "p50_s": percentile(ordered, 50),
+                "p95_s": percentile(ordered, 95),
+                "last_s": walls[-1],
+                "last_started": runs[-1][5],
+                "failed": sum(1 for r in runs if r[2] == "failed"),
+                "cpu_p50_s": percentile(sorted(cpu), 50),
+                "trend": trend,
+            })
+        return stats
@@ -0,0 +1,170 @@
+"""Single-instance handoff for the GUI.
+
+The first GUI process takes an ``flock`` on ``instance.lock`` in the user's
+runtime directory and listens on ``instance.sock`` next to it. A later
+launch (a second click on the .desktop entry, or ``sm --run NAME``) finds the
+lock taken, sends its request over the socket and exits; it never imports
+Tk or customtkinter, so the handoff costs a Python start-up plus one
+round trip.
+
+The wire format is one JSON object per connection, answered with one line::
+
+    {"op": "raise"}
+    {"op": "run", "names": ["DNF: Full Upgrade System"]}
+
+    {"ok": true}
+
+Requests land in ``InstanceServer.requests``; the Tk tick picks them up,
+like every other cross-thread signal in the app.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+
+from sm_catalog import runtime_dir
+
+LOCK_NAME = "instance.lock"
+SOCKET_NAME = "instance.sock"
+# How long a second launch waits for a first instance that holds the lock
+# but is still starting up.
+CONNECT_TIMEOUT_S = 5.0
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class InstanceUnreachable(OSError):
+    """Another instance holds the lock but did not take the request."""
+
+
+class InstanceServer:
+    """The first instance's end: lock held, socket listening."""
+
+    def __init__(self, lock_fd: int, directory: str):
+        self._lock_fd = lock_fd
+        self.socket_path = os.path.join(directory, SOCKET_NAME)
+        self.requests: queue.Queue[dict] = queue.Queue()
+        # A socket file left by a crashed instance: the lock proves nobody uses it.
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_CLOEXEC)
+        self._sock.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._sock.listen(8)
+        self._thread = threading.Thread(target=self._serve, name="instance", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+        os.close(self._lock_fd)
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _addr = self._sock.accept()
+            except OSError:
+                return
+            with conn:
+                try:
+                    self._handle(conn)
+                except (OSError, ValueError):
+                    pass
+
+    def _handle(self, conn: socket.socket) -> None:
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _pid, uid, _gid = struct.unpack("3i", creds)
+        if uid != os.getuid():
+            return
+        conn.settimeout(CONNECT_TIMEOUT_S)
+        data = b""
+        while not data.endswith(b"\n") and len(data) < MAX_REQUEST_BYTES:
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        request = json.loads(data)
+        if not isinstance(request, dict) or request.get("op") not in ("raise", "run"):
+            conn.sendall(b'{"ok": false, "error": "unknown request"}\n')
+            return
+        self.requests.put(request)
+        conn.sendall(b'{"ok": true}\n')
+
+
+def request_for(names: list[str]) -> dict:
+    return {"op": "run", "names": names} if names else {"op": "raise"}
+
+
+def forward(request: dict, directory: str, timeout: float = CONNECT_TIMEOUT_S) -> dict:
+    """Send ``request`` to the running instance and return its reply.
+
+    Retries until ``timeout`` while the socket is not there yet: the other
+    process holds the lock from its first line on, before it can listen.
+    """
+    path = os.path.join(directory, SOCKET_NAME)
+    deadline = time.monotonic() + timeout
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_CLOEXEC)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            reply = sock.makefile("rb").readline()
+            return json.loads(reply) if reply else {"ok": False, "error": "no reply"}
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+        finally:
+            sock.close()
+
+
+def claim_or_forward(names: list[str]) -> InstanceServer | None:
+    """Become the instance, or hand ``names`` (or a raise) to the existing one.
+
+    Returns the started server when this process is the first instance; its
+    own ``names`` are queued on it as if they had been forwarded. Returns
+    None after a successful handoff. Raises ``InstanceUnreachable`` when
+    another instance holds the lock but cannot be reached, and a plain
+    ``OSError`` when this process could not set itself up as the instance
+    (runtime directory, lock file or socket).
+    """
+    directory = runtime_dir()
+    fd = os.open(os.path.join(directory, LOCK_NAME), os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        try:
+            reply = forward(request_for(names), directory)
+        except OSError as e:
+            raise InstanceUnreachable(str(e)) from e
+        if not reply.get("ok"):
+            raise InstanceUnreachable(reply.get("error") or "request rejected")
+        return None
+    except OSError:
+        os.close(fd)
+        raise
+    try:
+        server = InstanceServer(fd, directory)
+    except OSError:
+        os.close(fd)
+        raise
+    if names:
+        server.requests.put(request_for(names))
+    server.start()
+    return server
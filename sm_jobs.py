@@ -0,0 +1,252 @@
+"""Job scheduler for catalog commands.
+
+Jobs are queued FIFO and started into a bounded number of run slots. A job
+may name a ``lock`` (jobs sharing a lock run one at a time) or be
+``exclusive`` (runs with nothing else alongside). The same command is not
+queued twice while a previous run is still pending or running.
+
+The runner only *starts* a job and returns a future; the scheduler itself
+owns no threads and dispatches again whenever a future completes.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import itertools
+import os
+import signal
+import threading
+import time
+from typing import Callable
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+
+KILL_GRACE_S = 3.0
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, cmd: str, lock: str | None = None, exclusive: bool = False, options: dict | None = None):
+        self.id = next(Job._ids)
+        self.name = name
+        self.cmd = cmd
+        self.lock = lock
+        self.exclusive = exclusive
+        # Copy of the catalog entry's options (limits, timeout, cache_ttl) at
+        # submit time; catalog edits while the job waits do not change them.
+        self.options = dict(options or {})
+        self.state = PENDING
+        self.cancel_requested = False
+        # subprocess.Popen or asyncio.subprocess.Process; both expose pid/returncode.
+        self.process = None
+        self.submitted = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        # Set from the runner's future when it resolves to a return code.
+        self.exit_code: int | None = None
+        self._callbacks: list[Callable[[Job], None]] = []
+        # The scheduler sets the final state under its own lock and fires
+        # callbacks after; this one keeps a late add from slipping between.
+        self._callbacks_lock = threading.Lock()
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.name, self.cmd
+
+    def add_done_callback(self, fn: Callable[["Job"], None]) -> None:
+        """Call ``fn(job)`` once the job is done or cancelled (at once if it already is)."""
+        with self._callbacks_lock:
+            if self.state not in (DONE, CANCELLED):
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _fire_callbacks(self) -> None:
+        with self._callbacks_lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                pass
+
+    def attach(self, process) -> None:
+        """Register the job's process; kill it at once if cancel came first."""
+        self.process = process
+        if self.cancel_requested:
+            self.terminate()
+
+    def terminate(self) -> None:
+        """Signal the whole process group, escalating to SIGKILL after a grace period."""
+        if self.process is not None:
+            terminate_process(self.process)
+
+
+def terminate_process(process) -> None:
+    """SIGTERM ``process``'s group, then SIGKILL it if still alive after ``KILL_GRACE_S``.
+
+    Processes that are not local children (e.g. run by the privileged
+    helper) provide their own ``signal_group(sig)``.
+    """
+    if process.returncode is not None:
+        return
+    signal_group = getattr(process, "signal_group", None)
+    if signal_group is None:
+        def signal_group(sig: int) -> None:
+            os.killpg(process.pid, sig)
+    try:
+        signal_group(signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+
+    def _kill() -> None:
+        if process.returncode is None:
+            try:
+                signal_group(signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    timer = threading.Timer(KILL_GRACE_S, _kill)
+    timer.daemon = True
+    timer.start()
+
+
+class JobScheduler:
+    def __init__(
+        self,
+        runner: Callable[[Job], concurrent.futures.Future],
+        max_workers: int = 4,
+        on_change: Callable[[], None] | None = None,
+    ):
+        self._runner = runner
+        self._on_change = on_change
+        self._lock = threading.Lock()
+        self._pending: list[Job] = []
+        self._running: list[Job] = []
+        self.max_workers = max(1, int(max_workers))
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def set_max_workers(self, count: int) -> None:
+        with self._lock:
+            self.max_workers = max(1, int(count))
+        self._dispatch()
+
+    def submit(
+        self,
+        name: str,
+        cmd: str,
+        lock: str | None = None,
+        exclusive: bool = False,
+        options: dict | None = None,
+        dedupe: bool = True,
+    ) -> Job | None:
+        """Queue a job, or return None if the same command is already queued or running.
+
+        ``dedupe=False`` queues it regardless, for callers that mean a second run.
+        """
+        job = Job(name, cmd, lock=lock, exclusive=exclusive, options=options)
+        with self._lock:
+            if dedupe and any(j.key == job.key for j in self._pending + self._running):
+                return None
+            self._pending.append(job)
+        self._changed()
+        self._dispatch()
+        return job
+
+    def cancel(self, job_id: int) -> Job | None:
+        with self._lock:
+            job = next((j for j in self._pending + self._running if j.id == job_id), None)
+            if job is None:
+                return None
+            job.cancel_requested = True
+            if job.state == PENDING:
+                self._pending.remove(job)
+                job.state = CANCELLED
+                job.finished = time.time()
+        if job.state == RUNNING:
+            job.terminate()
+        else:
+            job._fire_callbacks()
+        self._changed()
+        self._dispatch()
+        return job
+
+    def snapshot(self) -> list[Job]:
+        """Running jobs first, then pending jobs in queue order."""
+        with self._lock:
+            return list(self._running) + list(self._pending)
+
+    def blocked_reason(self, job: Job) -> str | None:
+        with self._lock:
+            return self._blocked_reason(job)
+
+    # -------------------------
+    # Dispatch
+    # -------------------------
+    def _blocked_reason(self, job: Job) -> str | None:
+        if any(j.exclusive for j in self._running):
+            return "an exclusive job is running"
+        if job.exclusive and self._running:
+            return "exclusive, waiting for other jobs"
+        if job.lock and any(j.lock == job.lock for j in self._running):
+            return f"waiting for lock '{job.lock}'"
+        if len(self._running) >= self.max_workers:
+            return "all workers busy"
+        return None
+
+    def _next_runnable(self) -> Job | None:
+        for job in self._pending:
+            if self._blocked_reason(job) is None:
+                return job
+            # An exclusive job acts as a barrier so it cannot be starved by
+            # later jobs slipping past it.
+            if job.exclusive:
+                return None
+        return None
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._lock:
+                job = self._next_runnable()
+                if job is None:
+                    return
+                self._pending.remove(job)
+                self._running.append(job)
+                job.state = RUNNING
+                job.started = time.time()
+            self._changed()
+
+            try:
+                future = self._runner(job)
+            except Exception:
+                self._finish(job)
+                continue
+            future.add_done_callback(lambda f, j=job: self._finish(j, f))
+
+    def _finish(self, job: Job, future: concurrent.futures.Future | None = None) -> None:
+        exit_code = None
+        if future is not None and not future.cancelled() and future.exception() is None and isinstance(future.result(), int):
+            exit_code = future.result()
+        with self._lock:
+            if job not in self._running:
+                return
+            self._running.remove(job)
+            job.exit_code = exit_code
+            job.state = CANCELLED if job.cancel_requested else DONE
+            job.finished = time.time()
+        job._fire_callbacks()
+        self._changed()
+        self._dispatch()
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            try:
+                self._on_change()
+            except Exception:
+                pass
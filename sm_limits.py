@@ -0,0 +1,152 @@
+"""Per-entry scheduling classes and resource limits.
+
+Catalog entries may carry::
+
+    "nice": 10,                 -20..19
+    "ionice": "idle",           "idle", "best-effort[:0-7]" or "realtime[:0-7]"
+    "cpus": "0-3",              CPU affinity list (taskset syntax) or [0, 1, 2, 3]
+    "memory_max": "2G",         bytes, or a number with K/M/G/T
+    "cpu_quota": 50,            percent of one CPU
+    "timeout": 600              seconds of wall-clock time
+
+``wrap_command`` turns these into a command prefix, so they apply to the
+shell and everything it starts: ``nice``, ``ionice`` and ``taskset`` for
+scheduling, a transient ``systemd-run --scope`` for the memory/CPU caps
+and, where no systemd user manager is reachable, the shell's ``ulimit -v``
+for memory. The timeout is not part of the command; callers kill the
+process group when it expires.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import re
+import shlex
+import shutil
+
+IONICE_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:i?B)?\s*$", re.IGNORECASE)
+_CPUS_RE = re.compile(r"^\d+(-\d+)?(,\d+(-\d+)?)*$")
+
+
+def parse_size(value: object) -> int | None:
+    """``2G`` / ``512M`` / ``1048576`` -> bytes; None if not a size."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) if value > 0 else None
+    match = _SIZE_RE.match(str(value))
+    if not match:
+        return None
+    size = int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+    return size if size > 0 else None
+
+
+def normalize_limits(item: dict) -> dict:
+    """The valid limit keys of a raw catalog entry; invalid values are dropped."""
+    limits: dict = {}
+    nice = item.get("nice")
+    if isinstance(nice, int) and not isinstance(nice, bool) and -20 <= nice <= 19:
+        limits["nice"] = nice
+    ionice = item.get("ionice")
+    if isinstance(ionice, str):
+        cls, _sep, level = ionice.strip().lower().partition(":")
+        if cls in IONICE_CLASSES and (not level or (level.isdigit() and int(level) <= 7)):
+            limits["ionice"] = ionice.strip().lower()
+    cpus = item.get("cpus")
+    if isinstance(cpus, list) and cpus and all(isinstance(c, int) and not isinstance(c, bool) and c >= 0 for c in cpus):
+        limits["cpus"] = ",".join(str(c) for c in sorted(set(cpus)))
+    elif isinstance(cpus, str) and _CPUS_RE.match(cpus.replace(" ", "")):
+        limits["cpus"] = cpus.replace(" ", "")
+    if parse_size(item.get("memory_max")) is not None:
+        limits["memory_max"] = item["memory_max"]
+    for key in ("cpu_quota", "timeout"):
+        value = item.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+            limits[key] = value
+    return limits
+
+
+def describe_limits(entry: dict) -> str:
+    """Short human summary, e.g. ``nice 10, ionice idle, timeout 600s``."""
+    parts = []
+    if "nice" in entry:
+        parts.append(f"nice {entry['nice']}")
+    if "ionice" in entry:
+        parts.append(f"ionice {entry['ionice']}")
+    if "cpus" in entry:
+        parts.append(f"cpus {entry['cpus']}")
+    if "memory_max" in entry:
+        parts.append(f"memory {entry['memory_max']}")
+    if "cpu_quota" in entry:
+        parts.append(f"cpu {entry['cpu_quota']}%")
+    if "timeout" in entry:
+        parts.append(f"timeout {entry['timeout']}s")
+    return ", ".join(parts)
+
+
+@functools.lru_cache(maxsize=2)
+def systemd_scope_available(user: bool = True) -> bool:
+    """Whether ``systemd-run --scope`` can create a transient scope here."""
+    if shutil.which("systemd-run") is None:
+        return False
+    if not user:
+        return os.geteuid() == 0 and os.path.isdir("/run/systemd/system")
+    runtime = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    return os.path.exists(os.path.join(runtime, "systemd", "private")) or os.path.exists(os.path.join(runtime, "bus"))
+
+
+def wrap_command(cmd: str, entry: dict, user: bool = True) -> tuple[str, list[str]]:
+    """Command with the entry's limits applied, plus notes on what was skipped.
+
+    ``user`` picks the systemd user manager for the scope; the privileged
+    helper runs as root and passes ``False``.
+    """
+    prefix: list[str] = []
+    notes: list[str] = []
+    shell_prefix = ""
+    memory = parse_size(entry.get("memory_max")) if "memory_max" in entry else None
+    quota = entry.get("cpu_quota")
+
+    if memory is not None or quota is not None:
+        if systemd_scope_available(user):
+            prefix += ["systemd-run"] + (["--user"] if user else []) + ["--scope", "--quiet", "--collect"]
+            if memory is not None:
+                prefix += ["-p", f"MemoryMax={memory}"]
+            if quota is not None:
+                prefix += ["-p", f"CPUQuota={quota:g}%"]
+            prefix.append("--")
+        else:
+            if memory is not None:
+                # Address-space limit: coarser than a cgroup cap, but inherited.
+                shell_prefix = f"ulimit -v {max(1, memory // 1024)} && "
+            if quota is not None:
+                notes.append("cpu_quota needs systemd-run; not applied")
+
+    for key, tool, args in (
+        ("nice", "nice", lambda v: ["-n", str(v)]),
+        ("ionice", "ionice", _ionice_args),
+        ("cpus", "taskset", lambda v: ["-c", v]),
+    ):
+        if key not in entry:
+            continue
+        if shutil.which(tool) is None:
+            notes.append(f"{key} needs {tool}; not applied")
+            continue
+        prefix += [tool] + args(entry[key])
+
+    if not prefix and not shell_prefix:
+        return cmd, notes
+    if not prefix:
+        return f"{shell_prefix}exec sh -c {shlex.quote(cmd)}", notes
+    return f"{shell_prefix}exec {shlex.join(prefix)} sh -c {shlex.quote(cmd)}", notes
+
+
+def _ionice_args(value: str) -> list[str]:
+    cls, _sep, level = value.partition(":")
+    args = ["-c", str(IONICE_CLASSES[cls])]
+    if level and cls != "idle":
+        args += ["-n", level]
+    return args
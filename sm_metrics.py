@@ -0,0 +1,266 @@
+"""Live system metrics read straight from /proc and statvfs.
+
+``MetricsSampler.sample()`` reads CPU (``/proc/stat``), memory
+(``/proc/meminfo``), load (``/proc/loadavg``), per-device I/O
+(``/proc/diskstats``), network counters (``/proc/net/dev``) and mount usage
+(``os.statvfs``) without spawning anything. The /proc files stay open and
+are re-read with ``os.pread`` from offset 0, which procfs regenerates on
+every read; only the lines that are needed get split.
+
+History is kept in ``RingBuffer``s: fixed-size ``array('d')`` storage, so a
+long session allocates nothing per sample.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from array import array
+
+PROC_READ_SIZE = 64 * 1024
+SECTOR_BYTES = 512
+DEFAULT_HISTORY = 120
+# Mount types that are not worth showing on a dashboard.
+_VIRTUAL_FS = {"squashfs", "overlay", "tmpfs", "devtmpfs"}
+
+
+class RingBuffer:
+    """Fixed-capacity float history backed by one ``array``."""
+
+    __slots__ = ("_data", "_start", "_len")
+
+    def __init__(self, capacity: int):
+        self._data = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def append(self, value: float) -> None:
+        cap = len(self._data)
+        if self._len < cap:
+            self._data[(self._start + self._len) % cap] = value
+            self._len += 1
+        else:
+            self._data[self._start] = value
+            self._start = (self._start + 1) % cap
+
+    def last(self) -> float | None:
+        if not self._len:
+            return None
+        return self._data[(self._start + self._len - 1) % len(self._data)]
+
+    def values(self) -> list[float]:
+        """Oldest first."""
+        end = self._start + self._len
+        if end <= len(self._data):
+            return self._data[self._start:end].tolist()
+        return self._data[self._start:].tolist() + self._data[:end - len(self._data)].tolist()
+
+
+class _ProcFile:
+    """A /proc file kept open and re-read in one ``pread``."""
+
+    __slots__ = ("path", "_fd")
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            self._fd: int | None = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        except OSError:
+            self._fd = None
+
+    def read(self) -> bytes:
+        if self._fd is None:
+            return b""
+        try:
+            return os.pread(self._fd, PROC_READ_SIZE, 0)
+        except OSError:
+            return b""
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def read_mounts(mounts_text: bytes) -> list[tuple[str, str]]:
+    """``(mount_point, device_name)`` for block-device mounts, one per device.
+
+    ``device_name`` is the kernel name used in ``/proc/diskstats`` (symlinks
+    like ``/dev/mapper/root`` resolve to ``dm-0``). Bind mounts and btrfs
+    subvolumes of an already listed device are dropped; the shortest mount
+    point wins.
+    """
+    by_device: dict[str, str] = {}
+    for line in mounts_text.decode("utf-8", "replace").splitlines():
+        parts = line.split()
+        if len(parts) < 3 or not parts[0].startswith("/dev/") or parts[2] in _VIRTUAL_FS:
+            continue
+        # /proc/mounts escapes spaces as \040.
+        point = parts[1].replace("\\040", " ")
+        device = os.path.basename(os.path.realpath(parts[0]))
+        if device not in by_device or len(point) < len(by_device[device]):
+            by_device[device] = point
+    return sorted(((point, device) for device, point in by_device.items()), key=lambda pd: pd[0])
+
+
+class MetricsSampler:
+    """Samples the system and keeps a short history of every series.
+
+    Rates (CPU %, I/O and network bytes/s) need two samples, so the first
+    ``sample()`` only primes the counters. Series are created on first sight
+    and keyed like ``"cpu"``, ``"mem"``, ``"load1"``, ``"net_rx"``,
+    ``"disk_read:/home"``.
+    """
+
+    def __init__(self, history: int = DEFAULT_HISTORY, proc: str = "/proc"):
+        self.history = history
+        self._stat = _ProcFile(os.path.join(proc, "stat"))
+        self._meminfo = _ProcFile(os.path.join(proc, "meminfo"))
+        self._loadavg = _ProcFile(os.path.join(proc, "loadavg"))
+        self._diskstats = _ProcFile(os.path.join(proc, "diskstats"))
+        self._netdev = _ProcFile(os.path.join(proc, "net", "dev"))
+        self._mounts_file = _ProcFile(os.path.join(proc, "self", "mounts"))
+        self.mounts = read_mounts(self._mounts_file.read())
+        self.series: dict[str, RingBuffer] = {}
+        # Latest values, including ones without history (sizes, totals).
+        self.current: dict[str, float] = {}
+        self._prev_cpu: tuple[int, int] | None = None
+        self._prev_disk: dict[str, tuple[int, int]] = {}
+        self._prev_net: tuple[int, int] | None = None
+        self._prev_time: float | None = None
+
+    def close(self) -> None:
+        for f in (self._stat, self._meminfo, self._loadavg, self._diskstats, self._netdev, self._mounts_file):
+            f.close()
+
+    def refresh_mounts(self) -> None:
+        self.mounts = read_mounts(self._mounts_file.read())
+
+    def _put(self, key: str, value: float, keep: bool = True) -> None:
+        self.current[key] = value
+        if keep:
+            buf = self.series.get(key)
+            if buf is None:
+                buf = self.series[key] = RingBuffer(self.history)
+            buf.append(value)
+
+    # -------------------------
+    # Sampling
+    # -------------------------
+    def sample(self) -> dict[str, float]:
+        now = time.monotonic()
+        elapsed = now - self._prev_time if self._prev_time is not None else None
+        self._prev_time = now
+        self._sample_cpu()
+        self._sample_memory()
+        self._sample_load()
+        self._sample_disks(elapsed)
+        self._sample_net(elapsed)
+        return self.current
+
+    def _sample_cpu(self) -> None:
+        data = self._stat.read()
+        line = data[:data.find(b"\n")].split()
+        if len(line) < 5 or line[0] != b"cpu":
+            return
+        ticks = [int(v) for v in line[1:9]]
+        # idle + iowait count as idle; guest time is already in user/nice.
+        idle = ticks[3] + (ticks[4] if len(ticks) > 4 else 0)
+        total = sum(ticks)
+        if self._prev_cpu is not None:
+            d_total = total - self._prev_cpu[0]
+            d_idle = idle - self._prev_cpu[1]
+            if d_total > 0:
+                self._put("cpu", 100.0 * (d_total - d_idle) / d_total)
+        self._prev_cpu = (total, idle)
+
+    def _sample_memory(self) -> None:
+        wanted = {b"MemTotal:": 0, b"MemAvailable:": 0, b"SwapTotal:": 0, b"SwapFree:": 0}
+        left = len(wanted)
+        for line in self._meminfo.read().split(b"\n"):
+            key, _sep, rest = line.partition(b" ")
+            if key in wanted:
+                wanted[key] = int(rest.split()[0]) * 1024
+                left -= 1
+                if not left:
+                    break
+        total = wanted[b"MemTotal:"]
+        if not total:
+            return
+        used = total - wanted[b"MemAvailable:"]
+        self._put("mem_total", total, keep=False)
+        self._put("mem_used", used, keep=False)
+        self._put("mem", 100.0 * used / total)
+        swap_total = wanted[b"SwapTotal:"]
+        self._put("swap_total", swap_total, keep=False)
+        self._put("swap_used", swap_total - wanted[b"SwapFree:"], keep=False)
+
+    def _sample_load(self) -> None:
+        parts = self._loadavg.read().split()
+        if len(parts) >= 3:
+            self._put("load1", float(parts[0]))
+            self._put("load5", float(parts[1]), keep=False)
+            self._put("load15", float(parts[2]), keep=False)
+
+    def _sample_disks(self, elapsed: float | None) -> None:
+        devices = {device: point for point, device in self.mounts}
+        counters: dict[str, tuple[int, int]] = {}
+        if devices:
+            for line in self._diskstats.read().split(b"\n"):
+                parts = line.split()
+                if len(parts) < 10:
+                    continue
+                name = parts[2].decode()
+                if name in devices:
+                    # Fields 6 and 10: sectors read / written.
+                    counters[name] = (int(parts[5]), int(parts[9]))
+
+        for point, device in self.mounts:
+            try:
+                st = os.statvfs(point)
+            except OSError:
+                continue
+            total = st.f_blocks * st.f_frsize
+            if total:
+                self._put(f"disk_total:{point}", total, keep=False)
+                self._put(f"disk_used:{point}", total - st.f_bfree * st.f_frsize, keep=False)
+                # Like df: used against what non-root users can reach.
+                usable = total - (st.f_bfree - st.f_bavail) * st.f_frsize
+                self._put(f"disk:{point}", 100.0 * (total - st.f_bfree * st.f_frsize) / usable if usable else 0.0, keep=False)
+            now = counters.get(device)
+            prev = self._prev_disk.get(device)
+            if now is not None and prev is not None and elapsed:
+                self._put(f"disk_read:{point}", (now[0] - prev[0]) * SECTOR_BYTES / elapsed)
+                self._put(f"disk_write:{point}", (now[1] - prev[1]) * SECTOR_BYTES / elapsed)
+        self._prev_disk = counters
+
+    def _sample_net(self, elapsed: float | None) -> None:
+        rx = tx = 0
+        # Two header lines, then "  iface: rx_bytes ... (8 rx fields) tx_bytes ...".
+        for line in self._netdev.read().split(b"\n")[2:]:
+            iface, sep, rest = line.partition(b":")
+            if not sep or iface.strip() == b"lo":
+                continue
+            fields = rest.split()
+            if len(fields) >= 9:
+                rx += int(fields[0])
+                tx += int(fields[8])
+        if self._prev_net is not None and elapsed:
+            self._put("net_rx", max(0, rx - self._prev_net[0]) / elapsed)
+            self._put("net_tx", max(0, tx - self._prev_net[1]) / elapsed)
+        self._prev_net = (rx, tx)
+
+
+def format_bytes(value: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if abs(value) < 1024 or unit == "TiB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TiB"
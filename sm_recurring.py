@@ -0,0 +1,142 @@
+"""Recurring runs of catalog entries while the app is open.
+
+An entry opts in with a ``schedule``::
+
+    "schedule": {"every": "6h"}            interval: 90, "30m", "6h", "1d" (at least a minute)
+    "schedule": {"at": "03:30"}            time of day, local time
+    "schedule": {"at": ["08:00", "20:00"]}
+
+``RecurringTimer`` keeps every due time in one heap; the GUI's existing
+tick asks it for ``pop_due()``, so there is no thread or ``after`` callback
+per entry. Due times are wall-clock based: after a suspend the first tick
+sees everything that came due meanwhile, and each entry fires once (marked
+as a catch-up) before its schedule continues from now.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Hashable
+
+MIN_INTERVAL_S = 60
+# A run this late counts as a catch-up.
+CATCH_UP_AFTER_S = 60
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_INTERVAL_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$", re.IGNORECASE)
+_TIME_RE = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)$")
+
+
+def parse_interval(value: object) -> float | None:
+    """``90`` / ``"30m"`` / ``"6h"`` / ``"1d"`` -> seconds; None if invalid or too short."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = _INTERVAL_RE.match(str(value))
+        if not match:
+            return None
+        seconds = float(match.group(1)) * _UNITS[(match.group(2) or "s").lower()]
+    return seconds if seconds >= MIN_INTERVAL_S else None
+
+
+def normalize_schedule(value: object) -> dict | None:
+    """Validated schedule, keeping the user's own spelling; None to drop it."""
+    if not isinstance(value, dict):
+        return None
+    if "every" in value:
+        return {"every": value["every"]} if parse_interval(value["every"]) is not None else None
+    at = value.get("at")
+    times = [at] if isinstance(at, str) else at
+    if isinstance(times, list) and times and all(isinstance(t, str) and _TIME_RE.match(t.strip()) for t in times):
+        return {"at": at}
+    return None
+
+
+def describe_schedule(schedule: dict) -> str:
+    if "every" in schedule:
+        return f"every {schedule['every']}"
+    at = schedule["at"]
+    return "at " + (at if isinstance(at, str) else ", ".join(at))
+
+
+def next_due(schedule: dict, after: float) -> float:
+    """First time strictly after ``after`` the schedule fires."""
+    if "every" in schedule:
+        return after + parse_interval(schedule["every"])
+    at = schedule["at"]
+    base = datetime.fromtimestamp(after)
+    candidates = []
+    for text in [at] if isinstance(at, str) else at:
+        hour, minute = (int(p) for p in text.strip().split(":"))
+        when = base.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if when.timestamp() <= after:
+            when += timedelta(days=1)
+        candidates.append(when.timestamp())
+    return min(candidates)
+
+
+class RecurringTimer:
+    """One heap of due times for any number of schedules.
+
+    Keys are whatever identifies an entry to the caller. Replaced or removed
+    schedules leave stale heap items behind; they are skipped when popped.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self._schedules: dict[Hashable, dict] = {}
+        self._due: dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+    def set_schedules(self, schedules: dict[Hashable, dict], now: float | None = None) -> None:
+        """Replace the set of schedules; unchanged ones keep their due time."""
+        now = time.time() if now is None else now
+        for key in list(self._schedules):
+            if schedules.get(key) != self._schedules[key]:
+                del self._schedules[key]
+                del self._due[key]
+        for key, schedule in schedules.items():
+            if key not in self._schedules:
+                self._schedules[key] = schedule
+                self._push(key, next_due(schedule, now))
+        # Drop stale items once they dominate the heap.
+        if len(self._heap) > 2 * len(self._due) + 16:
+            self._heap = [(due, seq, key) for due, seq, key in self._heap if self._due.get(key) == due]
+            heapq.heapify(self._heap)
+
+    def _push(self, key: Hashable, due: float) -> None:
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._seq), key))
+
+    def next_due(self) -> tuple[float, Hashable] | None:
+        while self._heap:
+            due, _seq, key = self._heap[0]
+            if self._due.get(key) == due:
+                return due, key
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: float | None = None) -> list[tuple[Hashable, bool]]:
+        """``(key, catch_up)`` for every schedule due by ``now``; each key at most once.
+
+        However many occurrences were missed, the entry fires once and its
+        next due time is computed from ``now``.
+        """
+        now = time.time() if now is None else now
+        fired: list[tuple[Hashable, bool]] = []
+        while True:
+            head = self.next_due()
+            if head is None or head[0] > now:
+                return fired
+            due, key = head
+            heapq.heappop(self._heap)
+            fired.append((key, now - due > CATCH_UP_AFTER_S))
+            self._push(key, next_due(self._schedules[key], now))
@@ -0,0 +1,135 @@
+"""Append-only spill file for log lines trimmed out of the log widget.
+
+The widget keeps only the newest lines. Everything trimmed from its top is
+appended here, one ``<tag>\\t<text>`` record per line, and can be paged back
+in from the end of the file without reading it wholesale (mmap + rfind).
+
+Invariant kept together with the UI: the widget shows
+``file[older_end:EOF]`` followed by the lines that were never spilled.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import time
+
+APP_DIR_NAME = "Service-APP-GUI"
+KEEP_SESSIONS = 10
+
+
+def default_log_dir() -> str:
+    state_home = os.environ.get("XDG_STATE_HOME")
+    if not state_home:
+        state_home = os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(state_home, APP_DIR_NAME, "logs")
+
+
+class SpillLog:
+    def __init__(self, log_dir: str | None = None):
+        self.log_dir = log_dir or default_log_dir()
+        self.path: str | None = None
+        self._fh = None
+        # Byte offset of the oldest line currently shown in the widget.
+        self.older_end = 0
+
+    # -------------------------
+    # File handling
+    # -------------------------
+    def _open(self) -> None:
+        if self._fh is not None:
+            return
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._prune_sessions()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(self.log_dir, f"session-{stamp}-{os.getpid()}.log")
+        self._fh = open(self.path, "ab")
+
+    def _prune_sessions(self) -> None:
+        try:
+            names = sorted(n for n in os.listdir(self.log_dir) if n.startswith("session-") and n.endswith(".log"))
+        except OSError:
+            return
+        for name in names[: max(0, len(names) - (KEEP_SESSIONS - 1))]:
+            try:
+                os.remove(os.path.join(self.log_dir, name))
+            except OSError:
+                pass
+
+    def _size(self) -> int:
+        if self._fh is None:
+            return 0
+        return self._fh.tell()
+
+    def close(self) -> None:
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except OSError:
+                pass
+            self._fh = None
+
+    # -------------------------
+    # Spill / page-in
+    # -------------------------
+    @property
+    def paged_in(self) -> bool:
+        """True when the widget top still holds lines paged back from the file."""
+        return self.older_end < self._size()
+
+    @property
+    def has_older(self) -> bool:
+        return self.older_end > 0
+
+    def drop_paged(self, count: int) -> int:
+        """Forget up to ``count`` paged-in lines trimmed from the widget top.
+
+        Those lines already live in the file, so only ``older_end`` moves.
+        Returns how many lines were consumed this way.
+        """
+        size = self._size()
+        if count <= 0 or self.older_end >= size:
+            return 0
+        self._fh.flush()
+        dropped = 0
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            pos = self.older_end
+            while dropped < count and pos < size:
+                nl = mm.find(b"\n", pos, size)
+                pos = size if nl < 0 else nl + 1
+                dropped += 1
+            self.older_end = pos
+        return dropped
+
+    def append(self, lines: list[tuple[str, str]]) -> None:
+        """Spill ``(tag, text)`` lines trimmed from the widget top."""
+        if not lines:
+            return
+        self._open()
+        # Any paged-in region must have been dropped first (see drop_paged).
+        payload = "".join(f"{tag}\t{text}\n" for tag, text in lines).encode("utf-8", "replace")
+        self._fh.write(payload)
+        self._fh.flush()
+        self.older_end = self._size()
+
+    def read_older(self, count: int) -> list[tuple[str, str]]:
+        """Return up to ``count`` lines preceding ``older_end``, oldest first."""
+        if count <= 0 or self.older_end <= 0 or self._fh is None:
+            return []
+        self._fh.flush()
+        end = self.older_end
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), end, access=mmap.ACCESS_READ) as mm:
+            start = end
+            for _ in range(count):
+                if start <= 0:
+                    break
+                nl = mm.rfind(b"\n", 0, start - 1)
+                start = nl + 1
+            chunk = mm[start:end]
+        self.older_end = start
+
+        out: list[tuple[str, str]] = []
+        for raw in chunk.decode("utf-8", "replace").split("\n")[:-1]:
+            tag, _, text = raw.partition("\t")
+            out.append((tag or "info", text))
+        return out
@@ -0,0 +1,208 @@
+"""In-memory search index for the command palette.
+
+Names and command bodies are indexed once into trigram postings plus a
+word-prefix table for short queries; Add/Update/Delete patch the index in
+place. A query only scores the candidates its trigrams point at, so lookups
+stay in the millisecond range for catalogs with tens of thousands of entries.
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+from collections import Counter
+
+_WORD_RE = re.compile(r"[\w.+-]+")
+PREFIX_LEN = 3
+# Upper bound on documents scored per query; very short queries can match
+# most of a large catalog and are capped, name matches first.
+MAX_SCORED = 2000
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _is_subsequence(needle: str, hay: str) -> bool:
+    it = iter(hay)
+    return all(ch in it for ch in needle)
+
+
+class _Doc:
+    __slots__ = ("name", "cmd", "name_l", "cmd_l", "words", "cmd_words", "grams", "refs")
+
+    def __init__(self, name: str, cmd: str):
+        self.name = name
+        self.cmd = cmd
+        self.name_l = name.lower()
+        self.cmd_l = cmd.lower()
+        self.words = _WORD_RE.findall(self.name_l)
+        self.cmd_words = _WORD_RE.findall(self.cmd_l)
+        self.grams = _trigrams(self.name_l) | _trigrams(self.cmd_l)
+        self.refs = 1
+
+
+class CommandIndex:
+    def __init__(self, entries: list[dict] | None = None):
+        self._docs: dict[int, _Doc] = {}
+        self._ids: dict[tuple[str, str], int] = {}
+        self._grams: dict[str, set[int]] = {}
+        self._name_prefixes: dict[str, set[int]] = {}
+        self._cmd_prefixes: dict[str, set[int]] = {}
+        self._next_id = 0
+        if entries:
+            self.rebuild(entries)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # -------------------------
+    # Maintenance
+    # -------------------------
+    def rebuild(self, entries: list[dict]) -> None:
+        self._docs.clear()
+        self._ids.clear()
+        self._grams.clear()
+        self._name_prefixes.clear()
+        self._cmd_prefixes.clear()
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: dict) -> None:
+        key = (entry.get("name", ""), entry.get("command", ""))
+        doc_id = self._ids.get(key)
+        if doc_id is not None:
+            # Duplicate entries share a document; only count them.
+            self._docs[doc_id].refs += 1
+            return
+        doc_id = self._next_id
+        self._next_id += 1
+        doc = _Doc(*key)
+        self._docs[doc_id] = doc
+        self._ids[key] = doc_id
+        for gram in doc.grams:
+            self._grams.setdefault(gram, set()).add(doc_id)
+        for prefix in self._word_prefixes(doc.words):
+            self._name_prefixes.setdefault(prefix, set()).add(doc_id)
+        for prefix in self._word_prefixes(doc.cmd_words):
+            self._cmd_prefixes.setdefault(prefix, set()).add(doc_id)
+
+    def remove(self, entry: dict) -> None:
+        key = (entry.get("name", ""), entry.get("command", ""))
+        doc_id = self._ids.get(key)
+        if doc_id is None:
+            return
+        doc = self._docs[doc_id]
+        doc.refs -= 1
+        if doc.refs > 0:
+            return
+        del self._docs[doc_id]
+        del self._ids[key]
+        for gram in doc.grams:
+            self._discard(self._grams, gram, doc_id)
+        for prefix in self._word_prefixes(doc.words):
+            self._discard(self._name_prefixes, prefix, doc_id)
+        for prefix in self._word_prefixes(doc.cmd_words):
+            self._discard(self._cmd_prefixes, prefix, doc_id)
+
+    def update(self, old: dict, new: dict) -> None:
+        self.remove(old)
+        self.add(new)
+
+    @staticmethod
+    def _word_prefixes(words: list[str]) -> set[str]:
+        return {w[:n] for w in words for n in range(1, min(PREFIX_LEN, len(w)) + 1)}
+
+    @staticmethod
+    def _discard(table: dict[str, set[int]], key: str, doc_id: int) -> None:
+        ids = table.get(key)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del table[key]
+
+    # -------------------------
+    # Query
+    # -------------------------
+    def search(self, query: str, limit: int = 50) -> list[tuple[str, str]]:
+        """Return up to ``limit`` ``(name, command)`` pairs, best match first."""
+        terms = _WORD_RE.findall(query.lower())
+        if not terms:
+            return []
+
+        candidates: set[int] | None = None
+        for term in terms:
+            found = self._candidates(term)
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return []
+
+        if len(candidates) > MAX_SCORED:
+            candidates = self._prefer_exact(candidates, terms)
+        scored = []
+        for doc_id in candidates:
+            doc = self._docs[doc_id]
+            score = sum(self._score(doc, term) for term in terms)
+            if score > 0:
+                scored.append((score, -len(doc.name), doc.name_l, doc_id))
+        best = heapq.nlargest(limit, scored)
+        return [(self._docs[d].name, self._docs[d].cmd) for _s, _l, _n, d in best]
+
+    def _candidates(self, term: str) -> set[int]:
+        if len(term) <= PREFIX_LEN:
+            found = set(self._name_prefixes.get(term, ()))
+            if len(found) >= MAX_SCORED:
+                return found
+            found |= self._cmd_prefixes.get(term, set())
+            if len(term) == PREFIX_LEN:
+                found |= self._grams.get(term, set())
+            return found
+
+        # Tolerate typos: keep documents sharing most of the term's trigrams.
+        grams = _trigrams(term)
+        counts: Counter[int] = Counter()
+        for gram in grams:
+            counts.update(self._grams.get(gram, ()))
+        need = max(1, int(len(grams) * 0.6))
+        # No cap here: cutting before the terms are intersected could drop
+        # the one document that matches all of them.
+        return {doc_id for doc_id, n in counts.items() if n >= need}
+
+    def _prefer_exact(self, candidates: set[int], terms: list[str]) -> list[int]:
+        """The ``MAX_SCORED`` candidates to score: every term in the name
+        first, then in name or command, then the rest, oldest first."""
+        in_name: list[int] = []
+        in_cmd: list[int] = []
+        rest: list[int] = []
+        for doc_id in sorted(candidates):
+            doc = self._docs[doc_id]
+            if all(t in doc.name_l for t in terms):
+                in_name.append(doc_id)
+                if len(in_name) >= MAX_SCORED:
+                    break
+            elif all(t in doc.name_l or t in doc.cmd_l for t in terms):
+                in_cmd.append(doc_id)
+            else:
+                rest.append(doc_id)
+        return (in_name + in_cmd + rest)[:MAX_SCORED]
+
+    @staticmethod
+    def _score(doc: _Doc, term: str) -> float:
+        name = doc.name_l
+        if name.startswith(term):
+            return 100.0
+        if any(w.startswith(term) for w in doc.words):
+            return 80.0
+        if term in name:
+            return 60.0
+        if term in doc.cmd_l:
+            return 40.0
+        if any(w.startswith(term) for w in doc.cmd_words):
+            return 30.0
+        if _is_subsequence(term, name):
+            return 20.0
+        # Fuzzy: fraction of shared trigrams.
+        grams = _trigrams(term)
+        if not grams:
+            return 0.0
+        return 10.0 * len(grams & doc.grams) / len(grams)
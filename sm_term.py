@@ -0,0 +1,240 @@
+"""Terminal-aware processing of command output.
+
+Tools like dnf, flatpak and fstrim draw progress bars by returning to the
+start of the line with ``\\r`` and colour their output with ANSI escape
+sequences. ``TerminalStream`` sits between the engine and the log and turns
+that stream into:
+
+- completed lines, with SGR colours/bold as ``(start, end, tags)`` runs
+  (tags like ``"ansi-red ansi-bold"``), everything else stripped;
+- progress updates for the line currently being redrawn, at most one per
+  ``PROGRESS_INTERVAL_S``, meant to replace each other in place. When that
+  line is finally ended by ``\\n`` it is reported as a completed line with
+  ``replaces_progress`` set.
+
+Plain chunks without ``\\r`` or escapes take a fast path that only splits
+off the last partial line.
+"""
+
+from __future__ import annotations
+
+import re
+import time
+from typing import Callable
+
+PROGRESS_INTERVAL_S = 0.25
+# Longest escape sequence held back when a chunk ends in the middle of one.
+MAX_PENDING_ESCAPE = 64
+MAX_STYLED_BLOCK = 16 * 1024
+
+ANSI_COLOURS = ("black", "red", "green", "yellow", "blue", "magenta", "cyan", "white")
+
+_TOKEN = re.compile(
+    r"\r\n|\n|\r"
+    r"|\x1b\[([0-?]*)[ -/]*([@-~])"  # CSI
+    r"|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)"  # OSC (window titles, hyperlinks)
+    r"|\x1b[@-Z\\-_]"  # other two-byte escapes
+    r"|[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]"  # remaining C0 controls, DEL
+)
+# Anything besides \n and \t that needs the slow path.
+_SPECIAL = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+_PARTIAL_ESCAPE = re.compile(r"\x1b(\[[0-?]*[ -/]*|\][^\x07\x1b]*\x1b?)?$")
+
+Runs = list[tuple[int, int, str]]
+_NO_STYLE: tuple[str | None, bool, bool] = (None, False, False)
+
+
+def sgr_style(params: str, style: tuple[str | None, bool, bool]) -> tuple[str | None, bool, bool]:
+    """Apply an SGR parameter string to ``(colour, bold, underline)``."""
+    colour, bold, underline = style
+    codes = [int(p) if p.isdigit() else 0 for p in params.split(";")] if params else [0]
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code == 0:
+            colour, bold, underline = None, False, False
+        elif code == 1:
+            bold = True
+        elif code == 22:
+            bold = False
+        elif code == 4:
+            underline = True
+        elif code == 24:
+            underline = False
+        elif 30 <= code <= 37:
+            colour = ANSI_COLOURS[code - 30]
+        elif 90 <= code <= 97:
+            colour = "bright-" + ANSI_COLOURS[code - 90]
+        elif code == 39:
+            colour = None
+        elif code in (38, 48):
+            # 256-colour / truecolour: keep the basic 16, skip the rest.
+            if i + 2 < len(codes) and codes[i + 1] == 5:
+                n = codes[i + 2]
+                if code == 38 and n < 16:
+                    colour = ANSI_COLOURS[n] if n < 8 else "bright-" + ANSI_COLOURS[n - 8]
+                i += 2
+            elif i + 4 < len(codes) and codes[i + 1] == 2:
+                i += 4
+        i += 1
+    return colour, bold, underline
+
+
+def style_tags(style: tuple[str | None, bool, bool]) -> str:
+    colour, bold, underline = style
+    tags = []
+    if colour:
+        tags.append(f"ansi-{colour}")
+    if bold:
+        tags.append("ansi-bold")
+    if underline:
+        tags.append("ansi-underline")
+    return " ".join(tags)
+
+
+class TerminalStream:
+    """Processor for one output stream (stdout or stderr) of one command.
+
+    ``on_lines(text, runs, replaces_progress)`` gets completed lines joined
+    with ``\\n`` (no trailing newline); ``runs`` is None for unstyled text.
+    ``on_progress(text, runs)`` gets the current state of a redrawn line.
+    """
+
+    def __init__(
+        self,
+        on_lines: Callable[[str, Runs | None, bool], None],
+        on_progress: Callable[[str, Runs | None], None],
+        interval: float = PROGRESS_INTERVAL_S,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._on_lines = on_lines
+        self._on_progress = on_progress
+        self._interval = interval
+        self._clock = clock
+        self._style = _NO_STYLE
+        self._tags = ""
+        # Current line as [tags, text] runs.
+        self._line: list[list[str]] = []
+        self._overwrite = False
+        self._redrawn = False
+        self._pending_escape = ""
+        self._last_progress = float("-inf")
+        self._progress_dirty = False
+
+    def feed(self, data: str) -> None:
+        if self._pending_escape:
+            data, self._pending_escape = self._pending_escape + data, ""
+        plain = self._style == _NO_STYLE and not self._redrawn and not self._overwrite and not any(tags for tags, _t in self._line)
+        if plain and not _SPECIAL.search(data):
+            # Fast path: plain text, nothing being redrawn.
+            head, sep, tail = data.rpartition("\n")
+            if sep:
+                self._on_lines("".join(t for _tags, t in self._line) + head, None, False)
+                self._line = []
+            if tail:
+                self._append(tail)
+            return
+
+        esc = data.rfind("\x1b")
+        if esc != -1 and len(data) - esc <= MAX_PENDING_ESCAPE and _PARTIAL_ESCAPE.match(data, esc):
+            data, self._pending_escape = data[:esc], data[esc:]
+
+        done: list[tuple[str, Runs | None, bool]] = []
+        pos = 0
+        for match in _TOKEN.finditer(data):
+            if match.start() > pos:
+                self._append(data[pos:match.start()])
+            pos = match.end()
+            token = match.group(0)
+            if token in ("\n", "\r\n"):
+                done.append(self._finish_line())
+            elif token == "\r":
+                self._overwrite = True
+            elif match.group(2) == "m":
+                self._style = sgr_style(match.group(1), self._style)
+                self._tags = style_tags(self._style)
+            elif match.group(2) == "K" and match.group(1) in ("", "0", "2") and self._overwrite:
+                # "Erase line" right after \r: the redraw starts now.
+                if self._line:
+                    self._redrawn = True
+                self._line = []
+        if pos < len(data):
+            self._append(data[pos:])
+        self._deliver(done)
+
+        if self._redrawn and self._line:
+            self._progress_dirty = True
+            self._maybe_progress()
+
+    def flush(self) -> None:
+        """End of stream: whatever is left becomes a final line."""
+        self._pending_escape = ""
+        if self._line or self._redrawn:
+            self._deliver([self._finish_line()])
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _append(self, text: str) -> None:
+        if self._overwrite:
+            if self._line:
+                self._redrawn = True
+            self._line = []
+            self._overwrite = False
+        tags = self._tags
+        if self._line and self._line[-1][0] == tags:
+            self._line[-1][1] += text
+        else:
+            self._line.append([tags, text])
+
+    def _finish_line(self) -> tuple[str, Runs | None, bool]:
+        text, runs = self._render()
+        replaces = self._redrawn
+        self._line = []
+        self._overwrite = False
+        self._redrawn = False
+        self._progress_dirty = False
+        return text, runs, replaces
+
+    def _render(self) -> tuple[str, Runs | None]:
+        parts: list[str] = []
+        runs: Runs = []
+        pos = 0
+        for tags, text in self._line:
+            parts.append(text)
+            if tags:
+                runs.append((pos, pos + len(text), tags))
+            pos += len(text)
+        return "".join(parts), runs or None
+
+    def _deliver(self, lines: list[tuple[str, Runs | None, bool]]) -> None:
+        """Send completed lines, merging neighbours into as few calls as possible.
+
+        Styled blocks are cut at ``MAX_STYLED_BLOCK`` characters: each run
+        is a separate widget segment, so one block is one unit of render work.
+        """
+        block: list[str] = []
+        runs: Runs = []
+        offset = 0
+        for text, line_runs, replaces in lines:
+            if replaces or (runs and offset >= MAX_STYLED_BLOCK):
+                if block:
+                    self._on_lines("\n".join(block), runs or None, False)
+                    block, runs, offset = [], [], 0
+                if replaces:
+                    self._on_lines(text, line_runs, True)
+                    continue
+            if line_runs:
+                runs.extend((offset + a, offset + b, tags) for a, b, tags in line_runs)
+            block.append(text)
+            offset += len(text) + 1
+        if block:
+            self._on_lines("\n".join(block), runs or None, False)
+
+    def _maybe_progress(self) -> None:
+        now = self._clock()
+        if self._progress_dirty and now - self._last_progress >= self._interval:
+            self._last_progress = now
+            self._progress_dirty = False
+            text, runs = self._render()
+            self._on_progress(text, runs)
@@ -0,0 +1,127 @@
+"""Change notification for the catalog files.
+
+``CatalogWatcher`` watches the directory holding ``commands.json`` and its
+``commands.d`` fragment directory with inotify (through ctypes, no extra
+dependency). Where inotify is not available it falls back to polling the
+store's file signatures. Either way it only sets ``changed``; the Tk tick
+decides what to reload.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+
+from sm_catalog import FRAGMENT_DIR, CatalogStore
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+def _inotify_libc():
+    name = ctypes.util.find_library("c") or "libc.so.6"
+    libc = ctypes.CDLL(name, use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError("inotify is not available")
+    return libc
+
+
+class CatalogWatcher:
+    POLL_INTERVAL_S = 2.0
+
+    def __init__(self, store: CatalogStore):
+        self.store = store
+        self.changed = threading.Event()
+        self.mode = "inotify"
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="catalog-watch", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        try:
+            self._run_inotify()
+        except OSError:
+            self.mode = "poll"
+            self._run_poll()
+
+    # -------------------------
+    # inotify
+    # -------------------------
+    def _run_inotify(self) -> None:
+        libc = _inotify_libc()
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        main_dir = os.path.dirname(self.store.path) or "."
+        main_name = os.path.basename(self.store.path)
+        wds: dict[int, str] = {}
+
+        def watch(path: str) -> None:
+            wd = libc.inotify_add_watch(fd, os.fsencode(path), WATCH_MASK)
+            if wd >= 0:
+                wds[wd] = path
+
+        try:
+            watch(main_dir)
+            if not wds:
+                raise OSError(ctypes.get_errno(), f"cannot watch {main_dir}")
+            if os.path.isdir(self.store.fragment_dir):
+                watch(self.store.fragment_dir)
+
+            while not self._stop.is_set():
+                ready, _w, _x = select.select([fd], [], [], 1.0)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                offset = 0
+                while offset + _EVENT.size <= len(data):
+                    wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+                    raw = data[offset + _EVENT.size:offset + _EVENT.size + length]
+                    offset += _EVENT.size + length
+                    name = raw.rstrip(b"\0").decode("utf-8", "replace")
+                    parent = wds.get(wd)
+                    if parent == main_dir:
+                        if name == FRAGMENT_DIR and mask & IN_ISDIR:
+                            if mask & (IN_CREATE | IN_MOVED_TO):
+                                watch(self.store.fragment_dir)
+                            self.changed.set()
+                        elif name == main_name:
+                            self.changed.set()
+                    elif parent is not None:
+                        if mask & IN_DELETE_SELF:
+                            del wds[wd]
+                            self.changed.set()
+                        elif name.endswith(".json"):
+                            self.changed.set()
+        finally:
+            os.close(fd)
+
+    # -------------------------
+    # Polling fallback
+    # -------------------------
+    def _run_poll(self) -> None:
+        last = self.store.signature()
+        while not self._stop.wait(self.POLL_INTERVAL_S):
+            current = self.store.signature()
+            if current != last:
+                last = current
+                self.changed.set()
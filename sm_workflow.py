@@ -0,0 +1,259 @@
+"""Workflows: catalog entries wired together as a dependency graph.
+
+A workflow lives next to the entries in ``commands.json``::
+
+    "workflows": [
+        {
+            "name": "Maintenance: Full",
+            "steps": [
+                {"entry": "Repair: Rebuild RPM & DNF Cache"},
+                {"entry": "DNF: Full Upgrade System", "after": ["Repair: Rebuild RPM & DNF Cache"]},
+                {"entry": "Flatpak: Update & Clean"}
+            ]
+        }
+    ]
+
+Each step runs an existing entry by name (``id`` defaults to the entry name
+and is what ``after`` refers to). Steps whose dependencies have succeeded
+are submitted to the job scheduler together, so independent branches run
+in parallel within the usual lock/exclusive rules. A step that fails or is
+cancelled skips everything that depends on it, and only that.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+from sm_jobs import CANCELLED, Job, JobScheduler
+
+STEP_WAITING = "waiting"
+STEP_RUNNING = "running"
+STEP_OK = "ok"
+STEP_FAILED = "failed"
+STEP_SKIPPED = "skipped"
+STEP_CANCELLED = "cancelled"
+FINAL_STATES = (STEP_OK, STEP_FAILED, STEP_SKIPPED, STEP_CANCELLED)
+
+
+def step_id(step: dict) -> str:
+    return step.get("id") or step["entry"]
+
+
+def check_workflow(workflow: dict, entries: dict[str, dict]) -> list[str]:
+    """Return step ids in a valid run order, or raise ValueError."""
+    steps = {}
+    for step in workflow["steps"]:
+        sid = step_id(step)
+        if sid in steps:
+            raise ValueError(f"duplicate step '{sid}'")
+        if step["entry"] not in entries:
+            raise ValueError(f"unknown entry '{step['entry']}'")
+        steps[sid] = step
+    for sid, step in steps.items():
+        for dep in step.get("after", []):
+            if dep not in steps:
+                raise ValueError(f"step '{sid}' depends on unknown step '{dep}'")
+
+    # Kahn's algorithm; anything left over sits on a cycle.
+    remaining = {sid: set(step.get("after", [])) for sid, step in steps.items()}
+    order: list[str] = []
+    ready = [sid for sid, deps in remaining.items() if not deps]
+    while ready:
+        sid = ready.pop(0)
+        order.append(sid)
+        del remaining[sid]
+        for other, deps in remaining.items():
+            if sid in deps:
+                deps.discard(sid)
+                if not deps:
+                    ready.append(other)
+    if remaining:
+        raise ValueError("dependency cycle between " + ", ".join(repr(s) for s in sorted(remaining)))
+    return order
+
+
+class WorkflowStep:
+    __slots__ = ("id", "entry", "after", "state", "job", "joined", "finished", "exit_code", "note")
+
+    def __init__(self, sid: str, entry: dict, after: list[str]):
+        self.id = sid
+        self.entry = entry
+        self.after = after
+        self.state = STEP_WAITING
+        self.job: Job | None = None
+        # The job was started outside this workflow; cancel only lets go of it.
+        self.joined = False
+        self.finished: float | None = None
+        self.exit_code: int | None = None
+        self.note = ""
+
+    @property
+    def started(self) -> float | None:
+        # A submitted step may still wait in the scheduler queue.
+        return self.job.started if self.job is not None else None
+
+    @property
+    def duration(self) -> float | None:
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+
+class WorkflowRun:
+    """One execution of a workflow on a ``JobScheduler``.
+
+    ``on_change`` is called from whichever thread finished a step; callers
+    that own a UI should only flag themselves dirty there.
+    """
+
+    def __init__(
+        self,
+        workflow: dict,
+        entries: dict[str, dict],
+        scheduler: JobScheduler,
+        on_change: Callable[[], None] | None = None,
+    ):
+        order = check_workflow(workflow, entries)
+        self.name = workflow["name"]
+        self.scheduler = scheduler
+        self._on_change = on_change
+        self._lock = threading.Lock()
+        by_id = {step_id(s): s for s in workflow["steps"]}
+        self.steps = [WorkflowStep(sid, entries[by_id[sid]["entry"]], list(by_id[sid].get("after", []))) for sid in order]
+        self._by_id = {s.id: s for s in self.steps}
+        self.started = time.time()
+        self.finished: float | None = None
+        self.cancel_requested = False
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    @property
+    def ok(self) -> bool:
+        return all(s.state == STEP_OK for s in self.steps)
+
+    def counts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for step in self.steps:
+            counts[step.state] = counts.get(step.state, 0) + 1
+        return counts
+
+    def start(self) -> None:
+        self._advance()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancel_requested = True
+            job_ids = [s.job.id for s in self.steps if s.state == STEP_RUNNING and s.job is not None and not s.joined]
+            for step in self.steps:
+                if step.state == STEP_WAITING:
+                    step.state = STEP_CANCELLED
+                elif step.state == STEP_RUNNING and step.joined:
+                    step.state = STEP_CANCELLED
+                    step.finished = time.time()
+                    step.note = f"detached from job #{step.job.id}"
+        for job_id in job_ids:
+            self.scheduler.cancel(job_id)
+        self._advance()
+
+    # -------------------------
+    # Progress
+    # -------------------------
+    def _advance(self) -> None:
+        """Start every step whose dependencies succeeded; skip the ones that cannot run."""
+        to_submit: list[WorkflowStep] = []
+        with self._lock:
+            progressed = True
+            while progressed:
+                progressed = False
+                for step in self.steps:
+                    if step.state != STEP_WAITING:
+                        continue
+                    deps = [self._by_id[d] for d in step.after]
+                    blocker = next((d for d in deps if d.state in (STEP_FAILED, STEP_SKIPPED, STEP_CANCELLED)), None)
+                    if blocker is not None:
+                        step.state = STEP_SKIPPED
+                        step.note = f"{blocker.id} {blocker.state}"
+                        progressed = True
+                    elif all(d.state == STEP_OK for d in deps):
+                        step.state = STEP_RUNNING
+                        to_submit.append(step)
+            if not to_submit and self.finished is None and all(s.state in FINAL_STATES for s in self.steps):
+                self.finished = time.time()
+
+        for step in to_submit:
+            self._submit(step)
+        self._changed()
+
+    def _submit(self, step: WorkflowStep) -> None:
+        entry = step.entry
+        kwargs = {"lock": entry.get("lock"), "exclusive": bool(entry.get("exclusive")), "options": entry}
+        job = self.scheduler.submit(entry["name"], entry["command"], **kwargs)
+        joined = False
+        if job is None:
+            other = next((j for j in self.scheduler.snapshot() if j.key == (entry["name"], entry["command"])), None)
+            if other is not None and self._can_join(step, other):
+                # The same entry is already queued or running outside this
+                # workflow, late enough to count as this step: follow that
+                # run instead of starting a second one.
+                job, joined = other, True
+                step.note = f"joined job #{job.id}"
+            else:
+                # Another step of this workflow uses the same entry under its
+                # own id, or the other run started before this step's
+                # dependencies were done: this step is a run of its own.
+                job = self.scheduler.submit(entry["name"], entry["command"], dedupe=False, **kwargs)
+        with self._lock:
+            step.job = job
+            step.joined = joined
+            cancelled = self.cancel_requested
+            if cancelled and joined:
+                step.state = STEP_CANCELLED
+                step.finished = time.time()
+                step.note = f"detached from job #{job.id}"
+        job.add_done_callback(lambda j, s=step: self._on_job_done(s, j))
+        if cancelled:
+            # cancel() ran while this step was being queued and did not see its job.
+            if joined:
+                self._advance()
+            else:
+                self.scheduler.cancel(job.id)
+
+    def _can_join(self, step: WorkflowStep, job: Job) -> bool:
+        """Whether ``job`` may stand in for ``step``: not another step's, and
+        not started before the step's dependencies finished."""
+        with self._lock:
+            if any(s.job is job for s in self.steps):
+                return False
+            ready = max((self._by_id[d].finished or 0.0 for d in step.after), default=0.0)
+        return job.started is None or job.started >= ready
+
+    def _on_job_done(self, step: WorkflowStep, job: Job) -> None:
+        with self._lock:
+            if step.job is not job or step.state != STEP_RUNNING:
+                # Detached by cancel(); the job's outcome is not this step's.
+                return
+        if job.state == CANCELLED or job.cancel_requested:
+            state = STEP_CANCELLED
+        else:
+            state = STEP_OK if job.exit_code == 0 else STEP_FAILED
+        self._step_finished(step, job.exit_code, state)
+
+    def _step_finished(self, step: WorkflowStep, exit_code: int | None, state: str, note: str = "") -> None:
+        with self._lock:
+            step.exit_code = exit_code
+            step.finished = time.time()
+            step.state = state
+            if note:
+                step.note = note
+        self._advance()
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            try:
+                self._on_change()
+            except Exception:
+                pass